@@ -0,0 +1,158 @@
+"""
+JWT authentication with a per-process cache of verified tokens.
+
+JWTAuthentication checks the token signature and loads the user on every
+request, and serializers then load the profile with a second query.
+CachedJWTAuthentication remembers the user and profile behind each
+verified token, so repeat requests with the same token make no
+authentication queries. An entry lives for AUTH_TOKEN_CACHE_TTL at most
+and never beyond the token's own expiry.
+
+Saving or deleting a User or UserProfile drops the cached entries for that
+user in this process (see accounts.signals). Other processes notice within
+AUTH_TOKEN_CACHE_TTL, so keep it short. Revoked tokens (accounts.revocation)
+are refused whether they are cached or not.
+"""
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .revocation import is_revoked
+
+
+class TokenCache:
+    """Bounded LRU of raw token -> (user, validated token) with per-entry expiry"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._stats = Counter()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; set() skips users loaded before one
+        self.generation = 0
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+
+    def get(self, raw_token):
+        with self._lock:
+            entry = self._entries.get(raw_token)
+            if entry is not None and entry[0] <= time.time():
+                self._discard(raw_token)
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(raw_token)
+            self._stats['hits'] += 1
+            return entry[1], entry[2]
+
+    def set(self, raw_token, user, validated_token, expires_at, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._discard(raw_token)
+            self._entries[raw_token] = (expires_at, user, validated_token)
+            self._by_user.setdefault(user.pk, set()).add(raw_token)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for raw_token in list(self._by_user.get(user_id, ())):
+                self._discard(raw_token)
+            self.generation += 1
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self.generation += 1
+
+    def _discard(self, raw_token):
+        entry = self._entries.pop(raw_token, None)
+        if entry is not None:
+            tokens = self._by_user.get(entry[1].pk)
+            tokens.discard(raw_token)
+            if not tokens:
+                del self._by_user[entry[1].pk]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        return {
+            'size': size,
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'invalidations': stats.get('invalidations', 0),
+            'hit_ratio': round(stats.get('hits', 0) / lookups, 4) if lookups else None,
+        }
+
+
+token_cache = TokenCache()
+
+
+def detached_copy(user):
+    """
+    A copy of a cached user (and its loaded profile) for one request, so
+    changes a view makes before failing don't leak into the cache.
+    """
+    clone = copy.copy(user)
+    profile = clone._state.fields_cache.get('profile')
+    if profile is not None:
+        profile = copy.copy(profile)
+        profile._state.fields_cache['user'] = clone
+        clone._state.fields_cache['profile'] = profile
+    return clone
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = token_cache.get(raw_token)
+        if cached is not None:
+            user, validated_token = cached
+            self.check_revoked(validated_token)
+            return detached_copy(user), validated_token
+
+        generation = token_cache.generation
+        validated_token = self.get_validated_token(raw_token)
+        self.check_revoked(validated_token)
+        user = self.get_user(validated_token)
+        ttl = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', timedelta(seconds=60)).total_seconds()
+        expires_at = min(time.time() + ttl, validated_token.get('exp', 0))
+        if expires_at > time.time():
+            token_cache.set(raw_token, user, validated_token, expires_at, generation)
+        return detached_copy(user), validated_token
+
+    def check_revoked(self, validated_token):
+        if is_revoked(validated_token):
+            raise InvalidToken(_('Token is blacklisted'))
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        try:
+            # Load it now so it is cached with the user
+            user.profile
+        except ObjectDoesNotExist:
+            pass
+        return user
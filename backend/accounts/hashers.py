@@ -0,0 +1,155 @@
+"""
+Password hashing in a bounded pool of worker processes.
+
+Hashing or checking a password is a million rounds of PBKDF2 (hundreds of
+milliseconds of CPU). PooledPBKDF2PasswordHasher, first in PASSWORD_HASHERS,
+hands that work to PASSWORD_HASHING_WORKERS processes, so registration,
+login (ModelBackend.authenticate), change password and the admin all use
+the pool without changes of their own. It writes and reads the standard
+pbkdf2_sha256 format, so existing hashes keep working.
+
+Each web process holds at most PASSWORD_HASHING_WORKERS +
+PASSWORD_HASHING_MAX_PENDING hashes in flight. Past that hashing raises
+PasswordHashingBusy straight away instead of queueing behind work it would
+wait seconds for; accounts.middleware answers it with 429 for DRF and
+plain Django views (the admin login) alike. Async views await
+amake_password() and acheck_password(), which don't block the event loop.
+
+PASSWORD_HASHING_WORKERS = 0 hashes in the calling thread, as Django does.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, get_hasher, identify_hasher, make_password,
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_lazy as _
+
+
+class PasswordHashingBusy(Exception):
+    """The hashing pool is full; try again after ``retry_after`` seconds"""
+    message = _('Too many sign-ins at the moment, please try again shortly.')
+    retry_after = 1
+
+    def __init__(self):
+        super().__init__(str(self.message))
+
+
+def _encode(password, salt, iterations):
+    # Runs in a worker process
+    return PBKDF2PasswordHasher().encode(password, salt, iterations)
+
+
+class HashingPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    @property
+    def workers(self):
+        return getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the web process may be threaded
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._slots = threading.BoundedSemaphore(
+                    self.workers + getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', 16)
+                )
+            return self._executor, self._slots
+
+    def submit(self, fn, *args, retry=True):
+        """Queue fn(*args) in a worker process, or raise PasswordHashingBusy"""
+        executor, slots = self._start()
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self.shutdown(executor)
+            # Once with a fresh pool; a pool that can't start at all fails here
+            if not retry:
+                raise
+            return self.submit(fn, *args, retry=False)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda done: self._finished(done, executor, slots))
+        return future
+
+    def _finished(self, future, executor, slots):
+        slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # A worker died (e.g. killed for memory); the next hash starts a fresh pool
+            self.shutdown(executor)
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self, executor=None):
+        """Stop the workers; the next hash starts new ones with the current settings"""
+        with self._lock:
+            if self._executor is None or executor not in (None, self._executor):
+                return
+            executor, self._executor = self._executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = HashingPool()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher that runs in the hashing pool"""
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        return pool.run(_encode, password, salt, iterations or self.iterations)
+
+    async def aencode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        return await pool.arun(_encode, password, salt, iterations or self.iterations)
+
+    async def averify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = await self.aencode(password, decoded['salt'], decoded['iterations'])
+        return constant_time_compare(encoded, encoded_2)
+
+
+async def amake_password(password):
+    """make_password() for async views"""
+    hasher = get_hasher()
+    if password is None or not isinstance(hasher, PooledPBKDF2PasswordHasher):
+        return make_password(password)
+    return await hasher.aencode(password, hasher.salt())
+
+
+async def acheck_password(password, encoded):
+    """
+    check_password() for async views. Hashes stored with an outdated
+    algorithm or iteration count are not upgraded; a sync login does that.
+    """
+    try:
+        hasher = identify_hasher(encoded) if password is not None and encoded else None
+    except ValueError:
+        hasher = None
+    if not isinstance(hasher, PooledPBKDF2PasswordHasher):
+        return check_password(password, encoded)
+    return await hasher.averify(password, encoded)
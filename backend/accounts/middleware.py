@@ -0,0 +1,18 @@
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashers import PasswordHashingBusy
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """
+    Answer PasswordHashingBusy from any view (DRF re-raises exceptions it
+    doesn't know) with 429 and Retry-After, in DRF's error format.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        response = JsonResponse({'detail': str(exception.message)}, status=429)
+        response['Retry-After'] = '%d' % exception.retry_after
+        return response
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from api.images import generate_for_uploads, remember_uploads
 
 
 class UserProfile(models.Model):
@@ -21,12 +24,35 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s profile"
 
 
+class RevokedToken(models.Model):
+    """
+    A JWT that may no longer be used, by its jti (see accounts.revocation).
+    Rows are only needed until the token would have expired anyway;
+    prune_revoked_tokens deletes them after that.
+    """
+    jti = models.UUIDField(primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.jti.hex} (until {self.expires_at})'
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
+    # Creating the profile also caches it on the user
     if created:
         UserProfile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+@receiver(pre_save, sender=UserProfile)
+def note_profile_picture_upload(sender, instance, raw=False, **kwargs):
+    if not raw:
+        remember_uploads(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=UserProfile)
+def generate_profile_picture_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generate_for_uploads(instance)
+
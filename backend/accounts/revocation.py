@@ -0,0 +1,150 @@
+"""
+Revoked JWTs, stored by jti in RevokedToken.
+
+Refresh tokens are revoked as they are rotated, and both tokens of a
+session on logout. revoke() is a single INSERT on the jti primary key, and
+the INSERT doubles as the reuse check: of two refreshes presenting the
+same token, only the one whose insert succeeds gets new tokens. Refreshing
+therefore costs one index write however many tokens have been issued.
+
+Checking whether a token is revoked (every authenticated request, and
+refreshes when rotation is off) goes through an in-memory Bloom filter of
+revoked jtis first, so the usual "not revoked" answer needs no query and
+only filter hits are confirmed in the database. Each process adds rows
+revoked elsewhere to its filter every REVOKED_TOKEN_SYNC_INTERVAL, and
+rebuilds it from the unexpired rows every REVOKED_TOKEN_REBUILD_INTERVAL
+to drop expired jtis.
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+# Rows are read back from slightly before the last sync, so one committed
+# just after its revoked_at was set is not missed
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def token_jti(token):
+    return uuid.UUID(token[api_settings.JTI_CLAIM])
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._synced_from = None
+        self._next_sync = self._next_rebuild = 0
+
+    def _setting(self, name, default):
+        return getattr(settings, name, default)
+
+    def _rebuild(self):
+        now = timezone.now()
+        live = RevokedToken.objects.filter(expires_at__gt=now)
+        capacity = max(self._setting('REVOKED_TOKEN_FILTER_CAPACITY', 1_000_000), 2 * live.count())
+        bloom = BloomFilter(capacity, self._setting('REVOKED_TOKEN_FILTER_ERROR_RATE', 0.001))
+        for jti in live.values_list('jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti.bytes)
+        self._filter = bloom
+        self._synced_from = now - SYNC_OVERLAP
+        self._next_rebuild = time.monotonic() + self._setting(
+            'REVOKED_TOKEN_REBUILD_INTERVAL', timedelta(hours=1)
+        ).total_seconds()
+
+    def _sync(self):
+        now = timezone.now()
+        for jti in RevokedToken.objects.filter(revoked_at__gte=self._synced_from).values_list('jti', flat=True):
+            self._filter.add(jti.bytes)
+        self._synced_from = now - SYNC_OVERLAP
+
+    def _filter_contains(self, jti):
+        with self._lock:
+            monotonic = time.monotonic()
+            if self._filter is None or monotonic >= self._next_rebuild:
+                self._rebuild()
+            elif monotonic >= self._next_sync:
+                self._sync()
+            else:
+                return jti.bytes in self._filter
+            self._next_sync = monotonic + self._setting(
+                'REVOKED_TOKEN_SYNC_INTERVAL', timedelta(seconds=5)
+            ).total_seconds()
+            return jti.bytes in self._filter
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti.bytes)
+
+    def is_revoked(self, token):
+        jti = token_jti(token)
+        if not self._filter_contains(jti):
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+
+revocations = RevocationList()
+
+
+def revoke(token):
+    """Revoke a validated token. Returns False if it was already revoked."""
+    jti = token_jti(token)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=jti, expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+            )
+    except IntegrityError:
+        return False
+    revocations.add(jti)
+    return True
+
+
+def is_revoked(token):
+    return revocations.is_revoked(token)
+
+
+def prune_expired(batch_size=1000):
+    """Delete revocations of tokens that have expired anyway"""
+    deleted = 0
+    while True:
+        jtis = list(
+            RevokedToken.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not jtis:
+            return deleted
+        deleted += RevokedToken.objects.filter(pk__in=jtis).delete()[0]
@@ -1,14 +1,38 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.validators import FileExtensionValidator, get_available_image_extensions
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+
+from api.images import ImageDerivativesField
 from .models import UserProfile
+from .revocation import is_revoked, revoke
+
+
+def set_changed(instance, values):
+    """Set ``values`` on ``instance``; returns the update_fields to save, empty if nothing changed"""
+    changed = [name for name, value in values.items() if getattr(instance, name) != value]
+    for name in changed:
+        setattr(instance, name, values[name])
+    if changed:
+        # auto_now fields are only refreshed when they are listed
+        changed += [field.name for field in instance._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    return changed
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    profile_picture_derivatives = ImageDerivativesField(source='profile_picture')
+
     class Meta:
         model = UserProfile
         fields = ['phone_number', 'address', 'city', 'state', 'postal_code', 'country', 
-                 'profile_picture', 'date_of_birth', 'created_at', 'updated_at']
+                 'profile_picture', 'profile_picture_derivatives', 'date_of_birth', 'created_at', 'updated_at']
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -30,18 +54,23 @@ class UserDetailSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', {})
-        
-        # Update User fields
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.save()
-        
-        # Update UserProfile fields
+
+        user_fields = set_changed(instance, {
+            'first_name': validated_data.get('first_name', instance.first_name),
+            'last_name': validated_data.get('last_name', instance.last_name),
+        })
         profile = instance.profile
-        for attr, value in profile_data.items():
-            setattr(profile, attr, value)
-        profile.save()
-        
+        profile_fields = set_changed(profile, profile_data)
+
+        # Only the changed fields of changed rows are written, so an update
+        # that changes nothing makes no queries
+        if user_fields or profile_fields:
+            with transaction.atomic():
+                if user_fields:
+                    instance.save(update_fields=user_fields)
+                if profile_fields:
+                    profile.save(update_fields=profile_fields)
+
         return instance
 
 
@@ -68,16 +97,19 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
             email=validated_data['email'],
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name']
         )
-        
         user.set_password(validated_data['password'])
-        user.save()
-        
+
+        # One INSERT for the user; accounts.models.create_user_profile adds
+        # the profile in the same transaction
+        with transaction.atomic():
+            user.save()
+
         return user
 
 
@@ -92,7 +124,62 @@ class ChangePasswordSerializer(serializers.Serializer):
         return attrs
 
 
-class ProfilePictureSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = UserProfile
-        fields = ['profile_picture']
+class ProfilePictureSerializer(serializers.Serializer):
+    # Only cheap checks here; the upload is decoded by accounts.process_profile_picture
+    profile_picture = serializers.FileField(
+        validators=[FileExtensionValidator(get_available_image_extensions())]
+    )
+
+    def validate_profile_picture(self, value):
+        limit = getattr(settings, 'PROFILE_PICTURE_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+        if value.size > limit:
+            raise serializers.ValidationError(f"Upload an image smaller than {limit // (1024 * 1024)} MB.")
+        return value
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer backed by accounts.revocation instead of the
+    token_blacklist app. With rotation the presented token is revoked as it
+    is used, and a token that was already used or revoked is refused.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            if not revoke(refresh):
+                raise TokenError('Token is blacklisted')
+        elif is_revoked(refresh):
+            raise TokenError('Token is blacklisted')
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+            if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """Logout: revoke the refresh token and, if given and still valid, the access token"""
+    refresh = serializers.CharField()
+    access = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        revoke(RefreshToken(attrs['refresh']))
+        try:
+            access = AccessToken(attrs['access']) if attrs.get('access') else None
+        except TokenError:
+            # Already expired or invalid, so there is nothing to revoke
+            access = None
+        if access is not None:
+            revoke(access)
+        return {}
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import token_cache
+from .models import UserProfile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def expire_cached_tokens(sender, instance, **kwargs):
+    # Covers password changes too: ChangePasswordView saves the user
+    user_id = instance.pk if sender is User else instance.user_id
+    token_cache.invalidate_user(user_id)
+    # Again once committed, in case a request cached the old row meanwhile
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
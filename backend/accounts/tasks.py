@@ -0,0 +1,48 @@
+import os
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from api.taskqueue import PermanentTaskError, enqueue, task
+from .models import UserProfile
+
+
+@task('accounts.process_profile_picture', concurrency=2)
+def process_profile_picture(profile_id, path, filename):
+    """
+    Decode a staged profile picture upload, fix its orientation, scale it
+    down to PROFILE_PICTURE_MAX_DIMENSION and store it as a JPEG without
+    EXIF metadata.
+    """
+    if not os.path.exists(path):
+        raise PermanentTaskError('Staged upload %s is gone' % path)
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        os.remove(path)
+        raise PermanentTaskError('Upload a valid image. The file you uploaded was either not an image or a corrupted image.')
+
+    limit = getattr(settings, 'PROFILE_PICTURE_MAX_DIMENSION', 1024)
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+
+    try:
+        profile = UserProfile.objects.get(pk=profile_id)
+    except UserProfile.DoesNotExist:
+        os.remove(path)
+        raise PermanentTaskError('Profile %s no longer exists' % profile_id)
+    profile.profile_picture.save('%s.jpg' % Path(filename).stem, ContentFile(output.getvalue()))
+    # The file was stored before the model save, so the upload receivers don't
+    # see it. Derivatives are a task of their own, retried on their own.
+    enqueue('images.generate_derivatives', {'name': profile.profile_picture.name})
+    # Kept until the picture is stored, so a retry can start over
+    os.remove(path)
+    return {'profile_picture': profile.profile_picture.url}
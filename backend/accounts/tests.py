@@ -0,0 +1,315 @@
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.throttling import get_store
+from .authentication import CachedJWTAuthentication, token_cache
+from .hashers import pool
+from .models import RevokedToken, UserProfile
+from .revocation import BloomFilter, is_revoked, prune_expired, revocations, revoke, token_jti
+
+PASSWORD = 'Test-Passw0rd!'
+
+
+def writes(queries):
+    return [
+        query['sql'].split(' ', 3)[:3] for query in queries
+        if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+# A fast hasher: these tests count queries, not hashing
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AccountQueryCountTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocations.reset()
+        # Registrations here would otherwise use up the per-IP register bucket
+        get_store().clear()
+        self.client = APIClient()
+
+    def register(self, username='shopper'):
+        return self.client.post('/api/accounts/register/', {
+            'username': username, 'email': f'{username}@example.com', 'password': PASSWORD,
+            'password2': PASSWORD, 'first_name': 'Test', 'last_name': 'Shopper',
+        }, format='json')
+
+    def sign_in(self):
+        self.register()
+        response = self.client.post('/api/token/', {'username': 'shopper', 'password': PASSWORD}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        # Loads the user, profile and revocation filter into the caches
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 200)
+
+    def test_register_inserts_user_and_profile_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(writes(queries), [
+            ['INSERT', 'INTO', '"auth_user"'],
+            ['INSERT', 'INTO', '"accounts_userprofile"'],
+        ])
+        self.assertTrue(User.objects.get(username='shopper').check_password(PASSWORD))
+
+    def test_login_loads_the_user_only(self):
+        self.register()
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/token/', {'username': 'shopper', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_profile_update_writes_nothing(self):
+        self.sign_in()
+        with self.assertNumQueries(0):
+            response = self.client.patch('/api/accounts/profile/', {
+                'first_name': 'Test', 'profile': {'city': None},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_update_writes_the_changed_field(self):
+        self.sign_in()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch('/api/accounts/profile/', {'profile': {'city': 'Paris'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(writes(queries), [['UPDATE', '"accounts_userprofile"', 'SET']])
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('"city"', update)
+        self.assertNotIn('"phone_number"', update)
+        self.assertEqual(User.objects.get(username='shopper').profile.city, 'Paris')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedJWTAuthenticationTests(TestCase):
+    """Verified tokens are served from token_cache until their user changes"""
+
+    def setUp(self):
+        token_cache.clear()
+        revocations.reset()
+        get_store().clear()
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', PASSWORD, first_name='Test')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+
+    def profile(self):
+        return self.client.get('/api/accounts/profile/')
+
+    def test_repeat_requests_make_no_authentication_queries(self):
+        self.assertEqual(self.profile().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.profile()
+        self.assertEqual(response.data['username'], 'shopper')
+        self.assertEqual(token_cache.stats()['size'], 1)
+
+    def test_saving_the_user_drops_its_entries(self):
+        self.profile()
+        User.objects.filter(pk=self.user.pk).update(first_name='Changed')
+        # A queryset update sends no signal, so the cached user is still served
+        self.assertEqual(self.profile().data['first_name'], 'Test')
+        self.user.refresh_from_db()
+        self.user.save()
+        self.assertEqual(self.profile().data['first_name'], 'Changed')
+
+    def test_saving_the_profile_drops_its_entries(self):
+        self.profile()
+        profile = UserProfile.objects.get(user=self.user)
+        profile.city = 'Paris'
+        profile.save()
+        self.assertEqual(self.profile().data['profile']['city'], 'Paris')
+
+    def test_deactivated_and_deleted_users_are_refused(self):
+        self.profile()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile().status_code, 401)
+        self.user.delete()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_other_users_keep_their_entries(self):
+        other = APIClient()
+        other_user = User.objects.create_user('other', 'other@example.com', PASSWORD)
+        other.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(other_user))
+        self.profile()
+        other.get('/api/accounts/profile/')
+        self.user.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(other.get('/api/accounts/profile/').status_code, 200)
+
+    def test_changes_a_request_makes_do_not_reach_the_cache(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+        authentication = CachedJWTAuthentication()
+        user, _ = authentication.authenticate(request)
+        user.first_name = 'Mutated'
+        user.profile.city = 'Mutated'
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate(request)
+        self.assertEqual(user.first_name, 'Test')
+        self.assertNotEqual(user.profile.city, 'Mutated')
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocations.reset()
+        get_store().clear()
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', PASSWORD)
+
+    def put(self, raw_token, expires_in=60, generation=None):
+        token_cache.set(
+            raw_token, self.user, {}, time.time() + expires_in,
+            token_cache.generation if generation is None else generation,
+        )
+
+    def test_entries_expire(self):
+        self.put(b'live')
+        self.put(b'expired', expires_in=-1)
+        self.assertIsNotNone(token_cache.get(b'live'))
+        self.assertIsNone(token_cache.get(b'expired'))
+
+    def test_entry_lifetime_is_capped_by_the_token_expiry(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=1))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer %s' % token)
+        client.get('/api/accounts/profile/')
+        raw_token = str(token).encode()
+        self.assertIsNotNone(token_cache.get(raw_token))
+        with mock.patch('accounts.authentication.time.time', return_value=time.time() + 2):
+            self.assertIsNone(token_cache.get(raw_token))
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        self.put(b'first')
+        self.put(b'second')
+        token_cache.get(b'first')
+        self.put(b'third')
+        self.assertIsNotNone(token_cache.get(b'first'))
+        self.assertIsNone(token_cache.get(b'second'))
+        self.assertIsNotNone(token_cache.get(b'third'))
+
+    def test_user_loaded_before_an_invalidation_is_not_cached(self):
+        generation = token_cache.generation
+        token_cache.invalidate_user(self.user.pk)
+        self.put(b'stale', generation=generation)
+        self.assertIsNone(token_cache.get(b'stale'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenRevocationTests(TestCase):
+    """Logout and refresh rotation revoke tokens by jti"""
+
+    def setUp(self):
+        token_cache.clear()
+        revocations.reset()
+        get_store().clear()
+        User.objects.create_user('shopper', 'shopper@example.com', PASSWORD)
+        self.client = APIClient()
+        self.tokens = self.client.post(
+            '/api/token/', {'username': 'shopper', 'password': PASSWORD}, format='json'
+        ).data
+
+    def profile(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + access)
+        return self.client.get('/api/accounts/profile/')
+
+    def refresh(self, refresh):
+        self.client.credentials()
+        return self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_logout_revokes_both_tokens(self):
+        # Cached by the first request, refused all the same after logout
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 200)
+        response = self.client.post('/api/token/revoke/', self.tokens, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+    def test_refresh_rotates_and_refuses_reuse(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.tokens['refresh'])
+        self.assertEqual(self.profile(response.data['access']).status_code, 200)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+
+    def test_unrevoked_tokens_are_checked_without_a_query(self):
+        token = AccessToken(self.tokens['access'])
+        self.assertFalse(is_revoked(token))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_revoked(token))
+
+    @override_settings(REVOKED_TOKEN_SYNC_INTERVAL=timedelta(0))
+    def test_revocations_from_other_processes_are_picked_up(self):
+        token = AccessToken(self.tokens['access'])
+        self.assertFalse(is_revoked(token))
+        # Revoked elsewhere: only the row, not this process's filter
+        RevokedToken.objects.create(jti=token_jti(token), expires_at=timezone.now() + timedelta(days=1))
+        self.assertTrue(is_revoked(token))
+
+    def test_prune_expired_keeps_live_revocations(self):
+        live, expired = AccessToken(self.tokens['access']), AccessToken(self.tokens['access'])
+        expired.set_jti()
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        revoke(live)
+        revoke(expired)
+        self.assertFalse(revoke(live))
+        self.assertEqual(prune_expired(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), [token_jti(live)])
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, 0.01)
+        members = [uuid.uuid4().bytes for _ in range(1000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['accounts.hashers.PooledPBKDF2PasswordHasher'],
+    PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=0,
+)
+class HashingPoolTests(TestCase):
+    def setUp(self):
+        get_store().clear()
+        pool.shutdown()
+        self.addCleanup(pool.shutdown)
+
+    def fill_pool(self):
+        # Takes the only slot, as a hash in progress would; no worker is started
+        slots = pool._start()[1]
+        slots.acquire()
+        self.addCleanup(slots.release)
+
+    def test_full_pool_answers_api_sign_ins_with_429(self):
+        self.fill_pool()
+        response = APIClient().post('/api/token/', {'username': 'shopper', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIn('detail', response.json())
+
+    def test_full_pool_answers_admin_sign_ins_with_429(self):
+        self.fill_pool()
+        response = Client().post('/admin/login/', {'username': 'admin', 'password': PASSWORD})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_pool_that_cannot_start_fails_after_one_retry(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = BrokenProcessPool('cannot start')
+        with mock.patch('accounts.hashers.ProcessPoolExecutor', return_value=executor):
+            with self.assertRaises(BrokenProcessPool):
+                pool.submit(len, 'x')
+        self.assertEqual(executor.submit.call_count, 2)
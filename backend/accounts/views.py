@@ -4,12 +4,19 @@ from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.urls import reverse
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenViewBase
+
+from api.middleware import SerializerTimingMixin
+from api.taskqueue import enqueue, stage_upload
 from .serializers import (
     UserSerializer, 
     UserDetailSerializer,
     RegisterSerializer,
     ChangePasswordSerializer,
-    ProfilePictureSerializer
+    ProfilePictureSerializer,
+    TokenRevokeSerializer
 )
 
 
@@ -17,9 +24,19 @@ class RegisterView(CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
+    throttle_scope = 'register'
+
+
+class TokenObtainView(TokenObtainPairView):
+    throttle_scope = 'login'
 
 
-class UserProfileView(RetrieveUpdateAPIView):
+class TokenRevokeView(TokenViewBase):
+    """Log out by revoking the session's tokens (see accounts.revocation)"""
+    serializer_class = TokenRevokeSerializer
+
+
+class UserProfileView(SerializerTimingMixin, RetrieveUpdateAPIView):
     serializer_class = UserDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -53,11 +70,22 @@ class ProfilePictureView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def put(self, request):
-        user = request.user
-        serializer = ProfilePictureSerializer(user.profile, data=request.data, partial=True)
+        serializer = ProfilePictureSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            upload = serializer.validated_data['profile_picture']
+            path = stage_upload(upload)
+            with transaction.atomic():
+                queued = enqueue('accounts.process_profile_picture', {
+                    'profile_id': request.user.profile.pk,
+                    'path': path,
+                    'filename': upload.name,
+                }, owner=request.user)
+            status_url = request.build_absolute_uri(reverse('task_status', args=[queued.pk]))
+            return Response(
+                {"task": str(queued.pk), "status": queued.status, "status_url": status_url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url},
+            )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
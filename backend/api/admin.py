@@ -1,3 +1,20 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import IdempotencyKey, Task
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'scope', 'user', 'status', 'response_status', 'created_at']
+    list_filter = ['scope', 'status']
+    search_fields = ['key', 'user__username']
+    raw_id_fields = ['user']
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'owner', 'run_after', 'created_at']
+    list_filter = ['name', 'status']
+    search_fields = ['id', 'owner__username']
+    raw_id_fields = ['owner']
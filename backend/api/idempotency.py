@@ -0,0 +1,130 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .transactions import immediate_atomic
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.path, data], sort_keys=True, cls=DjangoJSONEncoder
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(request, scope, key, fingerprint):
+    """
+    Insert the key as in progress in its own committed transaction, so
+    concurrent duplicates see it. Returns (record, claimed).
+    """
+    now = timezone.now()
+    stale_before = now - getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', timedelta(seconds=60))
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=request.user, scope=scope, key=key, fingerprint=fingerprint, locked_at=now
+            ), True
+    except IntegrityError:
+        pass
+
+    # An in-progress key whose worker died is taken over after the lock timeout
+    taken_over = IdempotencyKey.objects.filter(
+        user=request.user, scope=scope, key=key, fingerprint=fingerprint,
+        status='in_progress', locked_at__lt=stale_before,
+    ).update(locked_at=now)
+    try:
+        record = IdempotencyKey.objects.get(user=request.user, scope=scope, key=key)
+    except IdempotencyKey.DoesNotExist:
+        # Released by a failed attempt in the meantime
+        return _claim(request, scope, key, fingerprint)
+    return record, bool(taken_over)
+
+
+def idempotent_response(request, scope, build_response):
+    """
+    Run build_response at most once per (user, scope, Idempotency-Key).
+
+    A retry with the same key and body gets the stored response back without
+    running build_response again. A retry with a different body gets 422.
+    A duplicate that arrives while the first request is still running gets
+    409 at once, with Retry-After set to IDEMPOTENCY_RETRY_AFTER seconds.
+    Only successful responses are stored; a failed attempt frees the key.
+    """
+    key = request.META.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return build_response()
+    if len(key) > 255:
+        return Response(
+            {'detail': 'Idempotency-Key must be at most 255 characters.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fingerprint = request_fingerprint(request)
+    record, claimed = _claim(request, scope, key, fingerprint)
+
+    if not claimed:
+        if record.fingerprint != fingerprint:
+            return Response(
+                {'detail': 'Idempotency-Key was already used with a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.status == 'completed':
+            return _replay(record)
+        # Tell the client to come back rather than holding a worker while
+        # the first attempt finishes
+        response = Response(
+            {'detail': 'A request with this Idempotency-Key is still being processed.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+        response['Retry-After'] = str(getattr(settings, 'IDEMPOTENCY_RETRY_AFTER', 1))
+        return response
+
+    try:
+        # build_response validates (reads) before it writes
+        with immediate_atomic():
+            response = build_response()
+            if 200 <= response.status_code < 300:
+                # Stored in the same transaction as the side effects it describes
+                IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status='completed',
+                    response_status=response.status_code,
+                    response_body=response.data,
+                )
+    except Exception:
+        IdempotencyKey.objects.filter(pk=record.pk, status='in_progress').delete()
+        raise
+
+    if not 200 <= response.status_code < 300:
+        IdempotencyKey.objects.filter(pk=record.pk, status='in_progress').delete()
+    return response
+
+
+def purge_expired_keys(batch_size=1000):
+    cutoff = timezone.now() - getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
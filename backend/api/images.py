@@ -0,0 +1,174 @@
+"""
+Resized derivatives of uploaded images.
+
+Every source image gets one file per size in IMAGE_DERIVATIVE_SIZES and
+format in IMAGE_DERIVATIVE_FORMATS, stored next to the originals under a
+name derived from the source name:
+
+    products/2024/05/01/shirt.jpg -> derivatives/products/2024/05/01/shirt.jpg/card.webp
+
+Names are deterministic, so serializers can link to derivatives without
+touching storage. Files are written by a background task after an upload
+commits, or by the generate_image_derivatives command; anything still
+missing is created on the first request by derivative_view, and the stored
+file is the cache.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+from .taskqueue import enqueue
+
+DERIVATIVES_DIR = 'derivatives'
+# Pillow encoder names and save options per derivative format
+FORMATS = {
+    'webp': ('WEBP', {'method': 4}),
+    'jpeg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+class DerivativeError(Exception):
+    pass
+
+
+def get_sizes():
+    return getattr(settings, 'IMAGE_DERIVATIVE_SIZES', {'thumb': 160, 'card': 480, 'detail': 1200})
+
+
+def get_formats():
+    return [fmt for fmt in getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ['webp', 'jpeg']) if fmt in FORMATS]
+
+
+def derivative_name(source_name, size, fmt):
+    return '%s/%s/%s.%s' % (DERIVATIVES_DIR, source_name, size, fmt)
+
+
+def get_source_dirs():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_SOURCE_DIRS', ['products/', 'profile_pictures/']))
+
+
+def parse_derivative_name(name):
+    """
+    Split a derivative name into (source name, size, format), or raise
+    DerivativeError. Only configured sizes and formats of images under
+    IMAGE_DERIVATIVE_SOURCE_DIRS have derivatives.
+    """
+    prefix, _, rest = name.partition('/')
+    source_name, _, filename = rest.rpartition('/')
+    size, _, fmt = filename.partition('.')
+    if (
+        prefix != DERIVATIVES_DIR or not source_name.startswith(get_source_dirs())
+        or size not in get_sizes() or fmt not in get_formats()
+    ):
+        raise DerivativeError('Not a derivative name: %s' % name)
+    return source_name, size, fmt
+
+
+def render_derivative(image, width, fmt):
+    """Encode a copy of a decoded PIL image scaled down to at most ``width`` pixels wide"""
+    encoder, options = FORMATS[fmt]
+    resized = image.copy()
+    if resized.width > width:
+        resized.thumbnail((width, round(resized.height * width / resized.width)), Image.LANCZOS)
+    if resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    output = BytesIO()
+    # No exif= argument, so camera metadata is not carried over
+    resized.save(output, encoder, quality=getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', 80), **options)
+    return output.getvalue()
+
+
+def _store(name, content, storage):
+    saved = storage.save(name, ContentFile(content))
+    if saved != name:
+        # Another process stored it first; keep theirs
+        storage.delete(saved)
+
+
+def generate_derivatives(source_name, storage=None, force=False, only=None):
+    """
+    Write the missing derivatives of ``source_name`` (all of them with
+    ``force``), or just the (size, format) pairs in ``only``. Returns the
+    names written. Raises DerivativeError when the source can't be decoded.
+    """
+    storage = storage or default_storage
+    sizes = get_sizes()
+    wanted = only or [(size, fmt) for size in sizes for fmt in get_formats()]
+    if not force:
+        wanted = [(size, fmt) for size, fmt in wanted if not storage.exists(derivative_name(source_name, size, fmt))]
+    if not wanted:
+        return []
+
+    try:
+        with storage.open(source_name, 'rb') as source:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError, SuspiciousFileOperation, Image.DecompressionBombError) as exc:
+        raise DerivativeError('Cannot decode %s: %s' % (source_name, exc))
+
+    written = []
+    for size, fmt in wanted:
+        name = derivative_name(source_name, size, fmt)
+        if force and storage.exists(name):
+            storage.delete(name)
+        _store(name, render_derivative(image, sizes[size], fmt), storage)
+        written.append(name)
+    return written
+
+
+def remember_uploads(instance, *field_names):
+    """pre_save helper: note which image fields hold a file that this save will upload"""
+    instance._image_uploads = [
+        field_name for field_name in field_names
+        if getattr(instance, field_name) and not getattr(instance, field_name)._committed
+    ]
+
+
+def generate_for_uploads(instance):
+    """post_save helper: queue derivatives of the uploads noted by remember_uploads"""
+    names = [getattr(instance, field_name).name for field_name in getattr(instance, '_image_uploads', ())]
+    instance._image_uploads = []
+    if getattr(settings, 'IMAGE_DERIVATIVES_ON_UPLOAD', True):
+        for name in names:
+            # Stored with the caller's transaction and run by the task worker (api.tasks)
+            enqueue('images.generate_derivatives', {'name': name})
+
+
+def derivative_urls(source_name, request=None, storage=None):
+    """
+    ``{'sizes': {size: {'width': w, fmt: url}}, 'srcset': {fmt: 'url 160w, ...'}}``
+    for an image field value, or None when it is empty.
+    """
+    if not source_name:
+        return None
+    storage = storage or default_storage
+    sizes, formats = get_sizes(), get_formats()
+    result = {'sizes': {}, 'srcset': {}}
+    for size, width in sizes.items():
+        entry = {'width': width}
+        for fmt in formats:
+            url = storage.url(derivative_name(source_name, size, fmt))
+            entry[fmt] = request.build_absolute_uri(url) if request is not None else url
+        result['sizes'][size] = entry
+    for fmt in formats:
+        result['srcset'][fmt] = ', '.join(
+            '%s %sw' % (result['sizes'][size][fmt], width) for size, width in sizes.items()
+        )
+    return result
+
+
+class ImageDerivativesField(serializers.Field):
+    """Read-only srcset-ready map of an image field's derivatives"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return derivative_urls(value.name if value else None, self.context.get('request'))
@@ -0,0 +1,111 @@
+import itertools
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from orders.views import OrderViewSet
+from products.async_views import make_view
+from products.models import Category, Product
+from products.views import ProductViewSet
+
+# SQLite: "SCAN products_product" without an index; PostgreSQL: "Seq Scan on products_product"
+SCAN_PATTERN = re.compile(r'\bSCAN (\w+)(?!.*\bINDEX\b)|Seq Scan on (\w+)')
+SORT_PATTERN = re.compile(r'USE TEMP B-TREE FOR ORDER BY|\bSort\b')
+
+SORT_ORDERS = ('name', 'price_asc', 'price_desc', 'newest')
+
+
+def product_cases(category_slug):
+    filters = {
+        'category': (None, category_slug),
+        'price': (None, ('10', '500')),
+        'in_stock': (None, 'true'),
+    }
+    for category, price, in_stock in itertools.product(*filters.values()):
+        for sort_by in SORT_ORDERS:
+            params = {'sort_by': sort_by}
+            if category:
+                params['category'] = category
+            if price:
+                params['price_min'], params['price_max'] = price
+            if in_stock:
+                params['in_stock'] = in_stock
+            yield 'list', params
+    yield 'list', {'search': 'shirt'}
+    yield 'featured', {}
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the queries behind each product and order filter combination and flag full table '
+        'scans and sorts. Run it against a database of realistic size (see benchmarks/README.md): '
+        'planners prefer scans on small tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true', help='Exit with an error when anything is flagged')
+
+    def handle(self, *args, **options):
+        tables = set(connection.introspection.table_names())
+        checked = flagged = 0
+        for label, queryset in self.queries():
+            plan = queryset.explain()
+            problems = self.problems(plan, tables)
+            checked += 1
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING('%s: %s' % (label, '; '.join(problems))))
+            else:
+                self.stdout.write('%s: ok' % label)
+            if options['verbosity'] >= 2 or (problems and options['verbosity'] >= 1):
+                for line in plan.splitlines():
+                    self.stdout.write('    ' + line)
+
+        summary = '%s queries checked, %s flagged' % (checked, flagged)
+        if flagged and options['fail']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def problems(self, plan, tables):
+        problems = []
+        for line in plan.splitlines():
+            match = SCAN_PATTERN.search(line)
+            table = match and (match.group(1) or match.group(2))
+            if table in tables:
+                problems.append('full scan of %s' % table)
+            elif SORT_PATTERN.search(line):
+                problems.append('sort without an index')
+        return list(dict.fromkeys(problems))
+
+    def queries(self):
+        # A host in ALLOWED_HOSTS: the paginator builds absolute next/previous links
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        category = Category.objects.order_by('pk').first()
+        for action, params in product_cases(category.slug if category else 'example'):
+            view = make_view(ProductViewSet, action, factory.get('/api/products/', params))
+            queryset = view.get_queryset()
+            if action == 'list':
+                queryset = view.paginator._prepare(queryset, view.request)[0]
+            else:
+                queryset = queryset.filter(in_stock=True)[:8]
+            yield 'products %s %s' % (action, params or ''), queryset
+
+        product = Product.objects.filter(is_active=True).order_by('pk').first()
+        view = make_view(ProductViewSet, 'retrieve', factory.get('/api/products/'), slug=getattr(product, 'slug', ''))
+        # QuerySet.get() drops the ordering, so the detail lookups do too
+        yield 'products retrieve', view.get_queryset().filter(slug=view.kwargs['slug']).order_by()
+
+        user = User.objects.filter(orders__isnull=False).order_by('pk').first()
+        if user is None:
+            self.stderr.write('No orders in the database, skipping the order queries')
+            return
+        for label, params in (('list', {}), ('list', {'view': 'summary'}), ('retrieve', {})):
+            view = make_view(OrderViewSet, label, factory.get('/api/orders/', params))
+            view.request.user = user
+            queryset = view.get_queryset()
+            if label == 'retrieve':
+                queryset = queryset.filter(pk=user.orders.values_list('pk', flat=True)[:1]).order_by()
+            yield 'orders %s %s' % (label, params or ''), queryset
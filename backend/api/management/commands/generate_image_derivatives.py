@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from api.images import DerivativeError, generate_derivatives
+from products.models import Product, ProductImage
+
+SOURCES = {
+    'products': (Product, 'image'),
+    'product-images': (ProductImage, 'image'),
+    'profile-pictures': (UserProfile, 'profile_picture'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate missing image derivatives for existing media'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(SOURCES), action='append',
+                            help='Limit to one kind of image; may be repeated')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+        parser.add_argument('--workers', type=int, default=4, help='Images processed concurrently')
+
+    def handle(self, *args, **options):
+        def process(name):
+            try:
+                return len(generate_derivatives(name, force=options['force'])), None
+            except DerivativeError as exc:
+                return 0, exc
+
+        written = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for kind in options['only'] or sorted(SOURCES):
+                model, field_name = SOURCES[kind]
+                names = (
+                    model.objects.exclude(**{field_name: ''}).exclude(**{field_name + '__isnull': True})
+                    .order_by().values_list(field_name, flat=True).distinct().iterator()
+                )
+                for count, error in pool.map(process, names):
+                    written += count
+                    if error:
+                        failed += 1
+                        self.stderr.write(str(error))
+                self.stdout.write('Processed %s' % kind)
+
+        self.stdout.write(self.style.SUCCESS('Wrote %s derivatives (%s images failed)' % (written, failed)))
@@ -0,0 +1,49 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from api.taskqueue import claim_next, fail_abandoned, run, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks until stopped (SIGINT/SIGTERM finish the running tasks first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Tasks run at once by this worker')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--name', action='append', dest='names', help='Only run tasks with this name; may be repeated')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        stopping = threading.Event()
+        slots = threading.Semaphore(options['concurrency'])
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+        def execute(claimed):
+            try:
+                run(claimed, worker)
+            finally:
+                connection.close()
+                slots.release()
+
+        self.stdout.write(f'Worker {worker} running {options["concurrency"]} tasks at a time')
+        with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='task') as pool:
+            while not stopping.is_set():
+                slots.acquire()
+                close_old_connections()
+                fail_abandoned()
+                claimed = claim_next(worker, options['names'])
+                if claimed is None:
+                    slots.release()
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll_interval'])
+                    continue
+                self.stdout.write(f'Running {claimed.name} {claimed.pk} (attempt {claimed.attempts})')
+                pool.submit(execute, claimed)
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped'))
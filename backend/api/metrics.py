@@ -0,0 +1,99 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the per-request query count histogram buckets
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process request metrics, labelled by endpoint and method"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.serializer_seconds = defaultdict(float)
+        self.responses = defaultdict(int)
+        self.slow_requests = defaultdict(int)
+
+    def observe(self, endpoint, method, status_code, timings, slow=False):
+        labels = (endpoint, method)
+        with self._lock:
+            self.durations[labels].observe(timings.total)
+            self.query_counts[labels].observe(timings.queries)
+            self.db_seconds[labels] += timings.db
+            self.serializer_seconds[labels] += timings.serializer
+            self.responses[labels + (str(status_code),)] += 1
+            if slow:
+                self.slow_requests[labels] += 1
+
+    def render_prometheus(self):
+        with self._lock:
+            lines = []
+            self._render_histogram(lines, 'api_request_duration_seconds',
+                                   'Wall time of API requests.', self.durations)
+            self._render_histogram(lines, 'api_request_db_queries',
+                                   'Database queries issued per API request.', self.query_counts)
+            self._render_counter(lines, 'api_request_db_seconds_total',
+                                 'Time spent in database queries.', self.db_seconds)
+            self._render_counter(lines, 'api_request_serializer_seconds_total',
+                                 'Time spent producing serializer data.', self.serializer_seconds)
+            self._render_counter(lines, 'api_responses_total',
+                                 'API responses by status code.', self.responses,
+                                 ('endpoint', 'method', 'status'))
+            self._render_counter(lines, 'api_slow_requests_total',
+                                 'Requests slower than API_SLOW_REQUEST_THRESHOLD_MS.', self.slow_requests)
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, lines, name, help_text, histograms):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s histogram' % name)
+        for labels, histogram in sorted(histograms.items()):
+            label_text = _labels(('endpoint', 'method'), labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, label_text, _number(bound), cumulative))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (name, label_text, histogram.count))
+            lines.append('%s_sum{%s} %s' % (name, label_text, _number(histogram.total)))
+            lines.append('%s_count{%s} %d' % (name, label_text, histogram.count))
+
+    def _render_counter(self, lines, name, help_text, values, label_names=('endpoint', 'method')):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s counter' % name)
+        for labels, value in sorted(values.items()):
+            lines.append('%s{%s} %s' % (name, _labels(label_names, labels), _number(value)))
+
+
+def _labels(names, values):
+    return ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
@@ -1,7 +1,168 @@
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('api.requests')
+
+_current_timings = ContextVar('api_request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self):
+        return ', '.join([
+            'total;dur=%.1f' % (self.total * 1000),
+            'db;dur=%.1f;desc="%d queries"' % (self.db * 1000, self.queries),
+            'serialize;dur=%.1f' % (self.serializer * 1000),
+        ])
+
+
+@contextmanager
+def serializer_timer():
+    """Attribute the enclosed time to serialization for the current request"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    # Nested serializers run inside their parent's .data; count only the outermost
+    timings.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer_depth -= 1
+        if not timings.serializer_depth:
+            timings.serializer += time.perf_counter() - start
+
+
+_timed_serializer_classes = {}
+
+
+def timed_serializer_class(serializer_class):
+    """A subclass of ``serializer_class`` whose to_representation() runs under serializer_timer()"""
+    timed = _timed_serializer_classes.get(serializer_class)
+    if timed is None:
+        def to_representation(self, instance):
+            with serializer_timer():
+                return super(timed, self).to_representation(instance)
+
+        timed = type(serializer_class.__name__, (serializer_class,), {
+            '__module__': serializer_class.__module__,
+            '__qualname__': serializer_class.__qualname__,
+            'to_representation': to_representation,
+        })
+        _timed_serializer_classes[serializer_class] = timed
+    return timed
+
+
+class SerializerTimingMixin:
+    """
+    For generic views: the serializers made by get_serializer() count
+    towards the request's serialize time.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = timed_serializer_class(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+def endpoint_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
 class ApiMiddleware:
+    """
+    Per-request instrumentation: wall time, database query count and time
+    (through connection.execute_wrapper) and serializer time (for views
+    using SerializerTimingMixin). Reported in a
+    Server-Timing header, logged when slower than
+    API_SLOW_REQUEST_THRESHOLD_MS, and aggregated per endpoint for the
+    Prometheus endpoint at /api/metrics/.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        # Stay async under ASGI so async views aren't pushed into a thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        try:
+            with self.timed_connections(timings):
+                response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+
+        timings.total = time.perf_counter() - timings.start
+        self.record(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        try:
+            with self.timed_connections(timings):
+                response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+
+        timings.total = time.perf_counter() - timings.start
+        self.record(request, response, timings)
         return response
+
+    def timed_connections(self, timings):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings))
+        return stack
+
+    def record(self, request, response, timings):
+        threshold = getattr(settings, 'API_SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+        slow = timings.total >= threshold
+        endpoint = endpoint_label(request)
+
+        if getattr(settings, 'API_SERVER_TIMING', True):
+            response['Server-Timing'] = timings.server_timing()
+        registry.observe(endpoint, request.method, response.status_code, timings, slow=slow)
+
+        if slow:
+            logger.warning(
+                'Slow request %s %s -> %s in %.1fms (%d queries, %.1fms db, %.1fms serialize)',
+                request.method, request.get_full_path(), response.status_code,
+                timings.total * 1000, timings.queries, timings.db * 1000, timings.serializer * 1000,
+            )
@@ -0,0 +1,46 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    With the default COMPACT_JSON / UNICODE_JSON settings the output matches
+    JSONRenderer for the payloads this API produces: values orjson would
+    format differently (datetimes, Decimals, lazy strings) are handed to
+    DRF's own encoder. Indented output, ASCII-only output and anything
+    orjson can't encode go through the stdlib path.
+
+    Python floats are the exception, as orjson formats them itself:
+
+    - exponents lose the sign and zero padding: 1e16 and 1e-7, where the
+      stdlib writes 1e+16 and 1e-07 (both parse to the same value);
+    - NaN and Infinity become null, where JSONRenderer (STRICT_JSON) raises
+      ValueError.
+
+    Prices and other money fields are Decimals and are not affected.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let the stdlib decide
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for embedding in <script> tags
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,3 +1,19 @@
 from rest_framework import serializers
 
+from .models import Task
+
 # API common serializers would go here if needed
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = ['id', 'name', 'status', 'attempts', 'result', 'error', 'created_at', 'updated_at']
+
+    def get_error(self, obj):
+        # Only the final line; tracebacks stay in the admin
+        if obj.status != Task.FAILED or not obj.error:
+            return None
+        return obj.error.strip().splitlines()[-1]
@@ -0,0 +1,215 @@
+"""
+Sparse fieldsets and expandable relations.
+
+    ?fields=id,name,category.name       only these fields (dotted paths reach
+                                        into nested serializers)
+    ?expand=images,items.variant        add relations that are left out of
+                                        the default representation
+
+SparseFieldsetMixin makes a serializer honour both parameters of the
+request in its context. SparseQuerysetMixin lets a view load only what
+the trimmed serializer reads: only() for columns, select_related() for
+embedded forward relations and Prefetch() for embedded reverse ones.
+Without either parameter nothing changes.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ForeignObjectRel, Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    return {tuple(part for part in path.strip().split('.') if part) for path in (value or '').split(',')} - {()}
+
+
+def requested_paths(request):
+    params = getattr(request, 'query_params', None)
+    if params is None:
+        return None, set()
+    fields = parse_paths(params.get(FIELDS_PARAM)) if params.get(FIELDS_PARAM) else None
+    return fields, parse_paths(params.get(EXPAND_PARAM))
+
+
+def is_sparse_request(request):
+    fields, expand = requested_paths(request)
+    return fields is not None or bool(expand)
+
+
+def _below(paths, prefix):
+    size = len(prefix)
+    return {path[size:] for path in paths if path[:size] == prefix}
+
+
+def _heads(paths):
+    return {path[0] for path in paths if path}
+
+
+class SparseFieldsetMixin:
+    """
+    ``expandable_fields`` maps a field name to ``(serializer, kwargs)`` for
+    relations that are only included on ``?expand=`` (or when named in
+    ``?fields=``); the serializer may be given as a dotted path.
+    ``prefetch_for`` maps SerializerMethodField names to a function that
+    takes a lookup prefix and returns the Prefetch objects the method needs.
+    """
+    expandable_fields = {}
+    prefetch_for = {}
+
+    def __init__(self, *args, **kwargs):
+        # Where this serializer sits in the response when it isn't bound as
+        # a field, e.g. one built inside a SerializerMethodField
+        self.sparse_path = kwargs.pop('sparse_path', None)
+        super().__init__(*args, **kwargs)
+
+    def field_path(self):
+        if self.sparse_path is not None:
+            return list(self.sparse_path)
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return names[::-1]
+
+    def sparse_spec(self):
+        """(field names to keep or None for all, field names to expand) for this serializer"""
+        fields, expand = requested_paths(self.context.get('request'))
+        prefix = tuple(self.field_path())
+        expand = _heads(_below(expand, prefix))
+        if fields is None:
+            return None, expand
+        below_fields = _below(fields, prefix)
+        if prefix and (() in below_fields or not below_fields):
+            # The parent asked for this relation as a whole
+            return None, expand
+        keep = _heads(below_fields)
+        return keep, expand | (keep & set(self.expandable_fields))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        keep, expand = self.sparse_spec()
+        for name in expand & set(self.expandable_fields):
+            serializer_class, kwargs = self.expandable_fields[name]
+            if isinstance(serializer_class, str):
+                serializer_class = import_string(serializer_class)
+            fields[name] = serializer_class(**kwargs)
+        if keep is not None:
+            fields = fields.__class__((name, field) for name, field in fields.items() if name in keep)
+        return fields
+
+
+def _serializer_of(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def plan_queryset(model, serializer, annotations=(), prefix=''):
+    """
+    Work out what ``serializer`` reads from ``model`` rows. Returns
+    (only, select_related, prefetches) with lookups relative to the model
+    and prefixed with ``prefix``; ``only`` is None when some field's
+    source can't be traced to a column, in which case every column loads.
+    """
+    only = {prefix + model._meta.pk.name}
+    select = []
+    prefetches = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            factory = getattr(serializer, 'prefetch_for', {}).get(name)
+            if factory:
+                prefetches.extend(factory(prefix))
+            continue
+        source = field.source
+        if source == '*' or '.' in source:
+            only = None
+            continue
+        if source in annotations:
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            # A model property or method; it may read any column
+            only = None
+            continue
+
+        nested = _serializer_of(field)
+        if nested is None:
+            if only is not None:
+                only.add(prefix + model_field.name)
+            continue
+
+        related_model = model_field.related_model
+        if model_field.many_to_many or model_field.one_to_many:
+            inner_only, inner_select, inner_prefetches = plan_queryset(related_model, nested)
+            queryset = related_model._default_manager.all()
+            if inner_only is not None:
+                if isinstance(model_field, ForeignObjectRel):
+                    # The prefetcher joins rows back through this foreign key
+                    inner_only.add(model_field.field.name)
+                queryset = queryset.only(*inner_only)
+            if inner_select:
+                queryset = queryset.select_related(*inner_select)
+            if inner_prefetches:
+                queryset = queryset.prefetch_related(*inner_prefetches)
+            prefetches.append(Prefetch(prefix + source, queryset=queryset))
+        else:
+            # Forward foreign key or either side of a one-to-one: join it
+            path = prefix + source
+            inner_only, inner_select, inner_prefetches = plan_queryset(related_model, nested, prefix=path + '__')
+            select.append(path)
+            select.extend(inner_select)
+            prefetches.extend(inner_prefetches)
+            if only is not None:
+                if model_field.concrete:
+                    only.add(path)
+                else:
+                    only.add(path + '__' + model_field.field.name)
+                if inner_only is None:
+                    only = None
+                else:
+                    only |= inner_only
+    return only, select, prefetches
+
+
+def sparse_queryset(queryset, serializer, required=()):
+    """
+    Replace the select/prefetch/only setup of ``queryset`` with what
+    ``serializer`` needs. Fields in ``required`` are always loaded.
+    """
+    annotations = set(queryset.query.annotations)
+    only, select, prefetches = plan_queryset(queryset.model, serializer, annotations)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if only is not None:
+        # Ordering columns are read back, e.g. for pagination cursors
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        only |= {field.lstrip('-') for field in ordering if field.lstrip('-') not in annotations}
+        queryset = queryset.only(*only, *required)
+    return queryset
+
+
+class SparseQuerysetMixin:
+    """
+    For viewsets whose serializers use SparseFieldsetMixin. get_queryset()
+    passes its result through sparse_queryset() so ?fields= and ?expand=
+    reads load only what the response shows.
+    """
+    # Loaded even when the response leaves them out, e.g. for cache tags
+    sparse_required_fields = ()
+
+    def sparse_queryset(self, queryset):
+        if self.request.method in ('GET', 'HEAD') and is_sparse_request(self.request):
+            queryset = sparse_queryset(queryset, self.get_serializer(), self.sparse_required_fields)
+        return queryset
@@ -0,0 +1,168 @@
+"""
+Database-backed background task queue.
+
+Task functions are registered with @task and live in each app's tasks
+module. enqueue() stores a Task row in the caller's transaction, so work is
+only picked up once the data it depends on has committed. The run_tasks
+command claims queued rows with a conditional UPDATE, so any number of
+workers can share the table without a broker.
+"""
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+
+logger = logging.getLogger('api.tasks')
+
+REGISTRY = {}
+
+
+class PermanentTaskError(Exception):
+    """Raised by a task whose input can never succeed; it fails without retrying"""
+
+
+class TaskDefinition:
+    def __init__(self, name, func, max_attempts, concurrency):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def task(name, max_attempts=3, concurrency=None):
+    """Register a function as a task. ``concurrency`` caps how many run at once across all workers."""
+    def decorator(func):
+        REGISTRY[name] = TaskDefinition(name, func, max_attempts, concurrency)
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def worker_name():
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def _lock_timeout():
+    return getattr(settings, 'TASK_LOCK_TIMEOUT', timedelta(minutes=10))
+
+
+def stage_upload(uploaded_file):
+    """
+    Copy an upload to TASK_STAGING_DIR for a task to pick up and return its
+    path. Workers must see the same directory as the web processes.
+    """
+    staging_dir = Path(settings.TASK_STAGING_DIR)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    path = staging_dir / ('%s%s' % (uuid.uuid4().hex, Path(uploaded_file.name).suffix.lower()))
+    with open(path, 'wb') as staged:
+        for chunk in uploaded_file.chunks():
+            staged.write(chunk)
+    return str(path)
+
+
+def enqueue(name, payload=None, owner=None, delay=None):
+    definition = REGISTRY.get(name)
+    queued = Task.objects.create(
+        name=name,
+        payload=payload or {},
+        owner=owner,
+        max_attempts=definition.max_attempts if definition else 3,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+    if getattr(settings, 'TASKS_EAGER', False):
+        # Development without a worker: run in-process once the row commits
+        transaction.on_commit(lambda: _run_eagerly(queued.pk))
+    return queued
+
+
+def _run_eagerly(task_id):
+    if claim(task_id, 'eager'):
+        run(Task.objects.get(pk=task_id), 'eager')
+
+
+def claim(task_id, worker):
+    """Take a queued (or abandoned) task for ``worker``; False when someone else got it first"""
+    now = timezone.now()
+    return bool(Task.objects.filter(
+        Q(status=Task.QUEUED) | Q(status=Task.RUNNING, locked_at__lt=now - _lock_timeout()),
+        pk=task_id,
+    ).update(status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now))
+
+
+def claim_next(worker, names=None):
+    """Claim the next runnable task, honouring per-task concurrency limits. Returns the Task or None."""
+    now = timezone.now()
+    stale_before = now - _lock_timeout()
+    running = dict(
+        Task.objects.filter(status=Task.RUNNING, locked_at__gte=stale_before)
+        .values_list('name').annotate(Count('id')).order_by()
+    )
+    full = [
+        name for name, definition in REGISTRY.items()
+        if definition.concurrency and running.get(name, 0) >= definition.concurrency
+    ]
+    candidates = Task.objects.filter(
+        Q(status=Task.QUEUED, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_at__lt=stale_before, attempts__lt=F('max_attempts'))
+    ).exclude(name__in=full)
+    if names:
+        candidates = candidates.filter(name__in=names)
+    for task_id in candidates.order_by('run_after').values_list('pk', flat=True)[:10]:
+        if claim(task_id, worker):
+            return Task.objects.get(pk=task_id)
+    return None
+
+
+def fail_abandoned():
+    """Fail running tasks whose worker died on their last attempt"""
+    now = timezone.now()
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - _lock_timeout(), attempts__gte=F('max_attempts'),
+    ).update(status=Task.FAILED, error='Worker stopped responding', locked_by='', updated_at=now)
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'TASK_RETRY_BACKOFF', timedelta(seconds=30))
+    return base * 2 ** (attempts - 1)
+
+
+def run(claimed, worker):
+    """Execute a claimed task and record the outcome"""
+    definition = REGISTRY.get(claimed.name)
+    now = timezone.now()
+    mine = Task.objects.filter(pk=claimed.pk, locked_by=worker, status=Task.RUNNING)
+    try:
+        if definition is None:
+            raise PermanentTaskError('Unknown task %r' % claimed.name)
+        result = definition(**claimed.payload)
+    except PermanentTaskError as exc:
+        logger.warning('Task %s %s failed: %s', claimed.name, claimed.pk, exc)
+        mine.update(status=Task.FAILED, error=str(exc), locked_by='', updated_at=timezone.now())
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            logger.warning('Task %s %s failed, retrying (attempt %s)', claimed.name, claimed.pk, claimed.attempts)
+            mine.update(status=Task.QUEUED, error=error, locked_by='', run_after=now + retry_delay(claimed.attempts),
+                        updated_at=timezone.now())
+        else:
+            logger.error('Task %s %s failed after %s attempts', claimed.name, claimed.pk, claimed.attempts)
+            mine.update(status=Task.FAILED, error=error, locked_by='', updated_at=timezone.now())
+    else:
+        mine.update(status=Task.SUCCEEDED, result=result, error='', locked_by='', updated_at=timezone.now())
@@ -0,0 +1,10 @@
+from .images import DerivativeError, generate_derivatives
+from .taskqueue import PermanentTaskError, task
+
+
+@task('images.generate_derivatives', concurrency=4)
+def generate_image_derivatives(name, force=False):
+    try:
+        return {'written': generate_derivatives(name, force=force)}
+    except DerivativeError as exc:
+        raise PermanentTaskError(str(exc))
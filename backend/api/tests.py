@@ -0,0 +1,242 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.authentication import token_cache
+from accounts.revocation import revocations
+from orders.models import Order
+from products.models import Category, Product
+from . import taskqueue
+from .models import Task
+from .throttling import CacheCounterStore, LocalCounterStore, get_store, parse_rate, take_token
+
+LOGIN_LIMIT = {'login': {'rate': '1/hour', 'burst': 2}}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClientAddressThrottleTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        revocations.reset()
+        get_store().clear()
+        self.client = APIClient()
+
+    def logins(self, forwarded_for):
+        return [
+            self.client.post(
+                '/api/token/', {'username': 'nobody', 'password': 'wrong'}, format='json',
+                REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR=address,
+            ).status_code
+            for address in forwarded_for
+        ]
+
+    @override_settings(API_THROTTLE_RATES=LOGIN_LIMIT)
+    def test_rotating_forwarded_for_shares_the_remote_address_bucket(self):
+        addresses = ['198.51.100.%d' % index for index in range(4)]
+        self.assertEqual(self.logins(addresses), [401, 401, 429, 429])
+
+    @override_settings(API_THROTTLE_RATES=LOGIN_LIMIT, REST_FRAMEWORK={
+        'DEFAULT_AUTHENTICATION_CLASSES': ('accounts.authentication.CachedJWTAuthentication',),
+        'DEFAULT_THROTTLE_CLASSES': ['api.throttling.ScopedBucketThrottle'],
+        'NUM_PROXIES': 1,
+    })
+    def test_behind_a_proxy_the_address_it_saw_is_the_client(self):
+        # Whatever the client puts in front, the proxy appends the address it saw
+        spoofed = ['10.0.0.%d, 198.51.100.1' % index for index in range(3)]
+        self.assertEqual(self.logins(spoofed), [401, 401, 429])
+        self.assertEqual(self.logins(['198.51.100.2']), [401])
+
+
+class TokenBucketTests(SimpleTestCase):
+    """take_token() admits `burst` requests at once, then one per interval"""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        patcher = mock.patch('api.throttling.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, store, rate='1/s', burst=3):
+        return take_token('bucket', parse_rate(rate), burst, store)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('20/s'), 50_000)
+        self.assertEqual(parse_rate('10/min'), 6_000_000)
+        self.assertEqual(parse_rate('1/hour'), 3_600_000_000)
+        self.assertEqual(parse_rate('2/day'), 43_200_000_000)
+
+    def check_bucket(self, store):
+        self.assertEqual([self.take(store) for _ in range(4)], [0, 0, 0, 1.0])
+        # A refused request takes nothing, so the wait only shrinks
+        self.now += 0.25
+        self.assertEqual(self.take(store), 0.75)
+        self.now += 0.75
+        self.assertEqual([self.take(store) for _ in range(2)], [0, 1.0])
+        # Idle time refills up to the burst and no further
+        self.now += 60
+        self.assertEqual([self.take(store) for _ in range(4)], [0, 0, 0, 1.0])
+
+    def test_local_store(self):
+        self.check_bucket(LocalCounterStore())
+
+    @override_settings(CACHES={'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_store(self):
+        self.check_bucket(CacheCounterStore('throttle'))
+
+    def test_full_local_store_drops_the_oldest_buckets(self):
+        store = LocalCounterStore(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            take_token(key, parse_rate('1/s'), 1, store)
+        self.assertEqual(take_token('a', parse_rate('1/s'), 1, store), 0)
+        self.assertEqual(take_token('c', parse_rate('1/s'), 1, store), 1.0)
+
+
+class ThrottleResponseTests(TestCase):
+    def setUp(self):
+        get_store().clear()
+        self.client = APIClient()
+
+    @override_settings(API_THROTTLE_RATES={'search': {'rate': '1/min', 'burst': 1}})
+    def test_throttled_requests_get_429_with_retry_after(self):
+        self.assertEqual(self.client.get('/api/products/', {'search': 'shirt'}).status_code, 200)
+        response = self.client.get('/api/products/', {'search': 'hat'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        # Only searches share the search bucket
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+
+    @override_settings(API_THROTTLE_RATES={'anon': {'rate': '1/min', 'burst': 1}})
+    def test_buckets_are_per_client(self):
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='192.0.2.1').status_code, 200)
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='192.0.2.1').status_code, 429)
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='192.0.2.2').status_code, 200)
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'x')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='192.0.2.1').status_code, 200)
+
+
+@override_settings(TASKS_EAGER=False, TASK_RETRY_BACKOFF=timedelta(seconds=30),
+                   TASK_LOCK_TIMEOUT=timedelta(minutes=10))
+class TaskQueueTests(TestCase):
+    """Workers claim tasks once, retry failures with backoff and recover abandoned ones"""
+
+    def setUp(self):
+        self.calls = []
+        registry = mock.patch.dict(taskqueue.REGISTRY)
+        registry.start()
+        self.addCleanup(registry.stop)
+        taskqueue.task('test.echo')(self.echo)
+        taskqueue.task('test.flaky', max_attempts=2)(self.flaky)
+        taskqueue.task('test.invalid')(self.invalid)
+        taskqueue.task('test.single', concurrency=1)(self.echo)
+
+    def echo(self, value):
+        self.calls.append(value)
+        return {'echo': value}
+
+    def flaky(self):
+        self.calls.append('flaky')
+        raise RuntimeError('try again')
+
+    def invalid(self):
+        raise taskqueue.PermanentTaskError('bad input')
+
+    def work(self, worker='worker-1'):
+        claimed = taskqueue.claim_next(worker)
+        if claimed is not None:
+            taskqueue.run(claimed, worker)
+            claimed.refresh_from_db()
+        return claimed
+
+    def test_task_runs_once(self):
+        queued = taskqueue.enqueue('test.echo', {'value': 1})
+        claimed = self.work()
+        self.assertEqual(claimed.pk, queued.pk)
+        self.assertEqual((claimed.status, claimed.result, claimed.attempts), (Task.SUCCEEDED, {'echo': 1}, 1))
+        self.assertIsNone(self.work())
+        self.assertEqual(self.calls, [1])
+
+    def test_delayed_task_waits(self):
+        taskqueue.enqueue('test.echo', {'value': 1}, delay=timedelta(minutes=1))
+        self.assertIsNone(self.work())
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        queued = taskqueue.enqueue('test.flaky')
+        before = timezone.now()
+        with self.assertLogs('api.tasks', 'WARNING'):
+            claimed = self.work()
+        self.assertEqual((claimed.status, claimed.attempts), (Task.QUEUED, 1))
+        self.assertIn('try again', claimed.error)
+        self.assertGreaterEqual(claimed.run_after, before + timedelta(seconds=30))
+        self.assertIsNone(self.work())
+
+        Task.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        with self.assertLogs('api.tasks', 'ERROR'):
+            claimed = self.work()
+        self.assertEqual((claimed.status, claimed.attempts), (Task.FAILED, 2))
+        self.assertEqual(self.calls, ['flaky', 'flaky'])
+        self.assertEqual(taskqueue.retry_delay(3), timedelta(minutes=2))
+
+    def test_permanent_and_unknown_failures_do_not_retry(self):
+        for name in ('test.invalid', 'test.missing'):
+            with self.subTest(name=name):
+                taskqueue.enqueue(name)
+                with self.assertLogs('api.tasks', 'WARNING'):
+                    claimed = self.work()
+                self.assertEqual((claimed.status, claimed.attempts), (Task.FAILED, 1))
+
+    def test_stale_lock_is_claimed_by_another_worker(self):
+        queued = taskqueue.enqueue('test.echo', {'value': 1})
+        abandoned = taskqueue.claim_next('worker-1')
+        self.assertIsNone(taskqueue.claim_next('worker-2'))
+
+        Task.objects.filter(pk=queued.pk).update(locked_at=timezone.now() - timedelta(minutes=11))
+        claimed = taskqueue.claim_next('worker-2')
+        self.assertEqual((claimed.pk, claimed.locked_by, claimed.attempts), (queued.pk, 'worker-2', 2))
+        # The first worker finishing late does not overwrite the new claim
+        taskqueue.run(abandoned, 'worker-1')
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.status, claimed.locked_by), (Task.RUNNING, 'worker-2'))
+
+    def test_abandoned_last_attempt_fails(self):
+        queued = taskqueue.enqueue('test.echo', {'value': 1})
+        Task.objects.filter(pk=queued.pk).update(
+            status=Task.RUNNING, attempts=3, locked_by='gone', locked_at=timezone.now() - timedelta(minutes=11),
+        )
+        self.assertIsNone(taskqueue.claim_next('worker-2'))
+        self.assertEqual(taskqueue.fail_abandoned(), 1)
+        self.assertEqual(Task.objects.get(pk=queued.pk).status, Task.FAILED)
+
+    def test_concurrency_limit(self):
+        first = taskqueue.enqueue('test.single', {'value': 1})
+        taskqueue.enqueue('test.single', {'value': 2})
+        self.assertEqual(taskqueue.claim_next('worker-1').pk, first.pk)
+        self.assertIsNone(taskqueue.claim_next('worker-2'))
+        taskqueue.run(Task.objects.get(pk=first.pk), 'worker-1')
+        self.assertIsNotNone(taskqueue.claim_next('worker-2'))
+
+
+class ExplainQueriesCommandTests(TestCase):
+    # Without the "testserver" host the test runner allows
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_explains_every_product_and_order_query(self):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'x')
+        Order.objects.create(
+            user=user, first_name='Test', last_name='User', email='test@example.com', address='1 Test Way',
+            city='Testville', state='TS', postal_code='00000', country='Testland', phone='555-0100',
+            total_price='10.00',
+        )
+        stdout = StringIO()
+        call_command('explain_queries', stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('products retrieve:', output)
+        self.assertIn("orders list {'view': 'summary'}:", output)
+        self.assertRegex(output, r'38 queries checked, \d+ flagged')
@@ -0,0 +1,206 @@
+"""
+Token-bucket rate limiting.
+
+Each scope in API_THROTTLE_RATES has a bucket of ``burst`` tokens per
+client that refills at ``rate``; a request takes a token or is refused with
+429 and a Retry-After header. Three throttles run on every DRF view:
+
+    AnonBucketThrottle      "anon" scope, per client IP, anonymous requests
+    UserBucketThrottle      "user" scope, per signed-in user
+    ScopedBucketThrottle    the view's own scope (throttle_scope, or
+                            get_throttle_scope()), per user or else per IP
+
+A scope without a rate is not limited. The native async catalog views call
+acheck_throttles(). Client IPs are REMOTE_ADDR, or taken from
+X-Forwarded-For when REST_FRAMEWORK['NUM_PROXIES'] says the app is behind
+proxies.
+
+Buckets are kept as one integer per client and scope (the generic cell rate
+algorithm: the time at which the bucket would be full again), updated with
+atomic increments. By default they live in this process's memory; set
+API_THROTTLE_CACHE_ALIAS to a CACHES alias with atomic incr (Redis,
+Memcached) to share them between processes.
+"""
+import functools
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/min' -> microseconds per request"""
+    count, period = rate.split('/')
+    return PERIODS[period[0]] * 1_000_000 // int(count)
+
+
+class LocalCounterStore:
+    """Counters in this process's memory"""
+    blocking = False
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def incr(self, key, delta, timeout):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None or entry[1] <= now:
+                if len(self._counters) >= self.max_entries:
+                    self._prune(now)
+                entry = self._counters[key] = [0, 0]
+            entry[0] += delta
+            entry[1] = now + timeout
+            return entry[0]
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._counters[key] = [value, time.monotonic() + timeout]
+
+    def _prune(self, now):
+        for key in [key for key, entry in self._counters.items() if entry[1] <= now]:
+            del self._counters[key]
+        excess = len(self._counters) - self.max_entries + 1
+        if excess > 0:
+            # Still full: drop the longest-held keys
+            for key in list(self._counters)[:excess]:
+                del self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class CacheCounterStore:
+    """
+    Counters in a Django cache, shared by every process that uses it. The
+    timeout is set when a counter is created and not extended by incr(),
+    so buckets are kept for much longer than they take to refill.
+    """
+    blocking = True
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def incr(self, key, delta, timeout):
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            if self.cache.add(key, delta, timeout):
+                return delta
+            return self.cache.incr(key, delta)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_stores = {}
+
+
+def get_store():
+    alias = getattr(settings, 'API_THROTTLE_CACHE_ALIAS', None)
+    store = _stores.get(alias)
+    if store is None:
+        store = _stores[alias] = CacheCounterStore(alias) if alias else LocalCounterStore()
+    return store
+
+
+def take_token(key, interval, burst, store=None):
+    """
+    Take a token from the bucket at ``key`` that holds ``burst`` tokens and
+    gains one every ``interval`` microseconds. Returns 0 if one was taken,
+    otherwise the seconds until one is available.
+    """
+    store = store or get_store()
+    now = int(time.time() * 1_000_000)
+    limit = interval * burst
+    timeout = max(3600, 2 * math.ceil(limit / 1_000_000))
+    # When the bucket will be full again, counting this request
+    full_at = store.incr(key, interval, timeout)
+    if full_at < now + interval:
+        # Full before this request; start over from now. Two processes doing
+        # this at once cost one token between them.
+        store.set(key, now + interval, timeout)
+    elif full_at - now > limit:
+        store.incr(key, -interval, timeout)
+        return (full_at - now - limit) / 1_000_000
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        """Identifies the client, or None to let the request through"""
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(request, view)
+        bucket = getattr(settings, 'API_THROTTLE_RATES', {}).get(scope) if scope else None
+        if bucket is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        self.wait_time = take_token('throttle:%s:%s' % (scope, ident), parse_rate(bucket['rate']), bucket['burst'])
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+    scope = 'anon'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class ScopedBucketThrottle(TokenBucketThrottle):
+    def get_scope(self, request, view):
+        if hasattr(view, 'get_throttle_scope'):
+            return view.get_throttle_scope()
+        return getattr(view, 'throttle_scope', None)
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return 'user-%s' % request.user.pk
+        return self.get_ident(request)
+
+
+async def acheck_throttles(view):
+    """
+    APIView.check_throttles() for a view served on the event loop, once the
+    request is authenticated; raises Throttled
+    """
+    if get_store().blocking:
+        await sync_to_async(view.check_throttles)(view.request)
+    else:
+        view.check_throttles(view.request)
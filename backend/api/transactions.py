@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that starts with BEGIN IMMEDIATE on SQLite.
+
+    A deferred SQLite transaction that reads before it writes has to upgrade
+    its lock on the first write, and if another connection got there first
+    the upgrade fails with "database is locked" without waiting on
+    busy_timeout. Taking the write lock up front makes the transaction queue
+    for it instead. Use it for the write paths that read first, like order
+    creation; everything else keeps deferred transactions, so reads never
+    hold the write lock.
+
+    Inside an existing atomic block this is a plain savepoint, so the
+    outermost block decides how the transaction began.
+    """
+    connection = transaction.get_connection(using)
+    if (
+        connection.vendor != 'sqlite'
+        or connection.in_atomic_block
+        or not getattr(settings, 'SQLITE_IMMEDIATE_WRITES', True)
+    ):
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # transaction_mode is read from OPTIONS when the connection opens, and
+    # again by every BEGIN; set it for this one BEGIN only
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
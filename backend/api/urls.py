@@ -1,13 +1,16 @@
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
+from accounts.views import TokenObtainView, TokenRevokeView
+from .views import CacheStatsView, TaskStatusView, metrics
 
 urlpatterns = [
     path('products/', include('products.urls')),
     path('accounts/', include('accounts.urls')),
     path('orders/', include('orders.urls')),
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', TokenObtainView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('metrics/', metrics, name='metrics'),
+    path('tasks/<uuid:pk>/', TaskStatusView.as_view(), name='task_status'),
 ]
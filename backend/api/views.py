@@ -1,5 +1,119 @@
+import math
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from rest_framework.exceptions import APIException
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, permissions
+
+from accounts.authentication import CachedJWTAuthentication, token_cache
+from products.cache import catalog_cache
+from .images import DerivativeError, generate_derivatives, parse_derivative_name
+from .metrics import registry
+from .middleware import SerializerTimingMixin
+from .models import Task
+from .throttling import parse_rate, take_token
+from .serializers import TaskSerializer
 
 # API common views would go here if needed
+
+
+class CacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({'catalog': catalog_cache.stats(), 'auth_tokens': token_cache.stats()}, status=status.HTTP_200_OK)
+
+
+class TaskStatusView(SerializerTimingMixin, RetrieveAPIView):
+    """Progress of a background task started by one of the caller's requests"""
+    serializer_class = TaskSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Task.objects.all()
+        return Task.objects.filter(owner=self.request.user)
+
+
+def metrics_allowed(request):
+    """
+    From an allowed address, and either with API_METRICS_TOKEN as the bearer
+    token or signed in as staff. The address alone is not enough: behind a
+    reverse proxy every client arrives from 127.0.0.1.
+    """
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'API_METRICS_ALLOWED_IPS', ['127.0.0.1', '::1']):
+        return False
+    token = getattr(settings, 'API_METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and constant_time_compare(header, 'Bearer ' + token):
+        return True
+    if request.user.is_staff:
+        return True
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(Request(request))
+    except APIException:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def metrics(request):
+    # Internal scrape target; not routed through DRF authentication
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    lines = [registry.render_prometheus()]
+    lines.append('# HELP catalog_cache_lookups_total Catalog response cache lookups.\n')
+    lines.append('# TYPE catalog_cache_lookups_total counter\n')
+    stats = catalog_cache.stats()
+    for result in ('hits', 'misses'):
+        lines.append('catalog_cache_lookups_total{result="%s"} %d\n' % (result, stats[result]))
+    lines.append('# HELP auth_token_cache_lookups_total Verified JWT cache lookups.\n')
+    lines.append('# TYPE auth_token_cache_lookups_total counter\n')
+    stats = token_cache.stats()
+    for result in ('hits', 'misses'):
+        lines.append('auth_token_cache_lookups_total{result="%s"} %d\n' % (result, stats[result]))
+    return HttpResponse(''.join(lines), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def derivative_view(request, name):
+    """
+    Serve an image derivative from MEDIA_URL, creating it on first request.
+
+    In production the web server should serve MEDIA_ROOT itself and fall
+    back to this view only for files that don't exist yet. Creating one is
+    limited per client by the "derivatives" throttle scope.
+    """
+    name = 'derivatives/' + name
+    try:
+        source_name, size, fmt = parse_derivative_name(name)
+        if not default_storage.exists(name):
+            wait = derivative_throttle_wait(request)
+            if wait:
+                response = HttpResponse('Too many image requests', status=429, content_type='text/plain')
+                response['Retry-After'] = '%d' % math.ceil(wait)
+                return response
+            generate_derivatives(source_name, only=[(size, fmt)])
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='image/%s' % fmt)
+    except (DerivativeError, SuspiciousFileOperation, FileNotFoundError):
+        raise Http404('No such image')
+    # The name embeds the source's unique upload name, so it never changes
+    patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365)
+    return response
+
+
+def derivative_throttle_wait(request):
+    """Seconds until this client may have another derivative generated, 0 if now"""
+    bucket = getattr(settings, 'API_THROTTLE_RATES', {}).get('derivatives')
+    if bucket is None:
+        return 0
+    ident = BaseThrottle().get_ident(request)
+    return take_token('throttle:derivatives:%s' % ident, parse_rate(bucket['rate']), bucket['burst'])
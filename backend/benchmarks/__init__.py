@@ -0,0 +1,11 @@
+"""
+Load-testing and benchmark suite for the API.
+
+    python -m benchmarks generate --products 100000 --variants-per-product 10
+    python -m benchmarks run --scenarios browse,search,checkout --iterations 200
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks json
+
+Runs against benchmarks.settings (a separate SQLite database) unless
+DJANGO_SETTINGS_MODULE says otherwise. See benchmarks/README.md.
+"""
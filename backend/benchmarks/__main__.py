@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='API load tests and benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='Create the benchmark database and a synthetic catalog')
+    generate.add_argument('--products', type=int, default=100_000)
+    generate.add_argument('--variants-per-product', type=int, default=10)
+    generate.add_argument('--batch-size', type=int, default=5000)
+    generate.add_argument('--seed', type=int, default=42)
+
+    run = commands.add_parser('run', help='Run scenarios and save the results as JSON')
+    run.add_argument('--scenarios', default='browse,search,filter,product_detail,register,login,checkout,order_history',
+                     help='Comma separated scenario names')
+    run.add_argument('--target', default='testclient',
+                     help='"testclient" for the in-process WSGI stack, or a server URL such as http://127.0.0.1:8000')
+    run.add_argument('--iterations', type=int, default=100, help='Iterations per scenario')
+    run.add_argument('--concurrency', type=int, default=4, help='Concurrent simulated shoppers')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--label', help='Free-form tag stored with the results, e.g. "wsgi" or "asgi"')
+    run.add_argument('--output', help='Result file (default: benchmarks/results/<time>-<revision>.json)')
+
+    json_bench = commands.add_parser('json', help='Micro-benchmark JSON rendering and parsing of serializer output')
+    json_bench.add_argument('--products', type=int, default=500, help='Products in the ProductListSerializer payload')
+    json_bench.add_argument('--orders', type=int, default=100, help='Orders in the OrderDetailSerializer payload')
+    json_bench.add_argument('--repeat', type=int, default=5)
+    json_bench.add_argument('--number', type=int, default=20)
+
+    contention = commands.add_parser('contention', help='Concurrent checkouts under each SQLite profile')
+    contention.add_argument('--workers', type=int, default=8, help='Processes creating orders at once')
+    contention.add_argument('--orders', type=int, default=25, help='Orders per process')
+    contention.add_argument('--profiles', default='default,tuned', help='Comma separated: default, tuned')
+    contention.add_argument('--seed', type=int, default=1)
+
+    logins = commands.add_parser('logins', help='Login throughput with passwords hashed inline and in the pool')
+    logins.add_argument('--threads', type=int, default=8, help='Concurrent logins')
+    logins.add_argument('--logins', type=int, default=10, help='Logins per thread')
+    logins.add_argument('--modes', default='inline,pool', help='Comma separated: inline, pool')
+    logins.add_argument('--workers', type=int, help='Hashing processes in pool mode (default: one per core)')
+    logins.add_argument('--max-pending', type=int, help='PASSWORD_HASHING_MAX_PENDING in pool mode')
+
+    throttle = commands.add_parser('throttle', help='Per-request overhead of the rate limit checks')
+    throttle.add_argument('--requests', type=int, default=20000)
+    throttle.add_argument('--clients', type=int, default=1000, help='Distinct client addresses')
+    throttle.add_argument('--stores', default='local,cache', help='Comma separated: local, cache')
+    throttle.add_argument('--cache-alias', default='default', help='CACHES alias for the cache store')
+
+    compare = commands.add_parser('compare', help='Compare two result files')
+    compare.add_argument('before')
+    compare.add_argument('after')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        from .runner import compare as compare_results
+        compare_results(args.before, args.after, sys.stdout)
+        return
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+    if args.command == 'generate':
+        from django.core.management import call_command
+        from .datagen import generate_catalog
+        call_command('migrate', verbosity=0)
+        generate_catalog(
+            products=args.products,
+            variants_per_product=args.variants_per_product,
+            batch_size=args.batch_size,
+            seed=args.seed,
+            stdout=sys.stdout,
+        )
+    elif args.command == 'json':
+        from .serialization import run_json_benchmark
+        run_json_benchmark(
+            products=args.products,
+            orders=args.orders,
+            repeat=args.repeat,
+            number=args.number,
+            stdout=sys.stdout,
+        )
+    elif args.command == 'contention':
+        from .contention import PROFILES, run_contention
+        profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            parser.error(f'Unknown profiles: {", ".join(sorted(unknown))} (choose from {", ".join(PROFILES)})')
+        run_contention(
+            workers=args.workers,
+            orders=args.orders,
+            profiles=profiles,
+            seed=args.seed,
+            stdout=sys.stdout,
+        )
+    elif args.command == 'logins':
+        from .logins import MODES, run_logins
+        modes = [name.strip() for name in args.modes.split(',') if name.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            parser.error(f'Unknown modes: {", ".join(sorted(unknown))} (choose from {", ".join(MODES)})')
+        run_logins(
+            threads=args.threads,
+            logins=args.logins,
+            modes=modes,
+            workers=args.workers,
+            max_pending=args.max_pending,
+            stdout=sys.stdout,
+        )
+    elif args.command == 'throttle':
+        from .throttling import STORES, run_throttle_benchmark
+        stores = [name.strip() for name in args.stores.split(',') if name.strip()]
+        unknown = set(stores) - set(STORES)
+        if unknown:
+            parser.error(f'Unknown stores: {", ".join(sorted(unknown))} (choose from {", ".join(STORES)})')
+        run_throttle_benchmark(
+            requests=args.requests,
+            clients=args.clients,
+            stores=stores,
+            cache_alias=args.cache_alias,
+            stdout=sys.stdout,
+        )
+    else:
+        from .scenarios import SCENARIOS
+        from .runner import run as run_benchmarks
+        scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            parser.error(f'Unknown scenarios: {", ".join(sorted(unknown))} (choose from {", ".join(SCENARIOS)})')
+        run_benchmarks(
+            scenarios,
+            target=args.target,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            seed=args.seed,
+            label=args.label,
+            output=args.output,
+            stdout=sys.stdout,
+        )
+
+
+if __name__ == '__main__':
+    main()
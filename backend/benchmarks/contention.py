@@ -0,0 +1,118 @@
+"""
+SQLite write-contention stress test: several processes create orders
+through OrderCreateSerializer and cancel them again through
+release_reservations (a transaction that reads before it writes) at the
+same time, once per BENCH_SQLITE_PROFILE. The "default" profile (rollback journal, deferred
+transactions, a connection per request) fails some checkouts with
+"database is locked"; the tuned profile from ecommerce.settings (WAL,
+busy_timeout, BEGIN IMMEDIATE on those transactions, persistent connections) should fail none.
+"""
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+PROFILES = ('default', 'tuned')
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _worker(profile, user_id, lines, orders, seed, start_at):
+    # Runs in a fresh (spawned) process, so settings follow the profile
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    os.environ['BENCH_SQLITE_PROFILE'] = profile
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, close_old_connections
+    from rest_framework.exceptions import ValidationError
+    from orders.reservations import release_reservations
+    from orders.serializers import OrderCreateSerializer
+
+    request = SimpleNamespace(user=User.objects.get(pk=user_id))
+    close_old_connections()
+    rng = random.Random(seed)
+    counts = Counter()
+    timings = []
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(orders):
+        product_id, variant_id = rng.choice(lines)
+        serializer = OrderCreateSerializer(data={
+            'first_name': 'Bench', 'last_name': 'User', 'email': 'bench@example.com',
+            'address': '1 Benchmark Way', 'city': 'Loadville', 'state': 'LT', 'postal_code': '00000',
+            'country': 'Benchland', 'phone': '555-0100', 'payment_method': 'credit_card',
+            'items': [{'product': product_id, 'variant': variant_id, 'quantity': 1}],
+        }, context={'request': request})
+        start = time.perf_counter()
+        try:
+            serializer.is_valid(raise_exception=True)
+            order = serializer.save()
+            # Puts the stock back, so long runs don't sell out
+            release_reservations(order.pk)
+        except OperationalError as exc:
+            counts['locked' if 'locked' in str(exc) else 'errors'] += 1
+        except ValidationError:
+            counts['rejected'] += 1
+        else:
+            counts['created'] += 1
+            timings.append(time.perf_counter() - start)
+        # What request_finished does after every request
+        close_old_connections()
+    return counts, timings
+
+
+def run_contention(workers=8, orders=25, profiles=PROFILES, seed=1, stdout=None):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from products.models import ProductVariant
+
+    def log(message):
+        if stdout:
+            stdout.write(message + '\n')
+
+    lines = list(
+        ProductVariant.objects.filter(product__is_active=True, stock__gt=0)
+        .order_by('-stock').values_list('product_id', 'id')[:50]
+    )
+    if not lines:
+        raise RuntimeError('No variants in stock; run "python -m benchmarks generate" first')
+    user, _ = User.objects.get_or_create(username='bench-contention', defaults={'email': 'bench@example.com'})
+    connection.close()
+
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for profile in profiles:
+        with context.Pool(workers) as pool:
+            # Start all workers together, after their Django setup
+            start_at = time.time() + 3
+            outcomes = pool.starmap(_worker, [
+                (profile, user.pk, lines, orders, seed + index, start_at) for index in range(workers)
+            ])
+            elapsed = time.time() - start_at
+        counts = sum((outcome[0] for outcome in outcomes), Counter())
+        timings = [timing for outcome in outcomes for timing in outcome[1]]
+        results[profile] = {
+            'attempted': workers * orders,
+            'created': counts['created'],
+            'locked': counts['locked'],
+            'rejected': counts['rejected'],
+            'errors': counts['errors'],
+            'orders_per_s': round(counts['created'] / elapsed, 1) if elapsed > 0 else None,
+            'p50_ms': round(_percentile(timings, 50) * 1000, 2) if timings else None,
+            'p95_ms': round(_percentile(timings, 95) * 1000, 2) if timings else None,
+        }
+        log(
+            f'{profile}: {counts["created"]}/{workers * orders} orders placed and cancelled, '
+            f'{counts["locked"]} "database is locked", {counts["rejected"]} rejected, '
+            f'{counts["errors"]} other errors; p50 {results[profile]["p50_ms"]}ms, '
+            f'p95 {results[profile]["p95_ms"]}ms'
+        )
+    return results
@@ -0,0 +1,102 @@
+"""
+Synthetic catalog generator.
+
+Rows are built and inserted one batch at a time with bulk_create, so memory
+stays flat whatever the scale. The same seed always produces the same
+catalog.
+"""
+import random
+import time
+from decimal import Decimal
+from itertools import product as cartesian
+
+from django.db import transaction
+
+ADJECTIVES = [
+    'Classic', 'Slim', 'Relaxed', 'Vintage', 'Modern', 'Essential', 'Premium', 'Lightweight',
+    'Cozy', 'Rugged', 'Minimalist', 'Oversized', 'Tailored', 'Athletic', 'Summer', 'Winter',
+]
+MATERIALS = [
+    'Cotton', 'Linen', 'Denim', 'Leather', 'Wool', 'Canvas', 'Silk', 'Cashmere', 'Fleece', 'Suede',
+]
+NOUNS = [
+    'T-Shirt', 'Jeans', 'Jacket', 'Dress', 'Sneakers', 'Boots', 'Hoodie', 'Shirt', 'Skirt', 'Scarf',
+    'Tote Bag', 'Watch', 'Cap', 'Sweater', 'Shorts', 'Blazer',
+]
+CATEGORIES = [
+    'Men', 'Women', 'Accessories', 'Footwear', 'Kids', 'Outerwear', 'Activewear', 'Bags',
+    'Jewelry', 'Sleepwear', 'Swimwear', 'Formal', 'Denim', 'Basics', 'Vintage', 'Sale',
+]
+COLORS = ['Black', 'White', 'Navy', 'Grey', 'Red', 'Green', 'Blue', 'Brown', 'Beige', 'Pink']
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL', '28', '30', '32', '34']
+
+# Words worth searching for, shared with the search scenario
+SEARCH_TERMS = [word.lower() for word in ADJECTIVES + MATERIALS + NOUNS]
+
+PLACEHOLDER_IMAGE = 'products/bench/placeholder.jpg'
+
+
+def generate_catalog(products=100_000, variants_per_product=10, batch_size=5000, seed=42, stdout=None):
+    from products.models import Category, Product, ProductImage, ProductVariant
+    from products.search import get_search_backend
+
+    def log(message):
+        if stdout:
+            stdout.write(message + '\n')
+
+    max_variants = len(COLORS) * len(SIZES)
+    if variants_per_product > max_variants:
+        raise ValueError(f'At most {max_variants} variants per product (colors x sizes)')
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            [Category(name=name, slug=f'bench-{name.lower()}', description=f'{name} (benchmark)')
+             for name in CATEGORIES],
+            ignore_conflicts=True,
+        )
+    categories = list(Category.objects.filter(slug__startswith='bench-'))
+    start_index = Product.objects.filter(slug__startswith='bench-').count()
+    combos = list(cartesian(COLORS, SIZES))
+
+    created_products = created_variants = 0
+    for batch_start in range(start_index, start_index + products, batch_size):
+        batch_end = min(batch_start + batch_size, start_index + products)
+        with transaction.atomic():
+            batch = Product.objects.bulk_create([
+                Product(
+                    category=rng.choice(categories),
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {rng.choice(NOUNS)} {index}',
+                    slug=f'bench-{index}',
+                    description=' '.join(rng.choices(SEARCH_TERMS, k=12)),
+                    price=Decimal(rng.randrange(500, 50000)) / 100,
+                    in_stock=rng.random() > 0.1,
+                )
+                for index in range(batch_start, batch_end)
+            ])
+            ProductImage.objects.bulk_create([
+                ProductImage(product=item, image=PLACEHOLDER_IMAGE, alt_text=item.name, is_featured=True)
+                for item in batch
+            ])
+            variants = []
+            for item in batch:
+                for color, size in rng.sample(combos, variants_per_product):
+                    variants.append(ProductVariant(
+                        product=item, color=color, size=size, stock=rng.randrange(0, 1000),
+                        sku=f'BENCH-{item.pk}-{color.upper()}-{size}',
+                    ))
+            ProductVariant.objects.bulk_create(variants, batch_size=batch_size)
+        created_products += len(batch)
+        created_variants += len(variants)
+        log(f'  {created_products}/{products} products, {created_variants} variants '
+            f'({time.perf_counter() - started:.1f}s)')
+
+    # bulk_create skips the signals that maintain the search index
+    with transaction.atomic():
+        get_search_backend().rebuild()
+
+    elapsed = time.perf_counter() - started
+    log(f'Generated {created_products} products and {created_variants} variants in {elapsed:.1f}s')
+    return {'products': created_products, 'variants': created_variants, 'seconds': round(elapsed, 2)}
@@ -0,0 +1,108 @@
+"""
+Request drivers: the in-process Django test client, or HTTP against a
+running server. Both return a Sample per request.
+"""
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Any, Optional
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+@dataclass
+class Sample:
+    label: str
+    status: int
+    seconds: float
+    queries: Optional[int]
+    body: Any = None
+
+    @property
+    def ok(self):
+        return self.status < 400 or self.status == 404
+
+
+def _queries_from(server_timing):
+    match = SERVER_TIMING_QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class TestClientDriver:
+    """Drives the WSGI stack in-process through django.test.Client"""
+    name = 'testclient'
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+        self.token = None
+
+    def request(self, label, method, path, data=None, headers=None):
+        extra = {}
+        if self.token:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {self.token}'
+        for name, value in (headers or {}).items():
+            extra['HTTP_' + name.upper().replace('-', '_')] = value
+
+        start = time.perf_counter()
+        response = self.client.generic(
+            method, path,
+            data=json.dumps(data) if data is not None else '',
+            content_type='application/json',
+            **extra,
+        )
+        seconds = time.perf_counter() - start
+        body = None
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(response.content or b'null')
+        return Sample(label, response.status_code, seconds, _queries_from(response.get('Server-Timing')), body)
+
+    def close(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class HttpDriver:
+    """Drives a running server (runserver, gunicorn, uvicorn) over HTTP"""
+    name = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+
+    def request(self, label, method, path, data=None, headers=None):
+        request_headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        if self.token:
+            request_headers['Authorization'] = f'Bearer {self.token}'
+        request_headers.update(headers or {})
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(data).encode('utf-8') if data is not None else None,
+            headers=request_headers,
+            method=method,
+        )
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, content, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as exc:
+            status, content, response_headers = exc.code, exc.read(), exc.headers
+        seconds = time.perf_counter() - start
+
+        body = None
+        if (response_headers.get('Content-Type') or '').startswith('application/json'):
+            body = json.loads(content or b'null')
+        return Sample(label, status, seconds, _queries_from(response_headers.get('Server-Timing')), body)
+
+    def close(self):
+        pass
+
+
+def make_driver(target):
+    if target == 'testclient':
+        return TestClientDriver()
+    return HttpDriver(target)
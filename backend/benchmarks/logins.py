@@ -0,0 +1,102 @@
+"""
+Login throughput: concurrent POST /api/token/ through the in-process WSGI
+stack, once with passwords hashed in the request thread
+(PASSWORD_HASHING_WORKERS=0) and once in the accounts.hashers pool.
+Throughput is also given per core available to the benchmark, so runs on
+different machines can be compared.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from .contention import _percentile
+
+MODES = ('inline', 'pool')
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _login_thread(username, password, logins, start_at, statuses, timings):
+    from django.db import close_old_connections
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    time.sleep(max(0, start_at - time.time()))
+    for _ in range(logins):
+        start = time.perf_counter()
+        response = client.post('/api/token/', {'username': username, 'password': password}, format='json')
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            timings.append(elapsed)
+    close_old_connections()
+
+
+def run_logins(threads=8, logins=10, modes=MODES, workers=None, max_pending=None, stdout=None):
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from accounts.hashers import pool
+    from .scenarios import PASSWORD
+
+    def log(message):
+        if stdout:
+            stdout.write(message + '\n')
+
+    user, created = User.objects.get_or_create(username='bench-logins', defaults={'email': 'bench@example.com'})
+    if created or not user.check_password(PASSWORD):
+        user.set_password(PASSWORD)
+        user.save()
+
+    cores = _cores()
+    results = {}
+    for mode in modes:
+        overrides = {'PASSWORD_HASHING_WORKERS': 0}
+        if mode == 'pool':
+            overrides = {'PASSWORD_HASHING_WORKERS': workers or cores}
+            if max_pending is not None:
+                overrides['PASSWORD_HASHING_MAX_PENDING'] = max_pending
+        with override_settings(**overrides):
+            pool.shutdown()
+            # Starts the pool's processes before timing
+            user.check_password(PASSWORD)
+
+            statuses = Counter()
+            timings = []
+            start_at = time.time() + 0.5
+            running = [
+                threading.Thread(target=_login_thread, args=(
+                    user.username, PASSWORD, logins, start_at, statuses, timings
+                ))
+                for _ in range(threads)
+            ]
+            for thread in running:
+                thread.start()
+            for thread in running:
+                thread.join()
+            elapsed = time.time() - start_at
+            pool.shutdown()
+
+        per_second = statuses[200] / elapsed if elapsed > 0 else 0
+        results[mode] = {
+            'attempted': threads * logins,
+            'succeeded': statuses[200],
+            'throttled': statuses[429],
+            'errors': sum(statuses.values()) - statuses[200] - statuses[429],
+            'logins_per_s': round(per_second, 2),
+            'logins_per_s_per_core': round(per_second / cores, 2),
+            'p50_ms': round(_percentile(timings, 50) * 1000, 1) if timings else None,
+            'p95_ms': round(_percentile(timings, 95) * 1000, 1) if timings else None,
+        }
+        log(
+            f'{mode}: {statuses[200]}/{threads * logins} logins, {results[mode]["logins_per_s"]}/s, '
+            f'{results[mode]["logins_per_s_per_core"]}/s per core ({cores} cores), '
+            f'{statuses[429]} throttled, {results[mode]["errors"]} errors; '
+            f'p50 {results[mode]["p50_ms"]}ms, p95 {results[mode]["p95_ms"]}ms'
+        )
+    return results
@@ -0,0 +1,184 @@
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .drivers import make_driver
+from .scenarios import SCENARIOS, Fixtures, login, register_user
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples):
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+    return {
+        'count': len(samples),
+        'errors': sum(1 for sample in samples if not sample.ok),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run_scenario(name, target, fixtures, iterations, concurrency, seed):
+    scenario = SCENARIOS[name]
+    samples = []
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    errors = []
+
+    def worker(index):
+        driver = make_driver(target)
+        rng = random.Random(seed * 1000 + index)
+        state = {}
+        try:
+            # Every worker gets its own signed-in shopper before the clock starts
+            username, _ = register_user(driver, rng)
+            login(driver, username)
+            state['username'] = username
+        except Exception as exc:
+            errors.append(exc)
+        ready.wait()
+        local = []
+        try:
+            for _ in range(index, iterations, concurrency):
+                local += scenario(driver, fixtures, rng, state)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            driver.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    by_label = defaultdict(list)
+    for sample in samples:
+        by_label[sample.label].append(sample)
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 3),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / wall, 2) if wall else None,
+        'errors': sum(1 for sample in samples if not sample.ok),
+        'endpoints': {label: summarize(group) for label, group in sorted(by_label.items())},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(scenarios, target='testclient', iterations=100, concurrency=4, seed=1, label=None, output=None, stdout=None):
+    import django
+    from django.db import connection
+
+    fixtures = Fixtures(make_driver(target))
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'target': target,
+            'label': label,
+            'database': connection.vendor if target == 'testclient' else None,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.machine(),
+            'seed': seed,
+        },
+        'scenarios': {},
+    }
+    for name in scenarios:
+        results['scenarios'][name] = result = run_scenario(name, target, fixtures, iterations, concurrency, seed)
+        if stdout:
+            stdout.write(format_scenario(name, result))
+
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = RESULTS_DIR / f'{stamp}-{results["meta"]["revision"]}.json'
+    Path(output).write_text(json.dumps(results, indent=2))
+    if stdout:
+        stdout.write(f'Results written to {output}\n')
+    return results
+
+
+def format_scenario(name, result):
+    lines = [
+        f'{name}: {result["requests"]} requests in {result["wall_seconds"]}s '
+        f'({result["throughput_rps"]} req/s, {result["errors"]} errors)'
+    ]
+    for label, stats in result['endpoints'].items():
+        lines.append(
+            f'  {label:<24} p50 {stats["p50_ms"]:>8.2f}ms  p95 {stats["p95_ms"]:>8.2f}ms  '
+            f'p99 {stats["p99_ms"]:>8.2f}ms  queries {stats["avg_queries"]}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def compare(before_path, after_path, stdout):
+    before = json.loads(Path(before_path).read_text())
+    after = json.loads(Path(after_path).read_text())
+    def describe(meta):
+        return ' '.join(filter(None, [meta['revision'], meta.get('label')]))
+
+    stdout.write(f'{describe(before["meta"])} -> {describe(after["meta"])}\n')
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return '     n/a'
+        return f'{(new - old) / old * 100:+7.1f}%'
+
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if not old:
+            continue
+        stdout.write(
+            f'{name}: throughput {old["throughput_rps"]} -> {new["throughput_rps"]} req/s '
+            f'{change(old["throughput_rps"], new["throughput_rps"])}\n'
+        )
+        for label, stats in new['endpoints'].items():
+            previous = old['endpoints'].get(label)
+            if not previous:
+                continue
+            stdout.write(
+                f'  {label:<24}'
+                + ''.join(
+                    f' {metric} {previous[metric]} -> {stats[metric]} ({change(previous[metric], stats[metric]).strip()})'
+                    for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'avg_queries')
+                )
+                + '\n'
+            )
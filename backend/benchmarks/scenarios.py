@@ -0,0 +1,132 @@
+"""
+Scripted user journeys. Each scenario runs one iteration against a driver
+and returns the Samples it produced.
+"""
+import uuid
+
+from .datagen import SEARCH_TERMS
+
+PASSWORD = 'Bench-Passw0rd!'
+SORT_ORDERS = ['name', 'price_asc', 'price_desc', 'newest']
+
+
+class Fixtures:
+    """Catalog identifiers discovered through the API before the run"""
+
+    def __init__(self, driver, sample_pages=5):
+        categories = driver.request('setup', 'GET', '/api/products/categories/').body or []
+        self.categories = [category['slug'] for category in categories]
+        self.product_slugs = []
+        path = '/api/products/?page_size=100&sort_by=newest'
+        for _ in range(sample_pages):
+            page = driver.request('setup', 'GET', path).body
+            if not page:
+                break
+            self.product_slugs += [product['slug'] for product in page['results']]
+            if not page['next']:
+                break
+            path = page['next'][page['next'].index('/api/'):]
+        if not self.product_slugs:
+            raise RuntimeError('No products found; run "python -m benchmarks generate" first')
+
+
+def register_user(driver, rng):
+    username = f'bench-{uuid.UUID(int=rng.getrandbits(128)).hex[:16]}'
+    sample = driver.request('register', 'POST', '/api/accounts/register/', {
+        'username': username,
+        'email': f'{username}@bench.example.com',
+        'password': PASSWORD,
+        'password2': PASSWORD,
+        'first_name': 'Bench',
+        'last_name': 'User',
+    })
+    return username, sample
+
+
+def login(driver, username):
+    sample = driver.request('login', 'POST', '/api/token/', {'username': username, 'password': PASSWORD})
+    if sample.body and 'access' in sample.body:
+        driver.token = sample.body['access']
+    return sample
+
+
+def browse(driver, fixtures, rng, state):
+    samples = []
+    path = '/api/products/'
+    for _ in range(3):
+        sample = driver.request('browse', 'GET', path)
+        samples.append(sample)
+        if not sample.body or not sample.body.get('next'):
+            break
+        path = sample.body['next'][sample.body['next'].index('/api/'):]
+    return samples
+
+
+def search(driver, fixtures, rng, state):
+    term = rng.choice(SEARCH_TERMS)
+    # Search-as-you-type: a prefix, then the whole word
+    return [
+        driver.request('search', 'GET', f'/api/products/?search={term[:3]}'),
+        driver.request('search', 'GET', f'/api/products/?search={term}'),
+    ]
+
+
+def filter_products(driver, fixtures, rng, state):
+    low = rng.randrange(0, 300)
+    query = (
+        f'category={rng.choice(fixtures.categories)}&price_min={low}&price_max={low + 100}'
+        f'&in_stock=true&sort_by={rng.choice(SORT_ORDERS)}'
+    )
+    return [
+        driver.request('filter', 'GET', f'/api/products/?{query}'),
+        driver.request('facets', 'GET', f'/api/products/facets/?{query}'),
+    ]
+
+
+def product_detail(driver, fixtures, rng, state):
+    return [driver.request('product_detail', 'GET', f'/api/products/{rng.choice(fixtures.product_slugs)}/')]
+
+
+def register(driver, fixtures, rng, state):
+    return [register_user(driver, rng)[1]]
+
+
+def login_scenario(driver, fixtures, rng, state):
+    return [login(driver, state['username'])]
+
+
+def checkout(driver, fixtures, rng, state):
+    detail = driver.request('checkout_detail', 'GET', f'/api/products/{rng.choice(fixtures.product_slugs)}/')
+    variants = [variant for variant in (detail.body or {}).get('variants', []) if variant['stock'] > 0]
+    if not variants:
+        return [detail]
+    variant = rng.choice(variants)
+    order = driver.request('checkout', 'POST', '/api/orders/', {
+        'first_name': 'Bench', 'last_name': 'User', 'email': 'bench@example.com',
+        'address': '1 Benchmark Way', 'city': 'Loadville', 'state': 'LT', 'postal_code': '00000',
+        'country': 'Benchland', 'phone': '555-0100', 'payment_method': 'credit_card',
+        'items': [{
+            'product': detail.body['id'], 'variant': variant['id'], 'quantity': 1,
+            'color': variant['color'], 'size': variant['size'],
+        }],
+    }, headers={'Idempotency-Key': uuid.UUID(int=rng.getrandbits(128)).hex})
+    return [detail, order]
+
+
+def order_history(driver, fixtures, rng, state):
+    return [
+        driver.request('order_history', 'GET', '/api/orders/history/'),
+        driver.request('order_history_summary', 'GET', '/api/orders/history/?view=summary'),
+    ]
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'filter': filter_products,
+    'product_detail': product_detail,
+    'register': register,
+    'login': login_scenario,
+    'checkout': checkout,
+    'order_history': order_history,
+}
@@ -0,0 +1,84 @@
+"""
+JSON micro-benchmark: DRF's stdlib JSONRenderer/JSONParser against
+api.renderers.FastJSONRenderer / api.parsers.FastJSONParser, on real
+ProductListSerializer and OrderDetailSerializer output from the benchmark
+database. Outputs are checked to be byte-identical before timing.
+"""
+import time
+from io import BytesIO
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+def _best_of(func, repeat, number):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def payloads(products=500, orders=100):
+    from django.db.models import Prefetch
+    from orders.models import Order
+    from orders.serializers import OrderDetailSerializer
+    from products.models import Product
+    from products.serializers import ProductListSerializer
+
+    result = {}
+    product_rows = list(Product.objects.with_listing_data().order_by('id')[:products])
+    if product_rows:
+        result['ProductListSerializer'] = ProductListSerializer(product_rows, many=True).data
+    # Same loading as OrderViewSet.get_queryset
+    order_rows = list(
+        Order.objects.select_related('payment')
+        .prefetch_related(Prefetch('items__product', queryset=Product.objects.with_listing_data()))
+        .order_by('-id')[:orders]
+    )
+    if order_rows:
+        result['OrderDetailSerializer'] = OrderDetailSerializer(order_rows, many=True).data
+    return result
+
+
+def run_json_benchmark(products=500, orders=100, repeat=5, number=20, stdout=None):
+    from api.parsers import FastJSONParser, orjson
+    from api.renderers import FastJSONRenderer
+
+    def log(message):
+        if stdout:
+            stdout.write(message + '\n')
+
+    data = payloads(products, orders)
+    if not data:
+        raise RuntimeError('No products found; run "python -m benchmarks generate" first')
+    if 'OrderDetailSerializer' not in data:
+        log('No orders found; run the checkout scenario first to include OrderDetailSerializer')
+    log(f'orjson {"available" if orjson else "NOT installed, FastJSON* use the stdlib path"}')
+
+    results = {}
+    for name, payload in data.items():
+        baseline, fast = JSONRenderer(), FastJSONRenderer()
+        body = baseline.render(payload)
+        if fast.render(payload) != body:
+            raise AssertionError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+        if FastJSONParser().parse(BytesIO(body)) != JSONParser().parse(BytesIO(body)):
+            raise AssertionError(f'{name}: FastJSONParser result differs from JSONParser')
+
+        timings = {
+            'render_stdlib_ms': _best_of(lambda: baseline.render(payload), repeat, number),
+            'render_fast_ms': _best_of(lambda: fast.render(payload), repeat, number),
+            'parse_stdlib_ms': _best_of(lambda: JSONParser().parse(BytesIO(body)), repeat, number),
+            'parse_fast_ms': _best_of(lambda: FastJSONParser().parse(BytesIO(body)), repeat, number),
+        }
+        results[name] = {'rows': len(payload), 'bytes': len(body)}
+        results[name].update({key: round(value * 1000, 3) for key, value in timings.items()})
+        log(
+            f'{name} ({len(payload)} rows, {len(body)} bytes): '
+            f'render {results[name]["render_stdlib_ms"]}ms -> {results[name]["render_fast_ms"]}ms, '
+            f'parse {results[name]["parse_stdlib_ms"]}ms -> {results[name]["parse_fast_ms"]}ms'
+        )
+    return results
@@ -0,0 +1,38 @@
+import os
+
+from ecommerce.settings import *  # noqa: F401,F403
+from ecommerce.settings import BASE_DIR, CACHES, DATABASES
+
+# Keep synthetic catalogs out of the development database
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.getenv('BENCH_DB', str(BASE_DIR / 'benchmarks' / 'bench.sqlite3')),
+    }
+}
+
+# BENCH_SQLITE_PROFILE=default measures a bare sqlite3 connection: rollback
+# journal (WAL persists in the file, so it is switched back), deferred
+# transactions and a new connection per request
+if os.getenv('BENCH_SQLITE_PROFILE', 'tuned') == 'default':
+    DATABASES['default'] = {
+        'ENGINE': DATABASES['default']['ENGINE'],
+        'NAME': DATABASES['default']['NAME'],
+        'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    }
+    SQLITE_IMMEDIATE_WRITES = False
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+# Slow-request warnings would flood the output under load
+API_SLOW_REQUEST_THRESHOLD_MS = 60 * 1000
+
+# BENCH_CATALOG_CACHE=off measures catalog reads without the response cache
+if os.getenv('BENCH_CATALOG_CACHE', 'on') == 'off':
+    CACHES = {**CACHES, 'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# BENCH_THROTTLE=on keeps the rate limits; load tests from one address
+# would otherwise be throttled
+if os.getenv('BENCH_THROTTLE', 'off') != 'on':
+    API_THROTTLE_RATES = {}
@@ -0,0 +1,65 @@
+"""
+Per-request cost of the api.throttling checks: APIView.check_throttles() on
+an anonymous product search (the anon and search buckets), timed call by
+call with each counter store. Rates are high enough that nothing is
+refused, so every call takes the full path.
+"""
+import time
+
+from .contention import _percentile
+
+STORES = ('local', 'cache')
+BUDGET_US = 100
+
+RATES = {
+    'anon': {'rate': '1000/s', 'burst': 10 ** 9},
+    'user': {'rate': '1000/s', 'burst': 10 ** 9},
+    'search': {'rate': '1000/s', 'burst': 10 ** 9},
+}
+
+
+def run_throttle_benchmark(requests=20000, clients=1000, stores=STORES, cache_alias='default', stdout=None):
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from products.async_views import make_view
+    from products.views import ProductViewSet
+
+    def log(message):
+        if stdout:
+            stdout.write(message + '\n')
+
+    factory = APIRequestFactory()
+    views = []
+    for index in range(requests):
+        address = '10.%d.%d.%d' % (index % clients // 65536, index % clients // 256 % 256, index % clients % 256)
+        request = factory.get('/api/products/', {'search': 'shirt'}, REMOTE_ADDR=address)
+        view = make_view(ProductViewSet, 'list', request)
+        # Authenticated before the throttles run, as in APIView.initial
+        view.request.user
+        views.append(view)
+
+    results = {}
+    for store in stores:
+        with override_settings(
+            API_THROTTLE_RATES=RATES, API_THROTTLE_CACHE_ALIAS=cache_alias if store == 'cache' else None,
+        ):
+            timings = []
+            for view in views:
+                start = time.perf_counter()
+                view.check_throttles(view.request)
+                timings.append(time.perf_counter() - start)
+        mean_us = sum(timings) / len(timings) * 1e6
+        p99_us = _percentile(timings, 99) * 1e6
+        results[store] = {
+            'requests': requests,
+            'mean_us': round(mean_us, 1),
+            'p50_us': round(_percentile(timings, 50) * 1e6, 1),
+            'p99_us': round(p99_us, 1),
+            'within_budget': p99_us < BUDGET_US,
+        }
+        log(
+            f'{store}: mean {results[store]["mean_us"]}us, p50 {results[store]["p50_us"]}us, '
+            f'p99 {results[store]["p99_us"]}us per request '
+            f'({"within" if p99_us < BUDGET_US else "over"} the {BUDGET_US}us budget)'
+        )
+    return results
@@ -1,4 +1,5 @@
 import os
+import sys
 import django
 from django.utils.text import slugify
 
@@ -7,7 +8,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from products.models import Category, Product, ProductVariant
+from products.importer import CatalogImporter
 
 def create_samples():
     # Create categories
@@ -18,14 +19,11 @@ def create_samples():
         {"name": "Footwear", "description": "Shoes, boots, and sandals"}
     ]
     
-    for cat_data in categories:
-        Category.objects.get_or_create(
-            name=cat_data['name'],
-            defaults={
-                'slug': slugify(cat_data['name']),
-                'description': cat_data['description']
-            }
-        )
+    importer = CatalogImporter(stdout=sys.stdout)
+    importer.import_categories(enumerate(
+        ({'name': cat_data['name'], 'slug': slugify(cat_data['name']), 'description': cat_data['description']}
+         for cat_data in categories), 1
+    ))
     
     print(f"Created {len(categories)} categories")
     
@@ -69,49 +67,33 @@ def create_samples():
         },
     ]
     
+    # Variants per category: color, {size: SKU suffix}, stock
+    variant_plans = {
+        "Men": ("Black", {size: size for size in ["S", "M", "L", "XL"]}, 10),
+        "Women": ("Black", {size: size for size in ["S", "M", "L", "XL"]}, 10),
+        "Accessories": ("Black", {"One Size": "OS"}, 20),
+        "Footwear": ("Brown", {size: size for size in ["8", "9", "10", "11"]}, 8),
+    }
+
+    product_rows, variant_rows = [], []
     for product_data in products:
-        category_name = product_data.pop('category')
-        category = Category.objects.get(name=category_name)
-        
-        product, created = Product.objects.get_or_create(
-            name=product_data['name'],
-            defaults={
-                **product_data,
-                'slug': slugify(product_data['name']),
-                'category': category,
-                'in_stock': True,
-                'is_active': True
-            }
-        )
-        
-        if created:
-            # Create some variants
-            if category_name in ["Men", "Women"]:
-                for size in ["S", "M", "L", "XL"]:
-                    ProductVariant.objects.create(
-                        product=product,
-                        color="Black",
-                        size=size,
-                        stock=10,
-                        sku=f"{slugify(product_data['name'])}-{size}".upper()
-                    )
-            elif category_name == "Accessories":
-                ProductVariant.objects.create(
-                    product=product,
-                    color="Black",
-                    size="One Size",
-                    stock=20,
-                    sku=f"{slugify(product_data['name'])}-OS".upper()
-                )
-            elif category_name == "Footwear":
-                for size in ["8", "9", "10", "11"]:
-                    ProductVariant.objects.create(
-                        product=product,
-                        color="Brown",
-                        size=size,
-                        stock=8,
-                        sku=f"{slugify(product_data['name'])}-{size}".upper()
-                    )
+        slug = slugify(product_data['name'])
+        product_rows.append({**product_data, 'slug': slug, 'category': slugify(product_data['category'])})
+        color, sizes, stock = variant_plans[product_data['category']]
+        for size, suffix in sizes.items():
+            variant_rows.append({
+                'product': slug,
+                'color': color,
+                'size': size,
+                'stock': stock,
+                'sku': f"{slug}-{suffix}".upper()
+            })
+
+    importer.import_products(enumerate(product_rows, 1))
+    importer.import_variants(enumerate(variant_rows, 1))
+    importer.finish()
+    for message in importer.skipped:
+        print(f"Skipped {message}")
     
     print(f"Created {len(products)} products with variants")
     
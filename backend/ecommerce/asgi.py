@@ -7,5 +7,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+# Route catalog reads to the async views (see CATALOG_ASYNC_VIEWS)
+os.environ.setdefault('CATALOG_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
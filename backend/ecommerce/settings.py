@@ -39,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ApiMiddleware',
+    'accounts.middleware.PasswordHashingBusyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,13 +75,63 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Applied to every new SQLite connection. WAL lets readers run alongside
+# the single writer, and busy_timeout makes a blocked writer wait for the
+# lock instead of failing with "database is locked". WAL is recorded in the
+# database file itself, which is why db.sqlite3 is not tracked in git.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests, checked before reuse
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join('PRAGMA %s=%s' % pragma for pragma in SQLITE_PRAGMAS.items()),
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+        # A file rather than an in-memory database, so the concurrency tests'
+        # threads use separate connections with the pragmas above
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Write paths that read before they write (order creation, releasing
+# reservations) begin with BEGIN IMMEDIATE through
+# api.transactions.immediate_atomic, so they wait on busy_timeout for the
+# write lock rather than failing when a deferred transaction upgrades.
+# Other transactions stay deferred.
+SQLITE_IMMEDIATE_WRITES = True
+
+
+# Caches
+# The catalog response cache lives in its own alias; point it at a shared
+# backend (Redis, Memcached) when running several worker processes so
+# signal-driven invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -99,6 +151,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Django's defaults, with PBKDF2 hashed in a process pool (accounts.hashers)
+PASSWORD_HASHERS = [
+    'accounts.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Hashing processes per web process (0 hashes in the request thread), and
+# how many more hashes may wait for one before requests get 429. Size the
+# workers so that web processes x workers is about the number of cores.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', '2'))
+PASSWORD_HASHING_MAX_PENDING = 16
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -130,12 +197,111 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed when installed; the same output except for some float
+    # formatting (see api.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token buckets configured by API_THROTTLE_RATES
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonBucketThrottle',
+        'api.throttling.UserBucketThrottle',
+        'api.throttling.ScopedBucketThrottle',
+    ],
+    # Reverse proxies in front of the app. Client IPs for rate limits come
+    # from REMOTE_ADDR when 0; behind N proxies, from X-Forwarded-For as
+    # the Nth address from the right (the one the outermost proxy saw).
+    # Leave at 0 unless every request passes through them, or clients can
+    # pick their own IP with the header.
+    'NUM_PROXIES': int(os.getenv('API_NUM_PROXIES', '0')),
+}
+
+# Serve catalog GETs (product list/detail/featured, categories) from the
+# native async views in products.async_views. ecommerce.asgi turns this on;
+# under WSGI the sync viewsets are faster. See benchmarks/README.md for
+# WSGI vs ASGI numbers: with SQLite, WSGI with threads serves more.
+CATALOG_ASYNC_VIEWS = os.getenv('CATALOG_ASYNC_VIEWS', 'false').lower() == 'true'
+
+# Seconds a paginated total count (requested with ?include_count=true) is cached
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# Product facet counts (/api/products/facets/): upper bounds of the price
+# buckets, and how long each filter combination is cached
+PRODUCT_FACET_PRICE_BUCKETS = [25, 50, 100, 200]
+PRODUCT_FACET_CACHE_TIMEOUT = 300
+
+# Resized copies of uploaded images (api.images): width in pixels per size
+# name, encoded in each format. Generated after upload when
+# IMAGE_DERIVATIVES_ON_UPLOAD is set, otherwise on first request.
+IMAGE_DERIVATIVE_SIZES = {'thumb': 160, 'card': 480, 'detail': 1200}
+IMAGE_DERIVATIVE_FORMATS = ['webp', 'jpeg']
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVES_ON_UPLOAD = True
+# Only uploads under these storage prefixes have derivatives
+IMAGE_DERIVATIVE_SOURCE_DIRS = ['products/', 'profile_pictures/']
+
+# Background tasks (api.taskqueue, run by manage.py run_tasks). Uploads handed
+# to tasks are staged in TASK_STAGING_DIR, which workers must share with the
+# web processes. TASKS_EAGER runs tasks in-process after commit instead.
+TASK_STAGING_DIR = BASE_DIR / '.staging'
+TASK_LOCK_TIMEOUT = timedelta(minutes=10)
+TASK_RETRY_BACKOFF = timedelta(seconds=30)
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'false').lower() == 'true'
+
+# Profile picture uploads: largest accepted file, and the longest side the
+# stored picture is scaled down to
+PROFILE_PICTURE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+PROFILE_PICTURE_MAX_DIMENSION = 1024
+
+# import_catalog keeps downloaded product images here so re-imports skip them
+CATALOG_IMPORT_IMAGE_CACHE = BASE_DIR / '.import_cache'
+
+# How long checkout holds variant stock for an unpaid order before
+# release_expired_reservations returns it
+STOCK_RESERVATION_TTL = timedelta(minutes=30)
+
+# Idempotency-Key handling for POST /api/orders/: the Retry-After (seconds)
+# on the 409 a duplicate gets while the first request is in flight, when an
+# abandoned in-flight key can be taken over, and how long keys are kept
+# before purge_idempotency_keys
+IDEMPOTENCY_RETRY_AFTER = 1
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(seconds=60)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Rate limits (api.throttling): per scope, a bucket of `burst` requests per
+# client that refills at `rate`. "anon" is per IP for anonymous requests and
+# "user" per signed-in user on every endpoint; the others apply to the
+# endpoints that name them. Buckets are per process unless
+# API_THROTTLE_CACHE_ALIAS names a shared cache (Redis, Memcached).
+API_THROTTLE_RATES = {
+    'anon': {'rate': '20/s', 'burst': 100},
+    'user': {'rate': '50/s', 'burst': 200},
+    'register': {'rate': '10/hour', 'burst': 5},
+    'login': {'rate': '30/min', 'burst': 10},
+    'search': {'rate': '5/s', 'burst': 30},
+    # Image derivatives created on demand by api.views.derivative_view
+    'derivatives': {'rate': '2/s', 'burst': 20},
 }
+API_THROTTLE_CACHE_ALIAS = None
+
+# Request instrumentation (api.middleware.ApiMiddleware)
+API_SERVER_TIMING = True
+API_SLOW_REQUEST_THRESHOLD_MS = 500
+# /api/metrics/ answers requests from these addresses that also carry
+# "Authorization: Bearer <API_METRICS_TOKEN>" or come from a staff user
+API_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+API_METRICS_TOKEN = os.getenv('API_METRICS_TOKEN', '')
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -151,8 +317,25 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Rotation revokes through accounts.revocation, not the token_blacklist app
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RotatingTokenRefreshSerializer',
 }
 
+# Revoked tokens (accounts.revocation): each process keeps a Bloom filter of
+# revoked jtis, picks up revocations made by other processes every
+# REVOKED_TOKEN_SYNC_INTERVAL and rebuilds it without the expired ones every
+# REVOKED_TOKEN_REBUILD_INTERVAL. Run prune_revoked_tokens periodically.
+REVOKED_TOKEN_FILTER_CAPACITY = 1_000_000
+REVOKED_TOKEN_FILTER_ERROR_RATE = 0.001
+REVOKED_TOKEN_SYNC_INTERVAL = timedelta(seconds=5)
+REVOKED_TOKEN_REBUILD_INTERVAL = timedelta(hours=1)
+
+# Verified access tokens and their users are cached per process
+# (accounts.authentication). Entries are dropped when the user or profile
+# is saved in this process; other processes see changes within the TTL.
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = timedelta(seconds=60)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5000",
@@ -182,6 +365,7 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "idempotency-key",
 ]
 
 # Override the default user model if needed later
@@ -7,6 +7,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 
+from api.views import derivative_view
+
 def api_root(request):
     return JsonResponse({
         "status": "success",
@@ -27,4 +29,6 @@ urlpatterns = [
     path('', api_root, name='api_root'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Ahead of static() so missing derivatives are generated on demand
+    path(settings.MEDIA_URL.lstrip('/') + 'derivatives/<path:name>', derivative_view, name='image_derivative'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
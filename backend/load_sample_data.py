@@ -1,4 +1,5 @@
 import os
+import sys
 import django
 from django.utils.text import slugify
 
@@ -7,7 +8,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from products.models import Category, Product, ProductVariant, ProductImage
+from products.importer import CatalogImporter
+from products.models import Category
 from accounts.models import UserProfile
 
 def create_sample_categories():
@@ -18,16 +20,13 @@ def create_sample_categories():
         {"name": "Footwear", "description": "Shoes, boots, and sandals"}
     ]
     
-    for cat in categories:
-        slug = slugify(cat['name'])
-        Category.objects.get_or_create(
-            name=cat['name'],
-            defaults={
-                'slug': slug,
-                'description': cat['description']
-            }
-        )
-    
+    importer = CatalogImporter(stdout=sys.stdout)
+    importer.import_categories(enumerate(
+        ({'name': cat['name'], 'slug': slugify(cat['name']), 'description': cat['description']}
+         for cat in categories), 1
+    ))
+    importer.finish()
+
     print(f"Created {len(categories)} categories")
 
 def create_sample_products():
@@ -35,8 +34,6 @@ def create_sample_products():
     if Category.objects.count() == 0:
         create_sample_categories()
     
-    categories = Category.objects.all()
-    
     products = [
         {
             "name": "Classic Black T-Shirt",
@@ -175,49 +172,37 @@ def create_sample_products():
         }
     ]
     
+    product_rows, variant_rows, image_rows = [], [], []
     for product_data in products:
-        category_name = product_data.pop('category')
-        variants_data = product_data.pop('variants')
-        additional_images_data = product_data.pop('additional_images')
-        image_url = product_data.pop('image_url')
-        
-        # Get category
-        category = Category.objects.get(name=category_name)
-        
-        # Create or update product
         slug = slugify(product_data['name'])
-        product, created = Product.objects.get_or_create(
-            slug=slug,
-            defaults={
-                **product_data,
-                'category': category,
-                'in_stock': True,
-                'is_active': True
-            }
-        )
-        
-        if created:
-            # Save main image
-            product.image = image_url
-            product.save()
-            
-            # Create variants
-            for variant_data in variants_data:
-                ProductVariant.objects.create(
-                    product=product,
-                    **variant_data
-                )
-            
-            # Create additional images
-            for img_data in additional_images_data:
-                ProductImage.objects.create(
-                    product=product,
-                    image=img_data['image_url'],
-                    alt_text=img_data['alt_text'],
-                    is_featured=(img_data == additional_images_data[0])  # First one is featured
-                )
-    
-    print(f"Created {len(products)} products with variants and images")
+        product_rows.append({
+            'slug': slug,
+            'name': product_data['name'],
+            'category': slugify(product_data['category']),
+            'description': product_data['description'],
+            'price': product_data['price'],
+            'image': product_data['image_url'],
+        })
+        for variant_data in product_data['variants']:
+            variant_rows.append({'product': slug, **variant_data})
+        for index, img_data in enumerate(product_data['additional_images']):
+            image_rows.append({
+                'product': slug,
+                'image': img_data['image_url'],
+                'alt_text': img_data['alt_text'],
+                'is_featured': index == 0,  # First one is featured
+            })
+
+    # Images are downloaded concurrently and cached under CATALOG_IMPORT_IMAGE_CACHE
+    importer = CatalogImporter(stdout=sys.stdout)
+    importer.import_products(enumerate(product_rows, 1))
+    importer.import_variants(enumerate(variant_rows, 1))
+    importer.import_images(enumerate(image_rows, 1))
+    importer.finish()
+    for message in importer.skipped + importer.images.failures:
+        print(f"Skipped {message}")
+
+    print(f"Created or updated {len(products)} products with variants and images")
 
 if __name__ == "__main__":
     # Create categories
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Payment
+from .models import Order, OrderItem, Payment, StockReservation
 
 
 class OrderItemInline(admin.TabularInline):
@@ -26,3 +26,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ['id', 'order', 'payment_method', 'amount', 'status', 'created_at']
     list_filter = ['payment_method', 'status', 'created_at']
     search_fields = ['order__id', 'transaction_id']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'variant', 'quantity', 'status', 'expires_at']
+    list_filter = ['status', 'expires_at']
+    raw_id_fields = ['order', 'variant']
@@ -0,0 +1,75 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.transactions import immediate_atomic
+from products.inventory import return_stock, take_stock
+from .models import Order, StockReservation
+
+
+def reserve_stock(order, items):
+    """
+    Take stock for the variant lines of a new order and record it as held
+    until the payment completes or the hold expires.
+
+    Must run inside the transaction that creates the order, so a shortage
+    (InsufficientStock) rolls the whole order back.
+    """
+    quantities = Counter()
+    for item in items:
+        if item.variant_id:
+            quantities[item.variant_id] += item.quantity
+    if not quantities:
+        return []
+
+    take_stock(quantities)
+    expires_at = timezone.now() + settings.STOCK_RESERVATION_TTL
+    return StockReservation.objects.bulk_create([
+        StockReservation(order=order, variant_id=variant_id, quantity=quantity, expires_at=expires_at)
+        for variant_id, quantity in sorted(quantities.items())
+    ])
+
+
+def release_reservations(order_id):
+    """Put held stock back. Safe to call repeatedly or concurrently."""
+    with immediate_atomic():
+        returned = Counter()
+        for reservation in StockReservation.objects.filter(order_id=order_id, status='held'):
+            # Claim the row first so two releases cannot both return its stock
+            claimed = StockReservation.objects.filter(pk=reservation.pk, status='held').update(
+                status='released', updated_at=timezone.now()
+            )
+            if claimed:
+                returned[reservation.variant_id] += reservation.quantity
+        if returned:
+            return_stock(returned)
+    return sum(returned.values())
+
+
+def commit_reservations(order_id):
+    """Make held stock permanent once the order is paid"""
+    return StockReservation.objects.filter(order_id=order_id, status='held').update(
+        status='committed', updated_at=timezone.now()
+    )
+
+
+def release_expired_reservations(now=None):
+    """Cancel unpaid orders whose holds have expired and put their stock back"""
+    now = now or timezone.now()
+    # Orders moved past pending (e.g. by an admin) keep their stock
+    order_ids = set(
+        StockReservation.objects.filter(
+            status='held', expires_at__lte=now, order__status='pending'
+        ).values_list('order_id', flat=True)
+    )
+    cancelled = 0
+    for order_id in order_ids:
+        with transaction.atomic():
+            # Only release for orders this sweep cancels; one that left
+            # pending in the meantime is skipped
+            if Order.objects.filter(pk=order_id, status='pending').update(status='cancelled', updated_at=now):
+                release_reservations(order_id)
+                cancelled += 1
+    return cancelled
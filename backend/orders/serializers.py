@@ -1,29 +1,43 @@
 from rest_framework import serializers
+from api.sparse import SparseFieldsetMixin
+from api.transactions import immediate_atomic
 from .models import Order, OrderItem, Payment
-from products.serializers import ProductListSerializer
+from .reservations import reserve_stock
+from products.inventory import InsufficientStock
+from products.models import Product, ProductVariant
+from products.serializers import ProductListSerializer, ProductVariantSerializer
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     
+    expandable_fields = {
+        'variant': (ProductVariantSerializer, {'read_only': True}),
+    }
+    
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'price', 'quantity', 'color', 'size']
 
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    # Plain ids: OrderCreateSerializer resolves every line in one query per
+    # model instead of a PrimaryKeyRelatedField lookup per line.
+    product = serializers.IntegerField(min_value=1)
+    variant = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
     class Meta:
         model = OrderItem
         fields = ['product', 'variant', 'quantity', 'color', 'size']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'payment_method', 'transaction_id', 'amount', 'status', 'created_at']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     payment = PaymentSerializer(read_only=True)
     
@@ -32,7 +46,19 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'status', 'total_price', 'created_at', 'updated_at', 'items', 'payment']
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Filled in by annotations in OrderViewSet.get_queryset
+    item_count = serializers.IntegerField(read_only=True)
+    line_count = serializers.IntegerField(read_only=True)
+    payment_status = serializers.CharField(read_only=True, allow_null=True)
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_price', 'created_at', 'updated_at',
+                  'item_count', 'line_count', 'payment_status']
+
+
+class OrderDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     payment = PaymentSerializer(read_only=True)
     
@@ -56,6 +82,37 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             'postal_code', 'country', 'phone', 'items', 'payment_method'
         ]
     
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An order needs at least one item.")
+        
+        # Resolve all referenced products and variants with one query each
+        products = Product.objects.in_bulk({item['product'] for item in items})
+        variants = ProductVariant.objects.in_bulk(
+            {item['variant'] for item in items if item.get('variant')}
+        )
+        
+        errors = []
+        for item in items:
+            item_errors = {}
+            product = products.get(item['product'])
+            if product is None:
+                item_errors['product'] = [f'Invalid pk "{item["product"]}" - object does not exist.']
+            variant = None
+            if item.get('variant'):
+                variant = variants.get(item['variant'])
+                if variant is None:
+                    item_errors['variant'] = [f'Invalid pk "{item["variant"]}" - object does not exist.']
+                elif variant.product_id != item['product']:
+                    item_errors['variant'] = ['Variant does not belong to the selected product.']
+            errors.append(item_errors)
+            item['product'] = product
+            item['variant'] = variant
+        
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+    
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         payment_method = validated_data.pop('payment_method')
@@ -67,31 +124,40 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             quantity = item_data['quantity']
             total_price += product.price * quantity
         
-        # Create order
-        validated_data['user'] = self.context['request'].user
-        validated_data['total_price'] = total_price
-        order = Order.objects.create(**validated_data)
-        
-        # Create order items
-        for item_data in items_data:
-            product = item_data['product']
-            variant = item_data.get('variant')
-            OrderItem.objects.create(
+        with immediate_atomic():
+            # Create order
+            validated_data['user'] = self.context['request'].user
+            validated_data['total_price'] = total_price
+            order = Order.objects.create(**validated_data)
+            
+            # Create order items in a single INSERT
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item_data['product'],
+                    variant=item_data['variant'],
+                    price=item_data['product'].price,
+                    quantity=item_data['quantity'],
+                    color=item_data.get('color', ''),
+                    size=item_data.get('size', '')
+                )
+                for item_data in items_data
+            ])
+            
+            # Hold the stock; a shortage rolls the whole order back
+            try:
+                reserve_stock(order, items)
+            except InsufficientStock as exc:
+                raise serializers.ValidationError({
+                    'items': [f'Not enough stock for variant {variant_id}.' for variant_id in exc.variant_ids]
+                })
+            
+            # Create payment
+            Payment.objects.create(
                 order=order,
-                product=product,
-                variant=variant,
-                price=product.price,
-                quantity=item_data['quantity'],
-                color=item_data.get('color', ''),
-                size=item_data.get('size', '')
+                payment_method=payment_method,
+                amount=total_price,
+                status='pending'
             )
         
-        # Create payment
-        Payment.objects.create(
-            order=order,
-            payment_method=payment_method,
-            amount=total_price,
-            status='pending'
-        )
-        
         return order
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Order, Payment
+from .reservations import commit_reservations, release_reservations
+
+
+@receiver(post_save, sender=Payment)
+def settle_reservations(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.status == 'completed':
+        commit_reservations(instance.order_id)
+    elif instance.status == 'failed':
+        release_reservations(instance.order_id)
+
+
+@receiver(post_save, sender=Order)
+def release_cancelled_order(sender, instance, raw=False, **kwargs):
+    if not raw and instance.status == 'cancelled':
+        release_reservations(instance.pk)
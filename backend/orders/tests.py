@@ -0,0 +1,226 @@
+import sqlite3
+import threading
+from collections import Counter
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.models import IdempotencyKey
+from api.transactions import immediate_atomic
+from products.models import Category, Product, ProductVariant
+from .models import Order, StockReservation
+from .reservations import release_reservations
+from .serializers import OrderCreateSerializer
+
+ORDER_DATA = {
+    'first_name': 'Test', 'last_name': 'User', 'email': 'test@example.com',
+    'address': '1 Test Way', 'city': 'Testville', 'state': 'TS', 'postal_code': '00000',
+    'country': 'Testland', 'phone': '555-0100', 'payment_method': 'credit_card',
+}
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Hundreds of simultaneous checkouts for one SKU never sell more than its stock"""
+    buyers = 200
+    stock = 25
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'x')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+        self.variant = ProductVariant.objects.create(
+            product=self.product, color='Blue', size='M', stock=self.stock, sku='SHIRT-BLUE-M'
+        )
+
+    def checkout(self, barrier, outcomes, stock_seen):
+        request = SimpleNamespace(user=self.user)
+        serializer = OrderCreateSerializer(data={
+            **ORDER_DATA, 'items': [{'product': self.product.pk, 'variant': self.variant.pk, 'quantity': 1}],
+        }, context={'request': request})
+        try:
+            barrier.wait()
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except ValidationError:
+            outcomes.append('rejected')
+        except OperationalError as exc:
+            outcomes.append('locked' if 'locked' in str(exc) else 'errors')
+        else:
+            outcomes.append('created')
+        finally:
+            stock_seen.append(ProductVariant.objects.values_list('stock', flat=True).get(pk=self.variant.pk))
+            connection.close()
+
+    def test_parallel_orders_for_one_variant(self):
+        barrier = threading.Barrier(self.buyers)
+        outcomes = []
+        stock_seen = []
+        threads = [
+            threading.Thread(target=self.checkout, args=(barrier, outcomes, stock_seen))
+            for _ in range(self.buyers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        outcomes = Counter(outcomes)
+
+        self.assertEqual(outcomes['created'], self.stock)
+        self.assertEqual(outcomes['rejected'], self.buyers - self.stock)
+        self.assertEqual(outcomes['locked'] + outcomes['errors'], 0)
+        self.assertGreaterEqual(min(stock_seen), 0)
+
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        reservations = StockReservation.objects.filter(variant=self.variant, status='held')
+        self.assertEqual(reservations.count(), self.stock)
+        self.assertEqual(reservations.aggregate(total=Sum('quantity'))['total'], self.stock)
+        self.assertEqual(set(reservations.values_list('order_id', flat=True)), set(Order.objects.values_list('pk', flat=True)))
+
+
+class SQLiteWriteContentionTests(TransactionTestCase):
+    """Concurrent writers wait for the SQLite write lock instead of failing with 'database is locked'"""
+    writers = 8
+    rounds = 5
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite locking only')
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'x')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+        self.variant = ProductVariant.objects.create(
+            product=self.product, color='Blue', size='M', stock=1000, sku='SHIRT-BLUE-M'
+        )
+
+    def place_and_cancel(self, barrier, errors):
+        request = SimpleNamespace(user=self.user)
+        try:
+            barrier.wait()
+            for _ in range(self.rounds):
+                serializer = OrderCreateSerializer(data={
+                    **ORDER_DATA, 'items': [{'product': self.product.pk, 'variant': self.variant.pk, 'quantity': 1}],
+                }, context={'request': request})
+                serializer.is_valid(raise_exception=True)
+                release_reservations(serializer.save().pk)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_concurrent_writers_are_not_locked_out(self):
+        barrier = threading.Barrier(self.writers)
+        errors = []
+        threads = [threading.Thread(target=self.place_and_cancel, args=(barrier, errors)) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), self.writers * self.rounds)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 1000)
+
+    def writer_is_locked_out(self):
+        other = sqlite3.connect(connection.settings_dict['NAME'], timeout=0)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError:
+            return True
+        other.rollback()
+        return False
+
+    def test_only_immediate_atomic_takes_the_write_lock_up_front(self):
+        with immediate_atomic():
+            self.assertTrue(self.writer_is_locked_out())
+        with transaction.atomic():
+            self.assertFalse(self.writer_is_locked_out())
+            with immediate_atomic():
+                self.assertFalse(self.writer_is_locked_out())
+        self.assertNotEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class IdempotentCheckoutTests(TestCase):
+    """POST /api/orders/ with an Idempotency-Key creates one order however often it is sent"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'x')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        product = Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+        variant = ProductVariant.objects.create(product=product, color='Blue', size='M', stock=10, sku='SHIRT-BLUE-M')
+        cls.order = {**ORDER_DATA, 'items': [{'product': product.pk, 'variant': variant.pk, 'quantity': 1}]}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, key, data=None):
+        return self.client.post('/api/orders/', data or self.order, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_duplicate_of_an_in_flight_request_gets_409_at_once(self):
+        self.assertEqual(self.place('checkout-1').status_code, 201)
+        # As a worker still running the first attempt would have left it
+        IdempotencyKey.objects.update(status='in_progress', response_status=None, response_body=None)
+
+        response = self.place('checkout-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.place('checkout-1')
+        retry = self.place('checkout-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(ProductVariant.objects.get().stock, 9)
+
+    def test_reusing_a_key_for_another_request_is_422(self):
+        self.place('checkout-1')
+        changed = {**self.order, 'city': 'Elsewhere'}
+        self.assertEqual(self.place('checkout-1', changed).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.place('checkout-1')
+        self.client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'x'))
+        response = self.place('checkout-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_attempt_frees_the_key(self):
+        self.assertEqual(self.place('checkout-1', {**self.order, 'items': []}).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.place('checkout-1').status_code, 201)
+
+    def test_abandoned_key_is_taken_over(self):
+        self.place('checkout-1')
+        Order.objects.all().delete()
+        IdempotencyKey.objects.update(
+            status='in_progress', response_status=None, response_body=None,
+            locked_at=timezone.now() - timedelta(minutes=5),
+        )
+        response = self.place('checkout-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_without_a_key_every_request_creates_an_order(self):
+        for _ in range(2):
+            self.client.post('/api/orders/', self.order, format='json')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_overlong_key_is_rejected(self):
+        self.assertEqual(self.place('k' * 256).status_code, 400)
@@ -1,33 +1,67 @@
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db.models import Count, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
+from api.idempotency import idempotent_response
+from api.middleware import SerializerTimingMixin
+from api.sparse import SparseQuerysetMixin
+from products.models import Product
 from .models import Order
 from .serializers import (
     OrderSerializer,
     OrderDetailSerializer,
-    OrderCreateSerializer
+    OrderCreateSerializer,
+    OrderSummarySerializer
 )
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SerializerTimingMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def is_summary(self):
+        return (
+            self.action in ('list', 'history')
+            and self.request.query_params.get('view') == 'summary'
+        )
+    
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = Order.objects.filter(user=self.request.user)
+        
+        # ?view=summary: totals and counts come from the same query
+        if self.is_summary():
+            return self.sparse_queryset(queryset.annotate(
+                item_count=Coalesce(Sum('items__quantity'), 0),
+                line_count=Count('items'),
+                payment_status=F('payment__status'),
+            ))
+        
+        return self.sparse_queryset(queryset.select_related('payment').prefetch_related(
+            Prefetch('items__product', queryset=Product.objects.with_listing_data())
+        ))
     
     def get_serializer_class(self):
         if self.action == 'create':
             return OrderCreateSerializer
         elif self.action == 'retrieve':
             return OrderDetailSerializer
+        elif self.is_summary():
+            return OrderSummarySerializer
         return OrderSerializer
     
     def create(self, request, *args, **kwargs):
+        # Clients may retry with the same Idempotency-Key header without
+        # creating a second order
+        return idempotent_response(request, 'orders:create', lambda: self._create(request))
+    
+    def _create(self, request):
         serializer = self.get_serializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
         
+        # Reload through get_queryset so the response is built from prefetches
+        order = self.get_queryset().get(pk=order.pk)
         return Response(
             OrderDetailSerializer(order).data,
             status=status.HTTP_201_CREATED
@@ -0,0 +1,205 @@
+"""
+Native async handlers for the hot catalog reads, used when
+CATALOG_ASYNC_VIEWS is on (the default under ecommerce.asgi).
+
+GET and HEAD on the product list, detail, featured and category endpoints
+are answered on the event loop through the async ORM and async cache
+calls. Their responses match the ProductViewSet / CategoryViewSet ones,
+including authentication, permissions, throttling, the catalog cache,
+ETag/Last-Modified validators and cursor pagination, because they reuse the
+viewsets' configuration, querysets and serializers. They only render JSON:
+other methods, and requests that negotiate another renderer (the browsable
+API, ?format=api), fall through to the synchronous viewset.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.views import APIView
+
+from api.renderers import FastJSONRenderer
+from api.throttling import acheck_throttles
+from .cache import catalog_cache
+from .conditional import not_modified_response, set_validators
+from .models import Category, Product
+from .views import CategoryViewSet, ProductViewSet
+
+renderer = FastJSONRenderer()
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def json_response(data):
+    return HttpResponse(renderer.render(data), content_type='application/json')
+
+
+def add_view_headers(response, allow):
+    # What APIView.finalize_response adds to the sync responses, 304s included
+    patch_vary_headers(response, ('Accept',))
+    response['Allow'] = allow
+    return response
+
+
+def error_response(view, exc, allow):
+    """The response APIView.handle_exception gives the sync viewset for exc"""
+    response = view.finalize_response(view.request, view.handle_exception(exc))
+    response['Allow'] = allow
+    return response.render()
+
+
+def make_view(viewset_class, action, request, **kwargs):
+    """
+    A viewset instance set up as dispatch() would, without running its
+    handler, or None when content negotiation picks a renderer other than
+    JSON (or none at all).
+    """
+    view = viewset_class(action=action, args=(), kwargs=kwargs, format_kwarg=None)
+    # Vary: Accept as APIView.initial sets it; Allow is replaced per route
+    view.headers = view.default_response_headers
+    # ViewSetMixin.initialize_request needs the action map as_view() sets up
+    view.request = APIView.initialize_request(view, request, **kwargs)
+    try:
+        accepted_renderer, accepted_media_type = view.perform_content_negotiation(view.request)
+    except APIException:
+        return None
+    if accepted_renderer.format != renderer.format:
+        return None
+    view.request.accepted_renderer = renderer
+    view.request.accepted_media_type = accepted_media_type
+    return view
+
+
+async def ainitial(view):
+    """
+    The authentication, permission and throttle checks of APIView.initial,
+    run on the event loop where they don't touch the database; raises
+    APIException like the sync ones.
+    """
+    request = view.request
+    if 'HTTP_AUTHORIZATION' in request.META:
+        # Verifying a token may load the user and the revocation filter
+        await sync_to_async(view.perform_authentication)(request)
+    else:
+        view.perform_authentication(request)
+    view.check_permissions(request)
+    await acheck_throttles(view)
+
+
+async def catalog_response(view, build_data, allow):
+    """
+    Async counterpart of APIView.initial, CatalogCacheMixin.cached_response
+    and ConditionalGetMixin.conditional_response. ``build_data`` returns the
+    payload, or None for a 404.
+    """
+    request = view.request
+    try:
+        await ainitial(view)
+    except APIException as exc:
+        return error_response(view, exc, allow)
+
+    # A cached entry carries its validators, so a hit needs no query
+    key = catalog_cache.key_for(request)
+    entry = await catalog_cache.aget(key)
+    if entry is not None:
+        validators = entry.get('validators')
+        response = not_modified_response(request, validators)
+        if response is None:
+            response = json_response(entry['data'])
+        cache_status = 'HIT'
+    else:
+        validators = await view.aget_validators(request)
+        response = not_modified_response(request, validators)
+        if response is None:
+            try:
+                data = await build_data()
+                if data is None:
+                    raise NotFound('No %s matches the given query.' % view.get_queryset().model._meta.object_name)
+            except NotFound as exc:
+                return error_response(view, exc, allow)
+            await catalog_cache.aset(key, data, view.get_cache_tags(data), validators)
+            response = json_response(data)
+        cache_status = 'MISS'
+
+    if validators is not None:
+        set_validators(response, *validators)
+    response['X-Cache'] = cache_status
+    return add_view_headers(response, allow)
+
+
+def with_sync_fallback(viewset_class, actions):
+    """
+    Serve JSON GET/HEAD requests with the decorated coroutine, called with
+    the viewset instance for actions['get'], and the rest with the sync
+    viewset.
+    """
+    sync_view = sync_to_async(viewset_class.as_view(actions))
+
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method in SAFE_METHODS:
+                viewset = make_view(viewset_class, actions['get'], request, **kwargs)
+                if viewset is not None:
+                    return await handler(viewset, **kwargs)
+            return await sync_view(request, *args, **kwargs)
+        view.__name__ = handler.__name__
+        return view
+    return decorator
+
+
+@with_sync_fallback(ProductViewSet, {'get': 'list', 'post': 'create'})
+async def product_list(view):
+
+    async def build_data():
+        paginator = view.paginator
+        page = await paginator.apaginate_queryset(view.get_queryset(), view.request, view)
+        serializer = view.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return await catalog_response(view, build_data, 'GET, POST, HEAD, OPTIONS')
+
+
+@with_sync_fallback(ProductViewSet, {'get': 'featured'})
+async def product_featured(view):
+
+    async def build_data():
+        products = view.get_queryset().filter(in_stock=True)[:8]
+        items = [product async for product in products.aiterator(chunk_size=8)]
+        return view.get_serializer(items, many=True).data
+
+    return await catalog_response(view, build_data, 'GET, HEAD, OPTIONS')
+
+
+@with_sync_fallback(ProductViewSet, {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+async def product_detail(view, slug):
+
+    async def build_data():
+        try:
+            view.object = await view.get_queryset().aget(slug=slug)
+        except Product.DoesNotExist:
+            return None
+        return view.get_serializer(view.object).data
+
+    return await catalog_response(view, build_data, 'GET, PUT, PATCH, DELETE, HEAD, OPTIONS')
+
+
+@with_sync_fallback(CategoryViewSet, {'get': 'list', 'post': 'create'})
+async def category_list(view):
+
+    async def build_data():
+        categories = [category async for category in view.get_queryset().aiterator()]
+        return view.get_serializer(categories, many=True).data
+
+    return await catalog_response(view, build_data, 'GET, POST, HEAD, OPTIONS')
+
+
+@with_sync_fallback(CategoryViewSet, {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+async def category_detail(view, slug):
+
+    async def build_data():
+        try:
+            category = await view.get_queryset().aget(slug=slug)
+        except Category.DoesNotExist:
+            return None
+        return view.get_serializer(category).data
+
+    return await catalog_response(view, build_data, 'GET, PUT, PATCH, DELETE, HEAD, OPTIONS')
@@ -0,0 +1,169 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import not_modified_response, set_validators
+
+PRODUCT_LIST_TAG = 'product-list'
+CATEGORIES_TAG = 'categories'
+
+
+def product_tag(product_id):
+    return 'product:%s' % product_id
+
+
+def category_tag(category_id):
+    return 'category:%s' % category_id
+
+
+class CatalogCache:
+    """
+    Response cache for the public catalog endpoints.
+
+    Entries are stored with the version of every tag they depend on, and a
+    tag is invalidated by bumping its version, so one product edit only
+    drops the responses that embed that product. An entry also keeps the
+    response's ETag/Last-Modified validators, so a conditional request for
+    a cached response needs no database query at all. Works with any Django
+    cache backend; configure CACHES[CATALOG_CACHE_ALIAS] with a shared
+    backend when running more than one process.
+    """
+    key_prefix = 'catalog'
+
+    def __init__(self):
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+    def key_for(self, request):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value != ''
+        )
+        raw = '%s|%s|%r' % (request.build_absolute_uri(request.path), request.accepted_renderer.format, params)
+        return '%s:entry:%s' % (self.key_prefix, hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+    def _tag_key(self, tag):
+        return '%s:tag:%s' % (self.key_prefix, tag)
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        current = self.backend.get_many(self._entry_tag_keys(entry)) if entry is not None else {}
+        return self._unwrap(entry, current)
+
+    async def aget(self, key):
+        entry = await self.backend.aget(key)
+        current = await self.backend.aget_many(self._entry_tag_keys(entry)) if entry is not None else {}
+        return self._unwrap(entry, current)
+
+    def _entry_tag_keys(self, entry):
+        return [self._tag_key(tag) for tag in entry['tags']]
+
+    def _unwrap(self, entry, current):
+        if entry is not None:
+            tag_versions = entry['tags']
+            if all(current.get(self._tag_key(tag), 0) == version for tag, version in tag_versions.items()):
+                self._record('hits')
+                return entry
+        self._record('misses')
+        return None
+
+    def set(self, key, data, tags, validators=None):
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        current = self.backend.get_many(tag_keys)
+        self.backend.set(key, self._entry(data, tags, validators, tag_keys, current))
+
+    async def aset(self, key, data, tags, validators=None):
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        current = await self.backend.aget_many(tag_keys)
+        await self.backend.aset(key, self._entry(data, tags, validators, tag_keys, current))
+
+    def _entry(self, data, tags, validators, tag_keys, current):
+        return {
+            'data': data,
+            # (etag, last_modified timestamp) from ConditionalGetMixin, or None
+            'validators': validators,
+            'tags': {tag: current.get(tag_key, 0) for tag, tag_key in zip(tags, tag_keys)},
+        }
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            # add() seeds the version without overwriting a concurrent bump
+            self.backend.add(tag_key, 0, None)
+            try:
+                self.backend.incr(tag_key)
+            except ValueError:
+                self.backend.set(tag_key, 1, None)
+        self._record('invalidations', len(tags))
+
+    def invalidate_on_commit(self, *tags):
+        transaction.on_commit(lambda: self.invalidate(*tags))
+
+    def _record(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        return {
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'invalidations': stats.get('invalidations', 0),
+            'hit_ratio': round(stats.get('hits', 0) / lookups, 4) if lookups else None,
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+class CatalogCacheMixin:
+    """
+    Serve safe read actions of a catalog viewset from catalog_cache.
+
+    Goes in front of ConditionalGetMixin: a hit is answered, 304 included,
+    from the validators stored with it, and only a miss runs the validator
+    query.
+    """
+
+    def get_cache_tags(self, data):
+        raise NotImplementedError
+
+    def cached_response(self, request, build_response):
+        key = catalog_cache.key_for(request)
+        entry = catalog_cache.get(key)
+        if entry is not None:
+            validators = entry.get('validators')
+            response = not_modified_response(request, validators)
+            if response is None:
+                response = Response(entry['data'])
+                if validators is not None:
+                    set_validators(response, *validators)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = build_response()
+        if response.status_code == 200:
+            catalog_cache.set(
+                key, response.data, self.get_cache_tags(response.data), getattr(self, 'validators', None)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
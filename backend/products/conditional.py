@@ -0,0 +1,112 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _state_aggregates(related_timestamps):
+    aggregates = {'count': Count('pk'), 'updated_at': Max('updated_at')}
+    for index, lookup in enumerate(related_timestamps):
+        aggregates['related_%s' % index] = Max(lookup)
+    return aggregates
+
+
+def _state_result(state):
+    timestamps = [value for name, value in state.items() if name != 'count' and value is not None]
+    return (max(timestamps) if timestamps else None), state['count']
+
+
+def queryset_state(queryset, *related_timestamps):
+    """
+    Return (last_modified, row_count) for a queryset in one aggregate query.
+
+    related_timestamps names extra updated_at lookups whose rows are
+    embedded in the payload, e.g. 'category__updated_at'.
+    """
+    return _state_result(queryset.order_by().aggregate(**_state_aggregates(related_timestamps)))
+
+
+async def aqueryset_state(queryset, *related_timestamps):
+    return _state_result(await queryset.order_by().aaggregate(**_state_aggregates(related_timestamps)))
+
+
+def make_validators(request, renderer_format, last_modified, count):
+    """Return (etag, last_modified timestamp) for a response representing this state"""
+    fingerprint = '%s|%s|%s|%s' % (
+        request.get_full_path(),
+        renderer_format,
+        last_modified.isoformat() if last_modified else '',
+        count,
+    )
+    etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+    return etag, (timegm(last_modified.utctimetuple()) if last_modified else None)
+
+
+def set_validators(response, etag, last_modified_ts):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response['ETag'] = etag
+        if last_modified_ts is not None:
+            response['Last-Modified'] = http_date(last_modified_ts)
+        # Let clients keep the payload but revalidate it on every use
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def not_modified_response(request, validators):
+    """
+    The 304 for a request whose If-None-Match / If-Modified-Since match
+    validators, an (etag, last_modified timestamp) pair or None; else None.
+    """
+    if validators is None:
+        return None
+    response = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+    return set_validators(response, *validators) if response is not None else None
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match / If-Modified-Since with 304 before the queryset is
+    serialized, using validators derived from updated_at columns.
+
+    The validators are left on the view as ``validators`` so
+    CatalogCacheMixin, which wraps this mixin, can store them with the
+    payload and answer later requests without the aggregate query.
+    """
+
+    # updated_at lookups of related rows embedded in the payload
+    validator_timestamps = ()
+    validators = None
+
+    def get_validator_queryset(self):
+        raise NotImplementedError
+
+    def get_validators(self, request):
+        last_modified, count = queryset_state(self.get_validator_queryset(), *self.validator_timestamps)
+        return self._validators(request, last_modified, count)
+
+    async def aget_validators(self, request):
+        last_modified, count = await aqueryset_state(self.get_validator_queryset(), *self.validator_timestamps)
+        return self._validators(request, last_modified, count)
+
+    def _validators(self, request, last_modified, count):
+        if not count:
+            # Nothing to validate against (empty list or a 404 to come)
+            return None
+        return make_validators(request, request.accepted_renderer.format, last_modified, count)
+
+    def conditional_response(self, request, build_response):
+        self.validators = self.get_validators(request)
+        response = not_modified_response(request, self.validators)
+        if response is None:
+            response = build_response()
+            if self.validators is not None:
+                set_validators(response, *self.validators)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
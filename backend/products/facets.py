@@ -0,0 +1,104 @@
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Value, When
+
+from .models import ProductVariant
+
+FACET_PARAMS = ('category', 'price_min', 'price_max', 'in_stock', 'search')
+FACETS_VERSION_KEY = 'product-facets:version'
+IN_STOCK_TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+
+def get_price_buckets():
+    # Upper bounds of each price bucket; the last bucket is open ended
+    return [Decimal(str(bound)) for bound in getattr(settings, 'PRODUCT_FACET_PRICE_BUCKETS', [25, 50, 100, 200])]
+
+
+def parse_in_stock(value):
+    """?in_stock= as a bool: true/1/yes/on in any case, anything else is off"""
+    return (value or '').strip().lower() in IN_STOCK_TRUE_VALUES
+
+
+def facets_cache_key(params):
+    normalized = []
+    for name in FACET_PARAMS:
+        value = params.get(name, '').strip()
+        if name == 'search':
+            value = ' '.join(value.lower().split())
+        elif name == 'in_stock':
+            # TRUE, true and 1 filter the same products, so share one entry
+            value = '1' if parse_in_stock(value) else ''
+        if value:
+            normalized.append('%s=%s' % (name, value))
+    version = cache.get_or_set(FACETS_VERSION_KEY, 1, None)
+    digest = hashlib.md5('&'.join(normalized).encode('utf-8')).hexdigest()
+    return 'product-facets:%s:%s' % (version, digest)
+
+
+def invalidate_facets():
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        cache.set(FACETS_VERSION_KEY, 1, None)
+
+
+def _facet_rows(queryset, facet, value, label, count):
+    return queryset.order_by().values(
+        facet=Value(facet, output_field=CharField()),
+        value=value,
+        label=label,
+    ).annotate(count=count)
+
+
+def compute_facets(products, products_any_category, products_any_price):
+    """
+    Count products per category, price bucket, and in-stock variant
+    color/size in a single UNION ALL query.
+
+    Each facet is counted against the current filters minus its own, so
+    picking a category still shows the counts of the other categories.
+    """
+    buckets = get_price_buckets()
+    bucket_case = Case(
+        *[When(price__lt=bound, then=Value(str(index))) for index, bound in enumerate(buckets)],
+        default=Value(str(len(buckets))),
+        output_field=CharField(),
+    )
+    empty = Value('', output_field=CharField())
+    variants = ProductVariant.objects.filter(
+        stock__gt=0, product__in=products.order_by().values('id'),
+    )
+
+    queries = [
+        _facet_rows(products_any_category, 'category', F('category__slug'), F('category__name'),
+                    Count('id', distinct=True)),
+        _facet_rows(products_any_price, 'price', bucket_case, empty, Count('id', distinct=True)),
+        _facet_rows(variants, 'color', F('color'), empty, Count('product', distinct=True)),
+        _facet_rows(variants, 'size', F('size'), empty, Count('product', distinct=True)),
+    ]
+    rows = queries[0].union(*queries[1:], all=True)
+
+    facets = {'categories': [], 'price': [], 'colors': [], 'sizes': []}
+    for row in rows:
+        if row['facet'] == 'category':
+            facets['categories'].append({'slug': row['value'], 'name': row['label'], 'count': row['count']})
+        elif row['facet'] == 'price':
+            index = int(row['value'])
+            facets['price'].append({
+                'min': str(buckets[index - 1]) if index else '0',
+                'max': str(buckets[index]) if index < len(buckets) else None,
+                'count': row['count'],
+            })
+        elif row['facet'] == 'color':
+            facets['colors'].append({'value': row['value'], 'count': row['count']})
+        else:
+            facets['sizes'].append({'value': row['value'], 'count': row['count']})
+
+    facets['categories'].sort(key=lambda item: item['name'])
+    facets['price'].sort(key=lambda item: Decimal(item['min']))
+    facets['colors'].sort(key=lambda item: item['value'])
+    facets['sizes'].sort(key=lambda item: item['value'])
+    return facets
@@ -0,0 +1,338 @@
+"""
+Bulk catalog importer behind the import_catalog management command.
+
+Rows are streamed from CSV or JSON Lines files and upserted one batch at a
+time with bulk_create(update_conflicts=True), so memory stays flat however
+large the input is. Categories, products and variants are keyed by slug or
+SKU, which makes re-running an import update rows in place. Foreign keys
+are resolved through in-memory slug -> id maps instead of per-row lookups.
+"""
+import csv
+import hashlib
+import json
+import mimetypes
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import CATEGORIES_TAG, PRODUCT_LIST_TAG, catalog_cache, product_tag
+from .facets import invalidate_facets
+from .inventory import sync_in_stock
+from .models import Category, Product, ProductImage, ProductVariant
+from .search import get_search_backend
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+IMAGE_UPLOAD_DIR = 'products/imported'
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+def read_rows(path):
+    """Yield (line number, row dict) from a .csv or .jsonl/.ndjson file"""
+    suffix = Path(path).suffix.lower()
+    with open(path, newline='', encoding='utf-8') as handle:
+        if suffix == '.csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+        elif suffix in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(handle, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as exc:
+                        raise CatalogImportError('%s:%s: %s' % (path, line_number, exc))
+        else:
+            raise CatalogImportError('%s: expected a .csv, .jsonl or .ndjson file' % path)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(row, name, default=''):
+    value = row.get(name)
+    return default if value is None else str(value).strip()
+
+
+def _bool(row, name, default):
+    value = row.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def touch_products(product_ids):
+    # Bulk writes skip the touch_product signal that keeps updated_at a validator
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+class ImageFetcher:
+    """
+    Turns image references into storage names.
+
+    http(s) URLs are downloaded on a bounded thread pool and kept in a local
+    cache directory keyed by the URL hash, so re-imports never download the
+    same image twice. Anything else is taken to be a name already in
+    storage and used as is.
+    """
+
+    def __init__(self, workers=8, cache_dir=None, timeout=30):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='catalog-images')
+        self.cache_dir = Path(cache_dir or getattr(
+            settings, 'CATALOG_IMPORT_IMAGE_CACHE', Path(settings.BASE_DIR) / '.import_cache'
+        ))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self.failures = []
+
+    def fetch_all(self, references):
+        """Map each reference to a storage name, or None when it can't be fetched"""
+        remote = {ref for ref in references if ref.startswith(('http://', 'https://'))}
+        names = {ref: ref for ref in references if ref and ref not in remote}
+        names.update(zip(remote, self.pool.map(self._fetch, remote)))
+        return names
+
+    def _fetch(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        extension = os.path.splitext(url.split('?', 1)[0])[1].lower()
+        if extension not in ('.jpg', '.jpeg', '.png', '.gif', '.webp'):
+            extension = None
+        # Stale .part files from older versions are partial downloads
+        cached = next((path for path in self.cache_dir.glob(digest + '.*') if path.suffix != '.part'), None)
+        try:
+            if cached is None:
+                with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    content = response.read()
+                    extension = extension or mimetypes.guess_extension(
+                        response.headers.get_content_type()) or '.jpg'
+                cached = self.cache_dir / (digest + extension)
+                # Named so the cache lookup above never finds it
+                partial = self.cache_dir / ('.%s.tmp' % digest)
+                partial.write_bytes(content)
+                partial.replace(cached)
+            name = '%s/%s' % (IMAGE_UPLOAD_DIR, cached.name)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(cached.read_bytes()))
+            return name
+        except (OSError, ValueError) as exc:
+            # ValueError: a malformed URL, e.g. http://[bad
+            self.failures.append('%s: %s' % (url, exc))
+            return None
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class CatalogImporter:
+    """
+    Upserts categories, products, variants and images.
+
+    Import categories before the products that reference them and products
+    before their variants and images; each step looks its parents up by
+    slug. Rows referring to an unknown slug are skipped and reported.
+    """
+
+    def __init__(self, batch_size=2000, image_workers=8, image_cache=None, stdout=None):
+        self.batch_size = batch_size
+        self.images = ImageFetcher(workers=image_workers, cache_dir=image_cache)
+        self.stdout = stdout
+        self.category_ids = dict(Category.objects.values_list('slug', 'id'))
+        self.product_ids = {}
+        self.skipped = []
+        self.counts = {'categories': 0, 'products': 0, 'variants': 0, 'images': 0}
+
+    def log(self, message):
+        if self.stdout:
+            # A management command's OutputWrapper doesn't add a second newline
+            self.stdout.write(message + '\n')
+
+    def skip(self, line, message):
+        self.skipped.append('line %s: %s' % (line, message))
+
+    def resolve_products(self, slugs):
+        missing = [slug for slug in slugs if slug not in self.product_ids]
+        if missing:
+            self.product_ids.update(Product.objects.filter(slug__in=missing).values_list('slug', 'id'))
+
+    def import_categories(self, rows):
+        for batch in batched(rows, self.batch_size):
+            by_slug = {}
+            for line, row in batch:
+                name = _text(row, 'name')
+                if not name:
+                    self.skip(line, 'category without a name')
+                    continue
+                slug = _text(row, 'slug') or slugify(name)
+                by_slug[slug] = Category(name=name, slug=slug, description=_text(row, 'description'))
+            with transaction.atomic():
+                Category.objects.bulk_create(
+                    by_slug.values(), update_conflicts=True, unique_fields=['slug'],
+                    update_fields=['name', 'description', 'updated_at'],
+                )
+                self.category_ids.update(Category.objects.filter(slug__in=by_slug).values_list('slug', 'id'))
+                # Category names are part of every product's search document
+                backend = get_search_backend()
+                for slug in by_slug:
+                    backend.index_category(self.category_ids[slug])
+                catalog_cache.invalidate_on_commit(CATEGORIES_TAG, PRODUCT_LIST_TAG)
+            self.counts['categories'] += len(by_slug)
+        self.log('Imported %s categories' % self.counts['categories'])
+
+    def import_products(self, rows):
+        for batch in batched(rows, self.batch_size):
+            by_slug = {}
+            for line, row in batch:
+                name = _text(row, 'name')
+                category_id = self.category_ids.get(_text(row, 'category'))
+                if not name:
+                    self.skip(line, 'product without a name')
+                    continue
+                if category_id is None:
+                    self.skip(line, 'unknown category %r' % _text(row, 'category'))
+                    continue
+                try:
+                    price = Decimal(_text(row, 'price'))
+                except InvalidOperation:
+                    self.skip(line, 'invalid price %r' % _text(row, 'price'))
+                    continue
+                slug = _text(row, 'slug') or slugify(name)
+                by_slug[slug] = (Product(
+                    category_id=category_id, name=name, slug=slug, description=_text(row, 'description'),
+                    price=price, in_stock=_bool(row, 'in_stock', True), is_active=_bool(row, 'is_active', True),
+                ), _text(row, 'image'))
+
+            image_names = self.images.fetch_all({image for _, image in by_slug.values() if image})
+            # Rows without an image, or whose download failed, keep the one
+            # the product already has
+            keep = [slug for slug, (_, image) in by_slug.items() if not image_names.get(image)]
+            current = dict(Product.objects.filter(slug__in=keep).values_list('slug', 'image')) if keep else {}
+            for slug, (product, image) in by_slug.items():
+                product.image = image_names.get(image) or current.get(slug) or ''
+
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    [product for product, _ in by_slug.values()],
+                    update_conflicts=True, unique_fields=['slug'],
+                    update_fields=['category', 'name', 'description', 'price', 'image', 'in_stock',
+                                   'is_active', 'updated_at'],
+                )
+                ids = dict(Product.objects.filter(slug__in=by_slug).values_list('slug', 'id'))
+                self.product_ids.update(ids)
+                get_search_backend().index_products(list(ids.values()))
+                catalog_cache.invalidate_on_commit(PRODUCT_LIST_TAG, *map(product_tag, ids.values()))
+            self.counts['products'] += len(by_slug)
+            self.log('  %s products' % self.counts['products'])
+
+    def import_variants(self, rows):
+        for batch in batched(rows, self.batch_size):
+            self.resolve_products({_text(row, 'product') for _, row in batch})
+            by_sku = {}
+            for line, row in batch:
+                product_id = self.product_ids.get(_text(row, 'product'))
+                sku = _text(row, 'sku')
+                if product_id is None:
+                    self.skip(line, 'unknown product %r' % _text(row, 'product'))
+                    continue
+                if not sku:
+                    self.skip(line, 'variant without a sku')
+                    continue
+                try:
+                    stock = int(_text(row, 'stock', '0') or 0)
+                except ValueError:
+                    self.skip(line, 'invalid stock %r' % _text(row, 'stock'))
+                    continue
+                by_sku[sku] = (line, ProductVariant(
+                    product_id=product_id, color=_text(row, 'color'), size=_text(row, 'size'),
+                    stock=max(stock, 0), sku=sku,
+                ))
+
+            # A product's color and size may only be held by one SKU
+            taken = {
+                (product_id, color, size): sku for product_id, color, size, sku in ProductVariant.objects.filter(
+                    product_id__in={variant.product_id for _, variant in by_sku.values()}
+                ).values_list('product_id', 'color', 'size', 'sku')
+            }
+            for sku, (line, variant) in list(by_sku.items()):
+                key = (variant.product_id, variant.color, variant.size)
+                if taken.setdefault(key, sku) != sku:
+                    self.skip(line, 'sku %r: %s %s is already sku %r' % (sku, variant.color, variant.size, taken[key]))
+                    del by_sku[sku]
+            by_sku = {sku: variant for sku, (_, variant) in by_sku.items()}
+
+            with transaction.atomic():
+                ProductVariant.objects.bulk_create(
+                    by_sku.values(), update_conflicts=True, unique_fields=['sku'],
+                    update_fields=['product', 'color', 'size', 'stock', 'updated_at'],
+                )
+                product_ids = {variant.product_id for variant in by_sku.values()}
+                touch_products(product_ids)
+                sync_in_stock(product_ids)
+                catalog_cache.invalidate_on_commit(PRODUCT_LIST_TAG, *map(product_tag, product_ids))
+            self.counts['variants'] += len(by_sku)
+            self.log('  %s variants' % self.counts['variants'])
+
+    def import_images(self, rows):
+        for batch in batched(rows, self.batch_size):
+            self.resolve_products({_text(row, 'product') for _, row in batch})
+            image_names = self.images.fetch_all({_text(row, 'image') for _, row in batch} - {''})
+            by_key = {}
+            for line, row in batch:
+                product_id = self.product_ids.get(_text(row, 'product'))
+                name = image_names.get(_text(row, 'image'))
+                if product_id is None:
+                    self.skip(line, 'unknown product %r' % _text(row, 'product'))
+                    continue
+                if not name:
+                    self.skip(line, 'image %r could not be fetched' % _text(row, 'image'))
+                    continue
+                by_key[product_id, name] = ProductImage(
+                    product_id=product_id, image=name, alt_text=_text(row, 'alt_text'),
+                    is_featured=_bool(row, 'is_featured', False),
+                )
+
+            # ProductImage has no natural key, so match on (product, file)
+            product_ids = {product_id for product_id, _ in by_key}
+            with transaction.atomic():
+                existing = ProductImage.objects.filter(product_id__in=product_ids, image__in={
+                    name for _, name in by_key
+                })
+                updated = []
+                now = timezone.now()
+                for image in existing:
+                    incoming = by_key.pop((image.product_id, image.image.name), None)
+                    if incoming is not None:
+                        image.alt_text, image.is_featured = incoming.alt_text, incoming.is_featured
+                        image.updated_at = now
+                        updated.append(image)
+                ProductImage.objects.bulk_update(updated, ['alt_text', 'is_featured', 'updated_at'])
+                ProductImage.objects.bulk_create(by_key.values())
+                touch_products(product_ids)
+                catalog_cache.invalidate_on_commit(PRODUCT_LIST_TAG, *map(product_tag, product_ids))
+            self.counts['images'] += len(updated) + len(by_key)
+            self.log('  %s images' % self.counts['images'])
+
+    def finish(self):
+        self.images.close()
+        invalidate_facets()
+        return self.counts
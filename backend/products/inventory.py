@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .cache import PRODUCT_LIST_TAG, catalog_cache, product_tag
+from .facets import invalidate_facets
+from .models import Product, ProductVariant
+
+
+class InsufficientStock(Exception):
+    def __init__(self, variant_ids):
+        self.variant_ids = list(variant_ids)
+        super().__init__('Insufficient stock for variants %s' % self.variant_ids)
+
+
+def take_stock(quantities):
+    """
+    Decrement ProductVariant.stock for {variant_id: quantity}.
+
+    Each row is changed with a conditional UPDATE ... WHERE stock >= qty, so
+    concurrent checkouts can never drive stock below zero. Rows are updated
+    in primary key order, which keeps lock acquisition deterministic across
+    transactions. Raises InsufficientStock (rolling back the caller's
+    transaction) when any variant cannot cover its quantity.
+    """
+    short = []
+    with transaction.atomic():
+        for variant_id in sorted(quantities):
+            quantity = quantities[variant_id]
+            updated = ProductVariant.objects.filter(pk=variant_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity, updated_at=timezone.now()
+            )
+            if not updated:
+                short.append(variant_id)
+        if short:
+            raise InsufficientStock(short)
+        _stock_changed(quantities)
+
+
+def return_stock(quantities):
+    """Add released quantities back to ProductVariant.stock"""
+    with transaction.atomic():
+        for variant_id in sorted(quantities):
+            ProductVariant.objects.filter(pk=variant_id).update(
+                stock=F('stock') + quantities[variant_id], updated_at=timezone.now()
+            )
+        _stock_changed(quantities)
+
+
+def sync_in_stock(product_ids):
+    """Recompute Product.in_stock for products that have variants"""
+    has_variants = Exists(ProductVariant.objects.filter(product=OuterRef('pk')))
+    available = Exists(ProductVariant.objects.filter(product=OuterRef('pk'), stock__gt=0))
+    return Product.objects.filter(has_variants, pk__in=product_ids).exclude(in_stock=available).update(
+        in_stock=available, updated_at=timezone.now()
+    )
+
+
+def _stock_changed(quantities):
+    # Queryset updates skip model signals, so refresh what they would have
+    product_ids = set(
+        ProductVariant.objects.filter(pk__in=quantities).values_list('product_id', flat=True)
+    )
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    flipped = sync_in_stock(product_ids)
+
+    tags = [product_tag(product_id) for product_id in product_ids]
+    if flipped:
+        tags.append(PRODUCT_LIST_TAG)
+    catalog_cache.invalidate_on_commit(*tags)
+    transaction.on_commit(invalidate_facets)
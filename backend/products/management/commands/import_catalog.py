@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import CatalogImporter, CatalogImportError, read_rows
+
+STEPS = ('categories', 'products', 'variants', 'images')
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert catalog data from CSV or JSON Lines files. Columns: '
+        'categories (name, slug, description); '
+        'products (slug, name, category, description, price, image, in_stock, is_active); '
+        'variants (sku, product, color, size, stock); '
+        'images (product, image, alt_text, is_featured). '
+        'category and product columns hold slugs; image columns hold a URL or a storage name.'
+    )
+
+    def add_arguments(self, parser):
+        for step in STEPS:
+            parser.add_argument('--%s' % step, metavar='FILE', help='%s file (.csv, .jsonl or .ndjson)' % step.title())
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--image-workers', type=int, default=8,
+                            help='Concurrent image downloads')
+        parser.add_argument('--image-cache', metavar='DIR',
+                            help='Download cache directory (default: CATALOG_IMPORT_IMAGE_CACHE)')
+
+    def handle(self, *args, **options):
+        if not any(options[step] for step in STEPS):
+            raise CommandError('Nothing to import; pass at least one of %s' % ', '.join(
+                '--%s' % step for step in STEPS))
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            image_workers=options['image_workers'],
+            image_cache=options['image_cache'],
+            stdout=self.stdout,
+        )
+        try:
+            for step in STEPS:
+                path = options[step]
+                if not path:
+                    continue
+                self.stdout.write('Importing %s from %s' % (step, path))
+                getattr(importer, 'import_%s' % step)(read_rows(path))
+                for message in importer.skipped[:20]:
+                    self.stderr.write('  skipped %s:%s' % (path, message))
+                if len(importer.skipped) > 20:
+                    self.stderr.write('  ... and %s more skipped rows' % (len(importer.skipped) - 20))
+                importer.skipped = []
+        except (CatalogImportError, OSError) as exc:
+            raise CommandError(exc)
+        finally:
+            counts = importer.finish()
+
+        for failure in importer.images.failures:
+            self.stderr.write('  image download failed: %s' % failure)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %(categories)s categories, %(products)s products, '
+            '%(variants)s variants and %(images)s images' % counts
+        ))
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE products_product_fts USING fts5("
+    "name, description, category, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO products_product_fts (rowid, name, description, category) "
+    "SELECT p.id, p.name, p.description, c.name FROM products_product p "
+    "INNER JOIN products_category c ON c.id = p.category_id",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE products_product_search ("
+    "product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)",
+    "CREATE INDEX products_product_search_document_gin ON products_product_search USING GIN (document)",
+    "INSERT INTO products_product_search (product_id, document) "
+    "SELECT p.id, setweight(to_tsvector('english', p.name), 'A') || "
+    "setweight(to_tsvector('english', c.name), 'B') || "
+    "setweight(to_tsvector('english', p.description), 'C') "
+    "FROM products_product p INNER JOIN products_category c ON c.id = p.category_id",
+]
+POSTGRES_BACKWARD = [
+    "DROP TABLE IF EXISTS products_product_search",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_in_stock_name_idx',
+        ),
+    ]
@@ -22,6 +22,18 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
+def featured_image_prefetch(prefix=''):
+    """Prefetch a product's featured image into ``featured_images`` (read by ProductListSerializer)"""
+    featured_images = ProductImage.objects.order_by('-is_featured', 'id')[:1]
+    return models.Prefetch(prefix + 'images', queryset=featured_images, to_attr='featured_images')
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_listing_data(self):
+        """Load the category and featured image needed by ProductListSerializer"""
+        return self.select_related('category').prefetch_related(featured_image_prefetch())
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -34,8 +46,28 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ('name',)
+        # The storefront only reads active products, in one of the
+        # ProductViewSet sort orders (each ending in id for the cursor).
+        # Each index here removes a scan or sort that explain_queries
+        # flags without it. in_stock=true reads the name index and filters.
+        indexes = [
+            models.Index(fields=['name', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_name_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_price_idx'),
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_created_idx'),
+            models.Index(fields=['category', 'name', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_cat_name_idx'),
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_cat_price_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_cat_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,5 +102,11 @@ class ProductImage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # featured_image_prefetch: first image per product by this order
+            models.Index(fields=['product', '-is_featured', 'id'], name='productimage_featured_idx'),
+        ]
+
     def __str__(self):
         return f"Image for {self.product.name}"
@@ -0,0 +1,209 @@
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over the queryset's own ordering.
+
+    The queryset must be ordered by a list of fields ending in a unique one
+    (e.g. ('-price', '-id')). The cursor stores the ordering values of the
+    row at the page boundary, so every page is a single indexed range scan
+    regardless of how deep the client has scrolled.
+    """
+    page_size = 24
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'include_count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset, position, reverse = self._prepare(queryset, request)
+        self.count = self.get_count(queryset) if self.wants_count(request) else None
+        return self._finish(list(page_queryset), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, through the async ORM"""
+        page_queryset, position, reverse = self._prepare(queryset, request)
+        self.count = await self.aget_count(queryset) if self.wants_count(request) else None
+        rows = [row async for row in page_queryset.aiterator(chunk_size=self.page_size + 1)]
+        return self._finish(rows, position, reverse)
+
+    def _prepare(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.queryset = queryset
+
+        position, reverse = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by(*[self._invert(field) for field in self.ordering])
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position, reverse))
+        return queryset[:self.page_size + 1], position, reverse
+
+    def _finish(self, rows, position, reverse):
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        if reverse:
+            self.has_next = bool(page)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None and bool(page)
+
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by) or tuple(queryset.model._meta.ordering)
+        assert ordering, 'KeysetPagination requires an ordered queryset.'
+        last_field = queryset.model._meta.get_field(ordering[-1].lstrip('-'))
+        assert last_field.unique, (
+            'KeysetPagination requires the last ordering field to be unique, '
+            'got %r.' % (ordering,)
+        )
+        return ordering
+
+    def get_field(self, name):
+        # Ordering may use an annotation, e.g. a search rank
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    # Cursor encoding
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            reverse = bool(payload.get('r'))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        payload = {'p': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # Seek predicate
+
+    def _invert(self, field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def _seek_filter(self, position, reverse):
+        # (a, b, c) > (x, y, z) expanded as
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    # Optional total count
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() == 'true'
+
+    def get_count(self, queryset):
+        # COUNT(*) over the filtered set is the one part of a page that grows
+        # with the catalog, so it is opt-in and cached per filter combination.
+        unordered = queryset.order_by()
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+        return cache.get_or_set(self._count_key(unordered), unordered.count, timeout)
+
+    async def aget_count(self, queryset):
+        unordered = queryset.order_by()
+        key = self._count_key(unordered)
+        count = await cache.aget(key)
+        if count is None:
+            count = await unordered.acount()
+            await cache.aset(key, count, getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+        return count
+
+    def _count_key(self, unordered):
+        sql, params = unordered.query.sql_with_params()
+        digest = hashlib.md5(('%s|%r' % (sql, params)).encode('utf-8')).hexdigest()
+        return 'keyset-count:%s:%s' % (unordered.model._meta.label_lower, digest)
+
+
+class ProductCursorPagination(KeysetPagination):
+    page_size = 24
+    max_page_size = 100
@@ -0,0 +1,171 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return SEARCH_TOKEN_RE.findall(query.lower())[:16]
+
+
+class BaseSearchBackend:
+    """
+    Keeps a full-text index of product name, description and category name.
+
+    search() narrows a Product queryset to the matches and annotates
+    ``search_rank``, where lower values are better matches.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        if not product_ids:
+            return
+        self._refresh('p.id IN (%s)' % ', '.join(['%s'] * len(product_ids)), list(product_ids))
+
+    def index_category(self, category_id):
+        self._refresh('p.category_id = %s', [category_id])
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        self._refresh(None, [])
+
+    def _refresh(self, where, params):
+        pass
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for database vendors without a full-text backend"""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 virtual table keyed by product id, ranked with bm25()"""
+    table = 'products_product_fts'
+    # bm25() column weights for name, description, category
+    weights = (10.0, 1.0, 4.0)
+
+    def build_match(self, tokens):
+        # Quote every token so FTS5 operators in user input are inert, and
+        # make each one a prefix query for search-as-you-type.
+        return ' '.join('"%s"*' % token for token in tokens)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return ContainsSearchBackend().search(queryset, query)
+        match = self.build_match(tokens)
+        id_column = '"%s"."id"' % queryset.model._meta.db_table
+        rank_sql = (
+            'SELECT bm25({table}, {weights}) FROM {table} '
+            'WHERE {table} MATCH %s AND {table}.rowid = {id_column}'
+        ).format(
+            table=self.table,
+            weights=', '.join(str(weight) for weight in self.weights),
+            id_column=id_column,
+        )
+        return queryset.filter(
+            id__in=RawSQL('SELECT rowid FROM {table} WHERE {table} MATCH %s'.format(table=self.table), [match])
+        ).annotate(search_rank=RawSQL(rank_sql, [match], output_field=FloatField()))
+
+    def remove_products(self, product_ids):
+        if not product_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'DELETE FROM {table} WHERE rowid = %s'.format(table=self.table),
+                [(product_id,) for product_id in product_ids],
+            )
+
+    def _refresh(self, where, params):
+        where_sql = 'WHERE %s' % where if where else ''
+        with connection.cursor() as cursor:
+            if where:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE rowid IN (SELECT p.id FROM products_product p {where})'.format(
+                        table=self.table, where=where_sql),
+                    params,
+                )
+            else:
+                cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (rowid, name, description, category) '
+                'SELECT p.id, p.name, p.description, c.name FROM products_product p '
+                'INNER JOIN products_category c ON c.id = p.category_id {where}'.format(
+                    table=self.table, where=where_sql),
+                params,
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector table with a GIN index, ranked with ts_rank()"""
+    table = 'products_product_search'
+    config = 'english'
+
+    def build_tsquery(self, tokens):
+        return ' & '.join('%s:*' % token for token in tokens)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return ContainsSearchBackend().search(queryset, query)
+        tsquery = self.build_tsquery(tokens)
+        id_column = '"%s"."id"' % queryset.model._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(
+                'SELECT product_id FROM {table} '
+                'WHERE document @@ to_tsquery(%s::regconfig, %s)'.format(table=self.table),
+                [self.config, tsquery],
+            )
+        ).annotate(search_rank=RawSQL(
+            'SELECT -ts_rank(document, to_tsquery(%s::regconfig, %s)) FROM {table} '
+            'WHERE product_id = {id_column}'.format(table=self.table, id_column=id_column),
+            [self.config, tsquery],
+            output_field=FloatField(),
+        ))
+
+    def remove_products(self, product_ids):
+        # Rows go away with the product through ON DELETE CASCADE
+        pass
+
+    def _refresh(self, where, params):
+        where_sql = 'WHERE %s' % where if where else ''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table} (product_id, document) '
+                'SELECT p.id, '
+                "setweight(to_tsvector(%s::regconfig, p.name), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, c.name), 'B') || "
+                "setweight(to_tsvector(%s::regconfig, p.description), 'C') "
+                'FROM products_product p INNER JOIN products_category c ON c.id = p.category_id {where} '
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document'.format(
+                    table=self.table, where=where_sql),
+                [self.config, self.config, self.config] + params,
+            )
+            if not where:
+                cursor.execute(
+                    'DELETE FROM {table} WHERE product_id NOT IN (SELECT id FROM products_product)'.format(
+                        table=self.table),
+                )
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    return SEARCH_BACKENDS.get(connection.vendor, ContainsSearchBackend)()
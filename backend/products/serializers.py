@@ -1,49 +1,65 @@
 from rest_framework import serializers
-from .models import Category, Product, ProductVariant, ProductImage
 
+from api.images import ImageDerivativesField
+from api.sparse import SparseFieldsetMixin
+from .models import Category, Product, ProductVariant, ProductImage, featured_image_prefetch
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description']
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    derivatives = ImageDerivativesField(source='image')
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_featured']
+        fields = ['id', 'image', 'derivatives', 'alt_text', 'is_featured']
 
 
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductVariant
         fields = ['id', 'color', 'size', 'stock', 'sku']
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     featured_image = serializers.SerializerMethodField()
 
+    expandable_fields = {
+        'images': (ProductImageSerializer, {'many': True, 'read_only': True}),
+        'variants': (ProductVariantSerializer, {'many': True, 'read_only': True}),
+    }
+    prefetch_for = {'featured_image': lambda prefix: [featured_image_prefetch(prefix)]}
+
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'category', 'price', 'featured_image', 'in_stock']
 
     def get_featured_image(self, obj):
-        featured_image = obj.images.filter(is_featured=True).first()
-        if not featured_image and obj.images.exists():
-            featured_image = obj.images.first()
-        
+        # Populated by Product.objects.with_listing_data()
+        if hasattr(obj, 'featured_images'):
+            featured_image = obj.featured_images[0] if obj.featured_images else None
+        else:
+            featured_image = obj.images.order_by('-is_featured', 'id').first()
+
         if featured_image:
-            return ProductImageSerializer(featured_image).data
+            return ProductImageSerializer(
+                featured_image, context=self.context, sparse_path=self.field_path() + ['featured_image']
+            ).data
         return None
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
+    image_derivatives = ImageDerivativesField(source='image')
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'category', 'description', 'price', 
-                 'image', 'in_stock', 'is_active', 'created_at', 'images', 'variants']
+                 'image', 'image_derivatives', 'in_stock', 'is_active', 'created_at', 'images', 'variants']
@@ -0,0 +1,93 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.images import generate_for_uploads, remember_uploads
+from .cache import CATEGORIES_TAG, PRODUCT_LIST_TAG, catalog_cache, category_tag, product_tag
+from .facets import invalidate_facets
+from .models import Category, Product, ProductImage, ProductVariant
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, raw=False, **kwargs):
+    # A new category has no products yet; a renamed one changes their documents
+    if not created and not raw:
+        get_search_backend().index_category(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def expire_facets(sender, **kwargs):
+    invalidate_facets()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def expire_category_responses(sender, instance, **kwargs):
+    # Product payloads embed their category
+    catalog_cache.invalidate_on_commit(CATEGORIES_TAG, PRODUCT_LIST_TAG, category_tag(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def expire_product_responses(sender, instance, **kwargs):
+    catalog_cache.invalidate_on_commit(PRODUCT_LIST_TAG, product_tag(instance.pk))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def expire_variant_responses(sender, instance, **kwargs):
+    # Variants only appear in the product detail payload
+    catalog_cache.invalidate_on_commit(product_tag(instance.product_id))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def expire_image_responses(sender, instance, **kwargs):
+    # Lists show the featured image, details show all of them
+    catalog_cache.invalidate_on_commit(PRODUCT_LIST_TAG, product_tag(instance.product_id))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product(sender, instance, raw=False, **kwargs):
+    # Keep Product.updated_at a validator for the whole product payload
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Product)
+def note_product_upload(sender, instance, raw=False, **kwargs):
+    if not raw:
+        remember_uploads(instance, 'image')
+
+
+@receiver(pre_save, sender=ProductImage)
+def note_product_image_upload(sender, instance, raw=False, **kwargs):
+    if not raw:
+        remember_uploads(instance, 'image')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generate_for_uploads(instance)
@@ -0,0 +1,561 @@
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import token_cache
+from api.throttling import get_store
+from .cache import catalog_cache, product_tag
+from .facets import facets_cache_key
+from .models import Category, Product, ProductImage, ProductVariant
+from .urls import async_urlpatterns, router
+
+# ROOT_URLCONF for the catalog as ecommerce.asgi serves it
+urlpatterns = [
+    path('api/products/', include(async_urlpatterns() + [path('', include(router.urls))])),
+]
+
+
+class ProductListQueryCountTests(TestCase):
+    """The product list costs the same number of queries whatever the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {index}', slug=f'category-{index}') for index in range(3)]
+        for index in range(60):
+            product = Product.objects.create(
+                category=categories[index % 3], name=f'Product {index:02}', slug=f'product-{index}', price='10.00',
+            )
+            for position in range(2):
+                ProductImage.objects.create(
+                    product=product, image=f'products/{index}-{position}.jpg', is_featured=position == 0,
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_list(self, params, queries):
+        # Every request is answered from the database, not the catalog cache
+        catalog_cache.backend.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        # Validator state, the page with its categories, the featured images
+        for page_size in (1, 10, 50):
+            with self.subTest(page_size=page_size):
+                results = self.get_list({'page_size': page_size}, 3)
+                self.assertEqual(len(results), page_size)
+                self.assertTrue(all(product['category']['slug'] for product in results))
+                self.assertTrue(all(product['featured_image'] for product in results))
+
+    def test_expanded_images_do_not_grow_with_page_size(self):
+        for page_size in (1, 10, 50):
+            with self.subTest(page_size=page_size):
+                results = self.get_list({'page_size': page_size, 'expand': 'images'}, 4)
+                self.assertEqual(len(results), page_size)
+                self.assertTrue(all(len(product['images']) == 2 for product in results))
+
+
+class ProductCursorPaginationTests(TestCase):
+    """Cursor pages cover the ordered catalog exactly once in either direction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        # Prices repeat, so the id tie-breaker decides the order within a price
+        for index in range(11):
+            Product.objects.create(
+                category=category, name=f'Product {index:02}', slug=f'product-{index}', price=f'{10 + index % 3}.00',
+            )
+
+    def setUp(self):
+        catalog_cache.backend.clear()
+        get_store().clear()
+        self.client = APIClient()
+
+    def walk(self, url, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([product['slug'] for product in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def expected(self, *ordering):
+        return list(Product.objects.order_by(*ordering).values_list('slug', flat=True))
+
+    def test_pages_follow_each_sort_order_without_gaps_or_repeats(self):
+        for sort_by, ordering in (('name', ('name', 'id')), ('price_asc', ('price', 'id')),
+                                  ('price_desc', ('-price', '-id')), ('newest', ('-created_at', '-id'))):
+            with self.subTest(sort_by=sort_by):
+                pages = self.walk('/api/products/?page_size=4&sort_by=%s' % sort_by)
+                self.assertEqual([len(page) for page in pages], [4, 4, 3])
+                self.assertEqual(sum(pages, []), self.expected(*ordering))
+
+    def test_previous_links_walk_back_to_the_first_page(self):
+        url = '/api/products/?page_size=4&sort_by=price_desc'
+        forward = self.walk(url)
+        last_page = self.client.get(url).data
+        while last_page['next']:
+            last_page = self.client.get(last_page['next']).data
+        self.assertIsNone(self.client.get(url).data['previous'])
+        backward = self.walk(last_page['previous'], direction='previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_count_is_opt_in(self):
+        self.assertIsNone(self.client.get('/api/products/?page_size=4').data['count'])
+        self.assertEqual(self.client.get('/api/products/?page_size=4&include_count=true').data['count'], 11)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.client.get('/api/products/?page_size=0').data['results']), 1)
+        response = self.client.get('/api/products/?page_size=500')
+        self.assertEqual(len(response.data['results']), 11)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor_is_404(self):
+        for cursor in ('garbage', 'eyJwIjpbMV19'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/products/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class ProductSearchTests(TestCase):
+    """Full-text search matches name, description and category, best matches first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        hats = Category.objects.create(name='Hats', slug='hats')
+        cls.products = {
+            slug: Product.objects.create(category=category, name=name, slug=slug, description=description, price=price)
+            for slug, name, description, category, price in (
+                ('linen-shirt', 'Linen Shirt', 'Breathable summer wear', cls.shirts, '30.00'),
+                ('oxford', 'Oxford Button-Down', 'A shirt for the office', cls.shirts, '40.00'),
+                ('flannel', 'Flannel', 'Warm and soft', cls.shirts, '35.00'),
+                ('linen-hat', 'Linen Hat', 'Keeps the sun off', hats, '20.00'),
+            )
+        }
+
+    def setUp(self):
+        catalog_cache.backend.clear()
+        get_store().clear()
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product['slug'] for product in response.data['results']]
+
+    def test_name_matches_rank_above_category_and_description_matches(self):
+        results = self.search('shirt')
+        self.assertEqual(results[0], 'linen-shirt')
+        self.assertEqual(set(results), {'linen-shirt', 'oxford', 'flannel'})
+        self.assertEqual(self.search('hat'), ['linen-hat'])
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual(set(self.search('lin')), {'linen-shirt', 'linen-hat'})
+        self.assertEqual(self.search('linen sh'), ['linen-shirt'])
+        self.assertEqual(self.search('linen coat'), [])
+
+    def test_query_syntax_is_matched_literally(self):
+        for query in ('shirt OR hat', 'NOT shirt', '"linen', 'linen*', 'name:linen', '(', '-'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/api/products/', {'search': query}).status_code, 200)
+        self.assertEqual(self.search('shirt OR hat'), [])
+
+    def test_sort_order_overrides_relevance(self):
+        self.assertEqual(self.search('shirt', sort_by='price_asc'), ['linen-shirt', 'flannel', 'oxford'])
+
+    def test_ranked_results_page_with_cursors(self):
+        response = self.client.get('/api/products/', {'search': 'shirt', 'page_size': 2})
+        first = [product['slug'] for product in response.data['results']]
+        second = [product['slug'] for product in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(first + second, self.search('shirt'))
+
+    def test_edits_are_reindexed(self):
+        product = self.products['flannel']
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Flannel Overshirt'
+            product.save()
+        self.assertEqual(self.search('overshirt'), ['flannel'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirts.name = 'Tops'
+            self.shirts.save()
+        self.assertEqual(set(self.search('tops')), {'linen-shirt', 'oxford', 'flannel'})
+        self.assertEqual(self.search('shirts'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search('overshirt'), [])
+
+
+class FacetsCacheKeyTests(TestCase):
+    def test_in_stock_spellings_share_a_key(self):
+        keys = {facets_cache_key({'in_stock': value}) for value in ('true', 'TRUE', '1', ' True ')}
+        self.assertEqual(len(keys), 1)
+        self.assertEqual(facets_cache_key({'in_stock': 'false'}), facets_cache_key({}))
+        self.assertNotEqual(facets_cache_key({'in_stock': 'true'}), facets_cache_key({}))
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    """An edit drops only the cached responses that embed the edited rows"""
+    urls = ('/api/products/', '/api/products/shirt/', '/api/products/hat/',
+            '/api/products/categories/', '/api/products/categories/shirts/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        hats = Category.objects.create(name='Hats', slug='hats')
+        cls.shirt = Product.objects.create(category=cls.shirts, name='Shirt', slug='shirt', price='10.00')
+        cls.hat = Product.objects.create(category=hats, name='Hat', slug='hat', price='15.00')
+
+    def setUp(self):
+        catalog_cache.backend.clear()
+        get_store().clear()
+        self.client = APIClient()
+
+    def cache_status(self):
+        return {url: self.client.get(url)['X-Cache'] for url in self.urls}
+
+    def assertExpired(self, edit, *expired):
+        self.cache_status()
+        with self.captureOnCommitCallbacks(execute=True):
+            edit()
+        self.assertEqual(self.cache_status(), {url: 'MISS' if url in expired else 'HIT' for url in self.urls})
+
+    def test_product_edit(self):
+        def edit():
+            self.shirt.price = '12.00'
+            self.shirt.save()
+        self.assertExpired(edit, '/api/products/', '/api/products/shirt/')
+        self.assertEqual(self.client.get('/api/products/shirt/').data['price'], '12.00')
+
+    def test_variant_edit(self):
+        def edit():
+            ProductVariant.objects.create(product=self.hat, color='Red', size='M', stock=3, sku='HAT-RED-M')
+        self.assertExpired(edit, '/api/products/hat/')
+
+    def test_image_edit(self):
+        def edit():
+            ProductImage.objects.create(product=self.hat, image='products/hat.jpg', is_featured=True)
+        self.assertExpired(edit, '/api/products/', '/api/products/hat/')
+
+    def test_category_edit(self):
+        def edit():
+            self.shirts.name = 'Tops'
+            self.shirts.save()
+        self.assertExpired(edit, '/api/products/', '/api/products/shirt/',
+                           '/api/products/categories/', '/api/products/categories/shirts/')
+
+    def test_invalidation_waits_for_commit(self):
+        self.cache_status()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.shirt.save()
+            self.assertEqual(self.client.get('/api/products/shirt/')['X-Cache'], 'HIT')
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/products/shirt/')['X-Cache'], 'MISS')
+
+    def test_stats_count_hits_misses_and_invalidations(self):
+        before = catalog_cache.stats()
+        self.client.get('/api/products/hat/')
+        self.client.get('/api/products/hat/')
+        catalog_cache.invalidate(product_tag(self.hat.pk))
+        self.client.get('/api/products/hat/')
+        after = catalog_cache.stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 2)
+        self.assertEqual(after['invalidations'] - before['invalidations'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    """Catalog reads carry ETag/Last-Modified validators derived from updated_at"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Shirts', slug='shirts')
+        cls.product = Product.objects.create(category=cls.category, name='Shirt', slug='shirt', price='10.00')
+
+    def setUp(self):
+        get_store().clear()
+        self.client = APIClient()
+
+    def get(self, url, **extra):
+        # Validators come from the database, not a cached entry
+        catalog_cache.backend.clear()
+        return self.client.get(url, **extra)
+
+    def test_matching_validators_get_304(self):
+        for url in ('/api/products/', '/api/products/shirt/', '/api/products/categories/'):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response['Cache-Control'], 'no-cache')
+                self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+                self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_etag_depends_on_query_and_format(self):
+        etags = {
+            self.get('/api/products/')['ETag'],
+            self.get('/api/products/?sort_by=price_asc')['ETag'],
+            self.get('/api/products/?format=api')['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_edits_change_the_validators(self):
+        etags = [self.get('/api/products/shirt/')['ETag']]
+        ProductVariant.objects.create(product=self.product, color='Blue', size='M', stock=1, sku='SHIRT-BLUE-M')
+        etags.append(self.get('/api/products/shirt/')['ETag'])
+        Category.objects.filter(pk=self.category.pk).update(name='Tops', updated_at=timezone.now())
+        etags.append(self.get('/api/products/shirt/')['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_no_validators_without_rows(self):
+        for url in ('/api/products/missing/', '/api/products/?category=missing'):
+            with self.subTest(url=url):
+                self.assertNotIn('ETag', self.get(url))
+
+
+class ConditionalCatalogCacheTests(TestCase):
+    """A cached catalog response answers conditional requests without touching the database"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        cls.product = Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+
+    def setUp(self):
+        catalog_cache.backend.clear()
+        get_store().clear()
+        self.client = APIClient()
+
+    def test_revalidating_a_cached_response_runs_no_queries(self):
+        first = self.client.get('/api/products/shirt/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/shirt/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Last-Modified'], first['Last-Modified'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/shirt/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_featured_revalidates_from_the_cache(self):
+        Product.objects.update(in_stock=True)
+        etag = self.client.get('/api/products/featured/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/featured/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_a_miss_answers_304_from_the_validator_query(self):
+        etag = self.client.get('/api/products/shirt/')['ETag']
+        catalog_cache.backend.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/shirt/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_an_edit_changes_the_cached_validators(self):
+        etag = self.client.get('/api/products/shirt/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = '12.00'
+            self.product.save()
+        response = self.client.get('/api/products/shirt/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['price'], '12.00')
+
+
+class AsyncCatalogViewTests(TestCase):
+    """The async catalog views answer like the sync viewsets they stand in for"""
+    compared_headers = ('Content-Type', 'Vary', 'Allow', 'ETag', 'Last-Modified', 'Cache-Control',
+                        'X-Cache', 'Retry-After', 'WWW-Authenticate')
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        Product.objects.create(category=category, name='Shirt', slug='shirt', price='10.00')
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'x')
+
+    def setUp(self):
+        token_cache.clear()
+        get_store().clear()
+
+    async def get(self, url, urlconf, **extra):
+        catalog_cache.backend.clear()
+        with self.settings(ROOT_URLCONF=urlconf):
+            return await self.async_client.get(url, **extra)
+
+    async def assertSameResponse(self, url, **extra):
+        sync = await self.get(url, 'ecommerce.urls', **extra)
+        get_store().clear()
+        response = await self.get(url, __name__, **extra)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(
+            {name: response.get(name) for name in self.compared_headers},
+            {name: sync.get(name) for name in self.compared_headers},
+        )
+        if sync['Content-Type'] == 'application/json':
+            self.assertEqual(response.json(), sync.json())
+        return response
+
+    async def test_public_reads_match(self):
+        for url in ('/api/products/', '/api/products/shirt/', '/api/products/featured/',
+                    '/api/products/categories/', '/api/products/categories/shirts/'):
+            with self.subTest(url=url):
+                self.assertEqual((await self.assertSameResponse(url)).status_code, 200)
+
+    async def test_missing_product_matches(self):
+        self.assertEqual((await self.assertSameResponse('/api/products/missing/')).status_code, 404)
+
+    async def test_bad_token_is_rejected(self):
+        response = await self.assertSameResponse('/api/products/', headers={'Authorization': 'Bearer garbage'})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(API_THROTTLE_RATES={'anon': {'rate': '1/hour', 'burst': 1}})
+    async def test_anonymous_throttle_matches(self):
+        await self.get('/api/products/', __name__)
+        response = await self.get('/api/products/', __name__)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        get_store().clear()
+        await self.get('/api/products/', 'ecommerce.urls')
+        sync = await self.get('/api/products/', 'ecommerce.urls')
+        self.assertEqual(response['Retry-After'], sync['Retry-After'])
+        self.assertEqual(response.json(), sync.json())
+
+    @override_settings(API_THROTTLE_RATES={
+        'anon': {'rate': '1/hour', 'burst': 2}, 'user': {'rate': '1000/s', 'burst': 1000},
+    })
+    async def test_signed_in_reads_use_the_user_bucket(self):
+        auth = 'Bearer %s' % AccessToken.for_user(self.user)
+        statuses = [(await self.get('/api/products/', __name__, headers={'Authorization': auth})).status_code
+                    for _ in range(5)]
+        self.assertEqual(statuses, [200] * 5)
+
+    async def test_not_modified_from_the_cache_matches(self):
+        responses = []
+        for urlconf in ('ecommerce.urls', __name__):
+            etag = (await self.get('/api/products/', urlconf))['ETag']
+            with self.settings(ROOT_URLCONF=urlconf):
+                responses.append(await self.async_client.get('/api/products/', headers={'If-None-Match': etag}))
+        sync, response = responses
+        self.assertEqual((response.status_code, sync.status_code), (304, 304))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(
+            {name: response.get(name) for name in self.compared_headers},
+            {name: sync.get(name) for name in self.compared_headers},
+        )
+
+    async def test_browsable_api_is_negotiated(self):
+        for extra in ({'data': {'format': 'api'}}, {'headers': {'Accept': 'text/html'}}):
+            with self.subTest(**extra):
+                response = await self.assertSameResponse('/api/products/', **extra)
+                self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.write('categories.csv', 'name,slug,description\nShirts,shirts,Tops\nShoes,,Footwear\n')
+        self.write('products.jsonl', [
+            {'slug': 'oxford', 'name': 'Oxford Shirt', 'category': 'shirts', 'price': '30.00',
+             'image': 'products/imported/oxford.jpg'},
+            {'name': 'Runner', 'category': 'shoes', 'price': '80', 'in_stock': 'false'},
+            {'name': 'Orphan', 'category': 'hats', 'price': '5'},
+        ])
+        self.write('variants.csv', 'sku,product,color,size,stock\n'
+                                   'OX-M,oxford,White,M,5\nOX-L,oxford,White,L,0\nRUN-9,runner,Grey,9,2\n'
+                                   'RUN-9B,runner,Grey,9,1\nHAT-1,hat,Red,S,1\n')
+        self.write('images.csv', 'product,image,alt_text,is_featured\n'
+                                 'oxford,products/imported/oxford-back.jpg,Back,true\n')
+
+    def write(self, name, content):
+        if isinstance(content, list):
+            content = ''.join(json.dumps(row) + '\n' for row in content)
+        (self.directory / name).write_text(content)
+
+    def import_catalog(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_catalog', image_cache=str(self.directory / 'cache'), stdout=stdout, stderr=stderr,
+            **{step: str(self.directory / name) for step, name in (
+                ('categories', 'categories.csv'), ('products', 'products.jsonl'),
+                ('variants', 'variants.csv'), ('images', 'images.csv'),
+            )}
+        )
+        return stderr.getvalue()
+
+    def catalog(self):
+        return (
+            sorted(Category.objects.values_list('slug', 'name')),
+            sorted(Product.objects.values_list('slug', 'category__slug', 'price', 'image', 'in_stock')),
+            sorted(ProductVariant.objects.values_list('sku', 'product__slug', 'color', 'size', 'stock')),
+            sorted(ProductImage.objects.values_list('product__slug', 'image', 'alt_text', 'is_featured')),
+        )
+
+    def test_import_resolves_slugs_and_skus(self):
+        errors = self.import_catalog()
+        categories, products, variants, images = self.catalog()
+        self.assertEqual(categories, [('shirts', 'Shirts'), ('shoes', 'Shoes')])
+        self.assertEqual(products, [
+            ('oxford', 'shirts', Decimal('30.00'), 'products/imported/oxford.jpg', True),
+            # in_stock follows the variants once there are any
+            ('runner', 'shoes', Decimal('80.00'), '', True),
+        ])
+        self.assertEqual(variants, [
+            ('OX-L', 'oxford', 'White', 'L', 0),
+            ('OX-M', 'oxford', 'White', 'M', 5),
+            ('RUN-9', 'runner', 'Grey', '9', 2),
+        ])
+        self.assertEqual(images, [('oxford', 'products/imported/oxford-back.jpg', 'Back', True)])
+        self.assertIn("unknown category 'hats'", errors)
+        self.assertIn("unknown product 'hat'", errors)
+        self.assertIn("sku 'RUN-9B'", errors)
+
+    def test_reimport_is_idempotent(self):
+        self.import_catalog()
+        first = self.catalog()
+        ids = sorted(Product.objects.values_list('pk', flat=True))
+        self.import_catalog()
+        self.assertEqual(self.catalog(), first)
+        self.assertEqual(sorted(Product.objects.values_list('pk', flat=True)), ids)
+
+    def test_reimport_keeps_existing_images(self):
+        self.import_catalog()
+        self.write('products.jsonl', [
+            {'slug': 'oxford', 'name': 'Oxford Shirt', 'category': 'shirts', 'price': '35.00'},
+            {'slug': 'runner', 'name': 'Runner', 'category': 'shoes', 'price': '80',
+             'image': 'https://[not-a-url/runner.jpg'},
+        ])
+        Product.objects.filter(slug='runner').update(image='products/imported/runner.jpg')
+        errors = self.import_catalog()
+        self.assertEqual(
+            dict(Product.objects.values_list('slug', 'image')),
+            {'oxford': 'products/imported/oxford.jpg', 'runner': 'products/imported/runner.jpg'},
+        )
+        self.assertEqual(Product.objects.get(slug='oxford').price, Decimal('35.00'))
+        self.assertIn('image download failed: https://[not-a-url/runner.jpg', errors)
+        self.assertEqual(ProductImage.objects.count(), 1)
@@ -1,4 +1,5 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import CategoryViewSet, ProductViewSet
 
@@ -6,6 +7,27 @@ router = DefaultRouter()
 router.register('categories', CategoryViewSet)
 router.register('', ProductViewSet)
 
-urlpatterns = [
+
+def async_urlpatterns():
+    from . import async_views
+
+    # Ahead of the router. facets/ is repeated here because the async
+    # product detail pattern would otherwise swallow it.
+    return [
+        path('', async_views.product_list, name='product-list'),
+        path('featured/', async_views.product_featured, name='product-featured'),
+        path('facets/', ProductViewSet.as_view({'get': 'facets'}), name='product-facets'),
+        path('categories/', async_views.category_list, name='category-list'),
+        re_path(r'^categories/(?P<slug>[^/.]+)/$', async_views.category_detail, name='category-detail'),
+        re_path(r'^(?P<slug>[^/.]+)/$', async_views.product_detail, name='product-detail'),
+    ]
+
+
+urlpatterns = []
+
+if getattr(settings, 'CATALOG_ASYNC_VIEWS', False):
+    urlpatterns += async_urlpatterns()
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
@@ -3,8 +3,16 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from api.middleware import SerializerTimingMixin
+from api.sparse import SparseQuerysetMixin
+from .conditional import ConditionalGetMixin
+from .cache import CATEGORIES_TAG, PRODUCT_LIST_TAG, CatalogCacheMixin, category_tag, product_tag
+from .facets import compute_facets, facets_cache_key, parse_in_stock
 from .models import Category, Product
+from .pagination import ProductCursorPagination
+from .search import get_search_backend
 from .serializers import (
     CategorySerializer,
     ProductListSerializer,
@@ -12,66 +20,139 @@ from .serializers import (
 )
 
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(SerializerTimingMixin, SparseQuerysetMixin, CatalogCacheMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+    def get_cache_tags(self, data):
+        return [CATEGORIES_TAG]
+
+    def get_validator_queryset(self):
+        if self.action == 'retrieve':
+            return Category.objects.filter(slug=self.kwargs['slug'])
+        return Category.objects.all()
+
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(SerializerTimingMixin, SparseQuerysetMixin, CatalogCacheMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Product.objects.filter(is_active=True)
     permission_classes = [AllowAny]
     lookup_field = 'slug'
+    pagination_class = ProductCursorPagination
+    # get_cache_tags reads category_id even when ?fields= leaves it out
+    sparse_required_fields = ('category',)
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'featured'):
             return ProductListSerializer
         return ProductDetailSerializer
 
+    def get_throttle_scope(self):
+        # Searches cost far more than browsing, so they have their own limit
+        if self.action == 'list' and self.request.query_params.get('search'):
+            return 'search'
+        return None
+
+    def get_object(self):
+        self.object = super().get_object()
+        return self.object
+
+    def get_cache_tags(self, data):
+        if self.action == 'retrieve':
+            # Tagged from the instance: ?fields= may drop id and category
+            return [product_tag(self.object.pk), category_tag(self.object.category_id)]
+        return [PRODUCT_LIST_TAG]
+
+    validator_timestamps = ('category__updated_at',)
+
+    def get_validator_queryset(self):
+        # Product.updated_at is also bumped when its variants or images change
+        products = Product.objects.filter(is_active=True)
+        if self.action == 'retrieve':
+            products = products.filter(slug=self.kwargs['slug'])
+        else:
+            products = self.filter_catalog(products)
+            if self.action == 'featured':
+                products = products.filter(in_stock=True)
+        return products
+
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True)
+        if self.action in ('list', 'featured'):
+            queryset = queryset.with_listing_data()
+        else:
+            queryset = queryset.select_related('category').prefetch_related('images', 'variants')
         
         # Apply filters
-        category = self.request.query_params.get('category')
-        if category:
+        queryset = self.filter_catalog(queryset)
+        search = self.request.query_params.get('search')
+        
+        # Apply sorting (id keeps the order total for cursor pagination).
+        # Searches are ranked by relevance unless a sort order is requested.
+        sort_by = self.request.query_params.get('sort_by', 'relevance' if search else 'name')
+        if sort_by == 'relevance' and search:
+            queryset = queryset.order_by('search_rank', 'id')
+        elif sort_by == 'price_asc':
+            queryset = queryset.order_by('price', 'id')
+        elif sort_by == 'price_desc':
+            queryset = queryset.order_by('-price', '-id')
+        elif sort_by == 'newest':
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            queryset = queryset.order_by('name', 'id')
+        
+        return self.sparse_queryset(queryset)
+
+    def filter_catalog(self, queryset, skip=()):
+        # Filters named in skip are left out, e.g. to count facet options
+        params = self.request.query_params
+        
+        category = params.get('category')
+        if category and 'category' not in skip:
             queryset = queryset.filter(category__slug=category)
         
-        price_min = self.request.query_params.get('price_min')
-        if price_min:
+        price_min = params.get('price_min')
+        if price_min and 'price' not in skip:
             queryset = queryset.filter(price__gte=price_min)
         
-        price_max = self.request.query_params.get('price_max')
-        if price_max:
+        price_max = params.get('price_max')
+        if price_max and 'price' not in skip:
             queryset = queryset.filter(price__lte=price_max)
         
-        in_stock = self.request.query_params.get('in_stock')
-        if in_stock and in_stock.lower() == 'true':
+        if parse_in_stock(params.get('in_stock')):
             queryset = queryset.filter(in_stock=True)
         
-        search = self.request.query_params.get('search')
+        search = params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search) |
-                Q(category__name__icontains=search)
-            )
-        
-        # Apply sorting
-        sort_by = self.request.query_params.get('sort_by', 'name')
-        if sort_by == 'price_asc':
-            queryset = queryset.order_by('price')
-        elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-price')
-        elif sort_by == 'newest':
-            queryset = queryset.order_by('-created_at')
-        else:
-            queryset = queryset.order_by('name')
+            queryset = get_search_backend().search(queryset, search)
         
         return queryset
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
+        return self.cached_response(
+            request, lambda: self.conditional_response(request, self._featured_response)
+        )
+
+    def _featured_response(self):
         featured_products = self.get_queryset().filter(in_stock=True)[:8]
-        serializer = ProductListSerializer(featured_products, many=True)
+        serializer = self.get_serializer(featured_products, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        cache_key = facets_cache_key(request.query_params)
+        facets = cache.get(cache_key)
+        if facets is None:
+            products = Product.objects.filter(is_active=True)
+            facets = compute_facets(
+                self.filter_catalog(products),
+                self.filter_catalog(products, skip=('category',)),
+                self.filter_catalog(products, skip=('price',)),
+            )
+            cache.set(cache_key, facets, getattr(settings, 'PRODUCT_FACET_CACHE_TIMEOUT', 300))
+        return Response(facets)
@@ -1,35 +1,17 @@
 import os
+import sys
 import django
 from django.utils.text import slugify
-import requests
-from io import BytesIO
-from django.core.files import File
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from products.models import Category, Product, ProductVariant, ProductImage
+from products.importer import CatalogImporter
+from products.models import Category
 from accounts.models import UserProfile
 
-def download_image(url):
-    """Download an image from a URL and return it as a Django File object"""
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f"Failed to download image from {url}")
-        return None
-    
-    image_name = url.split("/")[-1]
-    if '?' in image_name:
-        image_name = image_name.split('?')[0]
-    
-    # If image has no extension, add .jpg
-    if '.' not in image_name:
-        image_name = f"{image_name}.jpg"
-    
-    return File(BytesIO(response.content), name=image_name)
-
 def create_sample_categories():
     categories = [
         {"name": "Men", "description": "Men's clothing and accessories"},
@@ -38,16 +20,13 @@ def create_sample_categories():
         {"name": "Footwear", "description": "Shoes, boots, and sandals"}
     ]
     
-    for cat in categories:
-        slug = slugify(cat['name'])
-        Category.objects.get_or_create(
-            name=cat['name'],
-            defaults={
-                'slug': slug,
-                'description': cat['description']
-            }
-        )
-    
+    importer = CatalogImporter(stdout=sys.stdout)
+    importer.import_categories(enumerate(
+        ({'name': cat['name'], 'slug': slugify(cat['name']), 'description': cat['description']}
+         for cat in categories), 1
+    ))
+    importer.finish()
+
     print(f"Created {len(categories)} categories")
 
 def create_sample_products():
@@ -124,64 +103,36 @@ def create_sample_products():
         }
     ]
     
+    product_rows, variant_rows, image_rows = [], [], []
     for product_data in products:
-        category_name = product_data.pop('category')
-        variants_data = product_data.pop('variants')
-        additional_images_data = product_data.pop('additional_images')
-        image_url = product_data.pop('image_url')
-        
-        # Get category
-        category = Category.objects.get(name=category_name)
-        
-        # Create or update product
         slug = slugify(product_data['name'])
-        product, created = Product.objects.update_or_create(
-            slug=slug,
-            defaults={
-                **product_data,
-                'category': category,
-                'in_stock': True,
-                'is_active': True
-            }
-        )
-        
-        # Set main image
-        try:
-            main_image = download_image(image_url)
-            if main_image:
-                product.image = main_image
-                product.save()
-        except Exception as e:
-            print(f"Error downloading main image for {product.name}: {e}")
-        
-        # Create variants
-        for variant_data in variants_data:
-            ProductVariant.objects.update_or_create(
-                product=product, 
-                color=variant_data['color'],
-                size=variant_data['size'],
-                defaults={
-                    'stock': variant_data['stock'],
-                    'sku': variant_data['sku']
-                }
-            )
-        
-        # Create additional images
-        for img_data in additional_images_data:
-            try:
-                img_file = download_image(img_data['image_url'])
-                if img_file:
-                    ProductImage.objects.update_or_create(
-                        product=product,
-                        alt_text=img_data['alt_text'],
-                        defaults={
-                            'image': img_file,
-                            'is_featured': (img_data == additional_images_data[0])  # First one is featured
-                        }
-                    )
-            except Exception as e:
-                print(f"Error downloading additional image for {product.name}: {e}")
-    
+        product_rows.append({
+            'slug': slug,
+            'name': product_data['name'],
+            'category': slugify(product_data['category']),
+            'description': product_data['description'],
+            'price': product_data['price'],
+            'image': product_data['image_url'],
+        })
+        for variant_data in product_data['variants']:
+            variant_rows.append({'product': slug, **variant_data})
+        for index, img_data in enumerate(product_data['additional_images']):
+            image_rows.append({
+                'product': slug,
+                'image': img_data['image_url'],
+                'alt_text': img_data['alt_text'],
+                'is_featured': index == 0,  # First one is featured
+            })
+
+    # Images are downloaded concurrently and cached under CATALOG_IMPORT_IMAGE_CACHE
+    importer = CatalogImporter(stdout=sys.stdout)
+    importer.import_products(enumerate(product_rows, 1))
+    importer.import_variants(enumerate(variant_rows, 1))
+    importer.import_images(enumerate(image_rows, 1))
+    importer.finish()
+    for message in importer.skipped + importer.images.failures:
+        print(f"Skipped {message}")
+
     print(f"Created or updated {len(products)} products with variants and images")
 
 def ensure_admin_user():
@@ -1,6 +1,6 @@
 import { createContext, useState, useContext, useEffect, useCallback } from 'react'
 import { getUserProfile } from '../utils/api'
-import { getToken, setToken, removeToken, isTokenExpired, refreshToken } from '../utils/auth'
+import { getToken, setToken, removeToken, isTokenExpired, refreshToken, revokeTokens } from '../utils/auth'
 import { User } from '../types'
 
 interface AuthContextType {
@@ -62,6 +62,9 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   }
 
   const logout = () => {
+    // Revoke tokens server-side; logging out locally doesn't wait for it
+    revokeTokens().catch((error) => console.error('Failed to revoke tokens:', error))
+    
     // Remove tokens
     removeToken('access')
     removeToken('refresh')
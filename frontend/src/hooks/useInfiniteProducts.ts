@@ -7,30 +7,39 @@ interface ProductsResponse {
   results: Product[];
   next: string | null;
   previous: string | null;
-  count: number;
+  count: number | null;
 }
 
-// Default function for fetching paginated products
-export const fetchPaginatedProducts = async ({ pageParam = 1, filters = {} }) => {
-  const queryParams = new URLSearchParams();
+// Default function for fetching paginated products.
+// The API uses cursor pagination, so later pages are fetched from the
+// `next` URL returned by the previous page rather than by page number.
+export const fetchPaginatedProducts = async ({
+  pageParam,
+  filters = {},
+}: {
+  pageParam?: string;
+  filters?: Record<string, string | number>;
+}) => {
+  let url = pageParam;
   
-  // Add page parameter
-  queryParams.append('page', pageParam.toString());
-  
-  // Add any other filters
-  Object.entries(filters).forEach(([key, value]) => {
-    if (value) {
-      queryParams.append(key, value.toString());
-    }
-  });
+  if (!url) {
+    const queryParams = new URLSearchParams();
+    
+    // Add any filters
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value) {
+        queryParams.append(key, value.toString());
+      }
+    });
+    
+    url = `http://localhost:8000/api/products/?${queryParams.toString()}`;
+  }
   
-  const response = await axios.get<ProductsResponse>(
-    `http://localhost:8000/api/products/?${queryParams.toString()}`
-  );
+  const response = await axios.get<ProductsResponse>(url);
   
   return {
     results: response.data.results,
-    nextPage: response.data.next ? pageParam + 1 : null,
+    nextPage: response.data.next,
     totalCount: response.data.count,
   };
 };
@@ -39,7 +48,7 @@ export const fetchPaginatedProducts = async ({ pageParam = 1, filters = {} }) =>
 export const useInfiniteProducts = (filters: Record<string, string | number> = {}) => {
   return useInfiniteQuery(
     [QUERY_KEYS.PRODUCTS, filters],
-    ({ pageParam = 1 }) => fetchPaginatedProducts({ pageParam, filters }),
+    ({ pageParam }) => fetchPaginatedProducts({ pageParam, filters }),
     {
       getNextPageParam: (lastPage) => lastPage.nextPage,
       staleTime: 1000 * 60 * 5, // 5 minutes
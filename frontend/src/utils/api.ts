@@ -55,7 +55,7 @@ api.interceptors.response.use(
 // Products API
 export const fetchProducts = async (params?: URLSearchParams) => {
   const response = await api.get('/products/', { params })
-  return response.data as Product[]
+  return response.data.results as Product[]
 }
 
 export const fetchProductBySlug = async (slug: string) => {
@@ -118,13 +118,30 @@ export const updatePassword = async (passwordData: {
   return response.data
 }
 
+// Poll a background task started by the API until it finishes
+export const waitForTask = async (statusUrl: string, intervalMs = 1000, timeoutMs = 60000) => {
+  const deadline = Date.now() + timeoutMs
+  while (Date.now() < deadline) {
+    const response = await api.get(statusUrl)
+    if (response.data.status === 'succeeded') {
+      return response.data.result
+    }
+    if (response.data.status === 'failed') {
+      throw new Error(response.data.error || 'Task failed')
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+  throw new Error('Timed out waiting for the upload to be processed')
+}
+
 export const updateProfilePicture = async (formData: FormData) => {
   const response = await api.put('/accounts/profile-picture/', formData, {
     headers: {
       'Content-Type': 'multipart/form-data'
     }
   })
-  return response.data
+  // The picture is processed in the background; resolve once it is stored
+  return waitForTask(response.data.status_url)
 }
 
 // Orders API
@@ -71,6 +71,23 @@ export const refreshToken = async (): Promise<void> => {
   }
 }
 
+// Revoke the current session's tokens on the server (logout)
+export const revokeTokens = async (): Promise<void> => {
+  const refresh = getToken('refresh')
+  
+  if (!refresh) {
+    return
+  }
+  
+  await fetch('/api/token/revoke/', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({ refresh, access: getToken('access') || undefined })
+  })
+}
+
 // Get user ID from token
 export const getUserIdFromToken = (): number | null => {
   const token = getToken('access')